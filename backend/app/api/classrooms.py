@@ -2,10 +2,15 @@ from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func
-from sqlmodel import col
 from app.db import get_session
 from app.models import Classroom, ClassroomType, ProjectClassroomLink
+from app.services.links import (
+    BulkLinkRequest,
+    BulkLinkResult,
+    bulk_link,
+    bulk_unlink,
+)
+from app.services.listing import paginate, name_search, next_after_id, totals_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -24,6 +29,7 @@ class PaginatedClassrooms(BaseModel):
     total: int
     page: int
     size: int
+    next_after_id: Optional[int] = None
 
 
 @router.get("/classrooms", response_model=PaginatedClassrooms)
@@ -32,10 +38,9 @@ async def get_classrooms(
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Keyset cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    offset = (page - 1) * size
-
     if project_id:
         query = (
             select(Classroom)
@@ -46,19 +51,27 @@ async def get_classrooms(
         query = select(Classroom)
 
     if search:
-        query = query.where(col(Classroom.name).contains(search))
-
-    # Count total
-    count_stmt = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_stmt)
-    total = total_result.scalar_one()
-
-    # Fetch items
-    stmt = query.offset(offset).limit(size)
+        query = query.where(name_search(Classroom.name, search))
+
+    stmt, total = await paginate(
+        session,
+        query,
+        Classroom.id,
+        ("classrooms", project_id, search),
+        page,
+        size,
+        after_id,
+    )
     result = await session.execute(stmt)
     classrooms = result.scalars().all()
 
-    return PaginatedClassrooms(items=classrooms, total=total, page=page, size=size)
+    return PaginatedClassrooms(
+        items=classrooms,
+        total=total,
+        page=page,
+        size=size,
+        next_after_id=next_after_id(classrooms, size),
+    )
 
 
 @router.post("/classrooms", response_model=Classroom)
@@ -82,6 +95,7 @@ async def create_classroom(
         session.add(link)
         await session.commit()
 
+    totals_cache.invalidate("classrooms")
     return classroom
 
 
@@ -94,6 +108,7 @@ async def delete_classroom(
         raise HTTPException(status_code=404, detail="Classroom not found")
     await session.delete(classroom)
     await session.commit()
+    totals_cache.invalidate("classrooms")
     return {"ok": True}
 
 
@@ -116,9 +131,34 @@ async def update_classroom(
     session.add(classroom)
     await session.commit()
     await session.refresh(classroom)
+    totals_cache.invalidate("classrooms")
     return classroom
 
 
+@router.post("/classrooms/link", response_model=BulkLinkResult)
+async def bulk_link_classrooms(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_link(
+        session, Classroom, ProjectClassroomLink, "classroom_id", request
+    )
+    await session.commit()
+    totals_cache.invalidate("classrooms")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
+@router.post("/classrooms/unlink", response_model=BulkLinkResult)
+async def bulk_unlink_classrooms(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_unlink(
+        session, Classroom, ProjectClassroomLink, "classroom_id", request
+    )
+    await session.commit()
+    totals_cache.invalidate("classrooms")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
 @router.post("/classrooms/{classroom_id}/link")
 async def link_classroom_to_project(
     classroom_id: int, project_id: int, session: AsyncSession = Depends(get_session)
@@ -134,4 +174,5 @@ async def link_classroom_to_project(
     link = ProjectClassroomLink(project_id=project_id, classroom_id=classroom_id)
     session.add(link)
     await session.commit()
+    totals_cache.invalidate("classrooms")
     return {"ok": True}
@@ -1,9 +1,16 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import select, func, col
+from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import get_session
 from app.models import Course, ClassroomType, ProjectCourseLink
+from app.services.links import (
+    BulkLinkRequest,
+    BulkLinkResult,
+    bulk_link,
+    bulk_unlink,
+)
+from app.services.listing import paginate, name_search, next_after_id, totals_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -23,6 +30,7 @@ class PaginatedCourses(BaseModel):
     total: int
     page: int
     size: int
+    next_after_id: Optional[int] = None
 
 
 @router.get("/courses/", response_model=PaginatedCourses)
@@ -31,10 +39,9 @@ async def get_courses(
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Keyset cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    offset = (page - 1) * size
-
     if project_id:
         query = (
             select(Course)
@@ -45,19 +52,27 @@ async def get_courses(
         query = select(Course)
 
     if search:
-        query = query.where(col(Course.name).contains(search))
-
-    # Count total
-    count_stmt = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_stmt)
-    total = total_result.scalar_one()
-
-    # Fetch items
-    stmt = query.offset(offset).limit(size)
+        query = query.where(name_search(Course.name, search))
+
+    stmt, total = await paginate(
+        session,
+        query,
+        Course.id,
+        ("courses", project_id, search),
+        page,
+        size,
+        after_id,
+    )
     result = await session.execute(stmt)
     courses = result.scalars().all()
 
-    return PaginatedCourses(items=courses, total=total, page=page, size=size)
+    return PaginatedCourses(
+        items=courses,
+        total=total,
+        page=page,
+        size=size,
+        next_after_id=next_after_id(courses, size),
+    )
 
 
 @router.post("/courses/", response_model=Course)
@@ -80,6 +95,7 @@ async def create_course(
         session.add(link)
         await session.commit()
 
+    totals_cache.invalidate("courses")
     return course
 
 
@@ -100,6 +116,7 @@ async def update_course(
     session.add(course)
     await session.commit()
     await session.refresh(course)
+    totals_cache.invalidate("courses")
     return course
 
 
@@ -110,9 +127,30 @@ async def delete_course(course_id: int, session: AsyncSession = Depends(get_sess
         raise HTTPException(status_code=404, detail="Course not found")
     await session.delete(course)
     await session.commit()
+    totals_cache.invalidate("courses")
     return {"ok": True}
 
 
+@router.post("/courses/link", response_model=BulkLinkResult)
+async def bulk_link_courses(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_link(session, Course, ProjectCourseLink, "course_id", request)
+    await session.commit()
+    totals_cache.invalidate("courses")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
+@router.post("/courses/unlink", response_model=BulkLinkResult)
+async def bulk_unlink_courses(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_unlink(session, Course, ProjectCourseLink, "course_id", request)
+    await session.commit()
+    totals_cache.invalidate("courses")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
 @router.post("/courses/{course_id}/link")
 async def link_course_to_project(
     course_id: int, project_id: int, session: AsyncSession = Depends(get_session)
@@ -128,4 +166,5 @@ async def link_course_to_project(
     link = ProjectCourseLink(project_id=project_id, course_id=course_id)
     session.add(link)
     await session.commit()
+    totals_cache.invalidate("courses")
     return {"ok": True}
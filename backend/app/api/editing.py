@@ -0,0 +1,254 @@
+import json
+from typing import List, Optional, Tuple
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.db import get_session
+from app.models import SolverRun, WeekParity
+from app.services.editing import (
+    EditingSession,
+    decode_genes,
+    get_editing_sessions,
+)
+from app.services.solver_data import (
+    load_solver_engine,
+    run_assignments,
+    run_sections,
+)
+from app.solver.occupancy import OccupancyIndex
+
+router = APIRouter()
+
+
+class MoveRequest(BaseModel):
+    lesson_id: int
+    part: int = 0  # Which part of a lesson with several (3+ units)
+    # Fields left out keep their current value
+    timeslot_id: Optional[int] = None
+    room_id: Optional[int] = None
+    teacher_id: Optional[int] = None
+    week_parity: Optional[WeekParity] = None
+
+
+class Assignment(BaseModel):
+    lesson_id: int
+    timeslot_id: int
+    room_id: int
+    teacher_id: Optional[int] = None  # The lesson's teacher if left out
+    week_parity: WeekParity = WeekParity.BOTH
+
+
+class EvaluateRequest(BaseModel):
+    # Either a stored run or assignments (e.g. an edited or older schedule),
+    # one row per lesson part as in the results
+    run_id: Optional[str] = None
+    assignments: Optional[List[Assignment]] = None
+    # With assignments: lesson_id lists taught as one section (a run's
+    # merged sections); a run's own sections are used with run_id
+    sections: Optional[List[List[int]]] = None
+    weights: Optional[dict] = None  # Defaults to the run's weights
+
+
+async def _load_index(
+    session: AsyncSession, run: SolverRun, genes=None
+) -> OccupancyIndex:
+    """
+    The run's schedule (or genes, an edited version of it) in an
+    OccupancyIndex. 409 if the project's data no longer matches the run.
+    """
+    engine = await load_solver_engine(
+        session,
+        run.project_id,
+        json.loads(run.config_weights or "{}"),
+        sections=run_sections(run),
+    )
+    if engine is None:
+        raise HTTPException(status_code=409, detail="Project has no data to edit")
+
+    if genes is None:
+        rows = (await session.execute(run_assignments(run.run_id))).all()
+        try:
+            genes = engine.genes_from_assignments(rows)
+        except ValueError as e:
+            # The project's lessons or resources changed since the run
+            raise HTTPException(status_code=409, detail=str(e))
+    elif len(genes) != engine.num_genes:
+        raise HTTPException(
+            status_code=409, detail="Project data changed since editing started"
+        )
+    return OccupancyIndex(engine, genes)
+
+
+async def _get_editing_session(
+    session_id: str, session: AsyncSession
+) -> EditingSession:
+    store = get_editing_sessions()
+    row = await store.load(session, session_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Editing session not found")
+    editing = store.cached(row)
+    if editing is None:
+        # Started on another worker, or moved there since
+        run = (
+            await session.execute(
+                select(SolverRun).where(SolverRun.run_id == row.run_id)
+            )
+        ).scalar_one_or_none()
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found")
+        index = await _load_index(session, run, decode_genes(row.genes))
+        editing = store.restore(row, index)
+    return editing
+
+
+def _move(editing: EditingSession, move: MoveRequest) -> Tuple[int, np.ndarray]:
+    # (gene index, new gene) of a move
+    try:
+        g = editing.gene(move.lesson_id, move.part)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Lesson not in this schedule")
+    try:
+        new_gene = editing.index.gene_for_move(
+            g,
+            timeslot_id=move.timeslot_id,
+            room_id=move.room_id,
+            teacher_id=move.teacher_id,
+            week_parity=move.week_parity,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return g, new_gene
+
+
+@router.post("/runs/{run_id}/edit")
+async def start_editing(run_id: str, session: AsyncSession = Depends(get_session)):
+    """Loads a run's schedule into an editing session."""
+    run = (
+        await session.execute(select(SolverRun).where(SolverRun.run_id == run_id))
+    ).scalar_one_or_none()
+    if not run:
+        raise HTTPException(status_code=404, detail="Run not found")
+
+    editing = EditingSession(run_id, run.project_id, await _load_index(session, run))
+    await get_editing_sessions().add(session, editing)
+    return editing.summary()
+
+
+@router.get("/edit/{session_id}")
+async def get_editing(session_id: str, session: AsyncSession = Depends(get_session)):
+    editing = await _get_editing_session(session_id, session)
+    return {
+        **editing.summary(),
+        "assignments": editing.index.engine.results_from_genes(editing.index.genes),
+    }
+
+
+@router.post("/edit/{session_id}/validate")
+async def validate_move(
+    session_id: str, move: MoveRequest, session: AsyncSession = Depends(get_session)
+):
+    """Violation / soft cost change of a move, without making it."""
+    editing = await _get_editing_session(session_id, session)
+    g, new_gene = _move(editing, move)
+    return editing.index.check_move(g, new_gene)
+
+
+@router.post("/edit/{session_id}/apply")
+async def apply_move(
+    session_id: str, move: MoveRequest, session: AsyncSession = Depends(get_session)
+):
+    editing = await _get_editing_session(session_id, session)
+    g, new_gene = _move(editing, move)
+    # The index only takes the move once it is stored
+    genes = editing.index.genes.copy()
+    genes[g] = new_gene
+    if not await get_editing_sessions().save_move(session, editing, genes):
+        raise HTTPException(
+            status_code=409, detail="Session was edited concurrently, try again"
+        )
+    editing.moves += 1
+    return editing.index.check_move(g, new_gene, apply=True)
+
+
+@router.get("/edit/{session_id}/suggestions")
+async def suggest_moves(
+    session_id: str,
+    lesson_id: int,
+    part: int = 0,
+    k: int = Query(10, ge=1, le=100),
+    session: AsyncSession = Depends(get_session),
+):
+    """Best other placements of a lesson part, ranked by cost delta."""
+    editing = await _get_editing_session(session_id, session)
+    try:
+        g = editing.gene(lesson_id, part)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Lesson not in this schedule")
+    return {
+        "lesson_id": lesson_id,
+        "part": part,
+        "suggestions": editing.index.suggest(g, k),
+    }
+
+
+@router.delete("/edit/{session_id}")
+async def close_editing(session_id: str, session: AsyncSession = Depends(get_session)):
+    if not await get_editing_sessions().remove(session, session_id):
+        raise HTTPException(status_code=404, detail="Editing session not found")
+    return {"ok": True}
+
+
+@router.post("/projects/{project_id}/evaluate")
+async def evaluate_schedule(
+    project_id: int,
+    request: EvaluateRequest,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    Scores a schedule without running the solver: violation counts per
+    kind and soft cost per term, as the solver would see them.
+    """
+    if (request.run_id is None) == (request.assignments is None):
+        raise HTTPException(status_code=400, detail="Give either run_id or assignments")
+
+    weights = request.weights
+    sections = request.sections
+    if request.run_id is not None:
+        run = (
+            await session.execute(
+                select(SolverRun).where(
+                    SolverRun.run_id == request.run_id,
+                    SolverRun.project_id == project_id,
+                )
+            )
+        ).scalar_one_or_none()
+        if not run:
+            raise HTTPException(status_code=404, detail="Run not found in project")
+        if weights is None:
+            weights = json.loads(run.config_weights or "{}")
+        sections = run_sections(run)
+        rows = (await session.execute(run_assignments(request.run_id))).all()
+    else:
+        rows = [
+            (a.lesson_id, a.timeslot_id, a.room_id, a.teacher_id, a.week_parity)
+            for a in request.assignments
+        ]
+    engine = await load_solver_engine(
+        session, project_id, weights or {}, sections=sections
+    )
+    if engine is None:
+        raise HTTPException(status_code=409, detail="Project has no data to evaluate")
+
+    try:
+        genes = engine.genes_from_assignments(rows)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    return {
+        "project_id": project_id,
+        "run_id": request.run_id,
+        "weights": weights or {},
+        **engine.evaluate_breakdown(genes),
+    }
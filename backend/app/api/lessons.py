@@ -4,7 +4,19 @@ from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 from app.db import get_session
-from app.models import Lesson, Project
+from app.models import (
+    Classroom,
+    Course,
+    Lesson,
+    Project,
+    ProjectClassroomLink,
+    ProjectTeacherLink,
+    StudentGroup,
+    Teacher,
+    TeacherCourseLink,
+    TimeSlot,
+)
+from app.solver.masks import days_mask_to_bool
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -16,6 +28,18 @@ class LessonRead(BaseModel):
     group_name: str
     teacher_name: Optional[str]
     duration_slots: int
+    pinned_timeslot_id: Optional[int] = None
+    pinned_room_id: Optional[int] = None
+    pinned_teacher_id: Optional[int] = None
+
+
+class LessonPin(BaseModel):
+    # Fields left out keep their pin, null clears it. A lesson of 3+ units
+    # is split into parts; the timeslot pin places its first part and the
+    # solver still picks slots for the others.
+    timeslot_id: Optional[int] = None
+    room_id: Optional[int] = None
+    teacher_id: Optional[int] = None
 
 
 @router.get("/lessons/", response_model=List[LessonRead])
@@ -44,6 +68,93 @@ async def get_lessons(
                 group_name=l.group.name if l.group else "Unknown",
                 teacher_name=l.teacher.name if l.teacher else None,
                 duration_slots=l.duration_slots,
+                pinned_timeslot_id=l.pinned_timeslot_id,
+                pinned_room_id=l.pinned_room_id,
+                pinned_teacher_id=l.pinned_teacher_id,
             )
         )
     return output
+
+
+# LessonPin field -> (Lesson column, referenced model)
+PIN_FIELDS = {
+    "timeslot_id": ("pinned_timeslot_id", TimeSlot),
+    "room_id": ("pinned_room_id", Classroom),
+    "teacher_id": ("pinned_teacher_id", Teacher),
+}
+
+
+@router.put("/lessons/{lesson_id}/pin")
+async def pin_lesson(
+    lesson_id: int, pin: LessonPin, session: AsyncSession = Depends(get_session)
+):
+    """
+    Pins a lesson's timeslot, room and / or teacher; the solver keeps pinned
+    values as they are and only searches the rest. Only the first part of a
+    lesson with several is pinned to the timeslot. A room or teacher outside
+    the lesson's project, a room that does not fit the course or group, a
+    teacher not linked to the course, or a timeslot on a day the group does
+    not allow is rejected.
+    """
+    lesson = await session.get(Lesson, lesson_id)
+    if not lesson:
+        raise HTTPException(status_code=404, detail="Lesson not found")
+
+    course = await session.get(Course, lesson.course_id)
+    group = await session.get(StudentGroup, lesson.group_id)
+    for field, value in pin.model_dump(exclude_unset=True).items():
+        column, model = PIN_FIELDS[field]
+        target = None if value is None else await session.get(model, value)
+        if value is not None and not target:
+            raise HTTPException(
+                status_code=404, detail=f"{model.__name__} {value} not found"
+            )
+        if isinstance(target, Classroom):
+            link = {"project_id": lesson.project_id, "classroom_id": value}
+            if not await session.get(ProjectClassroomLink, link):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Room {value} is not in the lesson's project",
+                )
+            if target.type != course.required_room_type:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Room {value} is not a {course.required_room_type.value} "
+                    "room",
+                )
+            if target.capacity < group.population:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Room {value} is too small for {group.population} "
+                    "students",
+                )
+        if isinstance(target, Teacher):
+            link = {"project_id": lesson.project_id, "teacher_id": value}
+            if not await session.get(ProjectTeacherLink, link):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Teacher {value} is not in the lesson's project",
+                )
+            link = {"teacher_id": value, "course_id": lesson.course_id}
+            if not await session.get(TeacherCourseLink, link):
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Teacher {value} does not teach this course",
+                )
+        if isinstance(target, TimeSlot):
+            allowed = days_mask_to_bool(group.allowed_days_mask, 7)
+            if not allowed[target.day_of_week]:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"The group does not meet on day {target.day_of_week}",
+                )
+        setattr(lesson, column, value)
+
+    session.add(lesson)
+    await session.commit()
+    return {
+        "id": lesson.id,
+        "pinned_timeslot_id": lesson.pinned_timeslot_id,
+        "pinned_room_id": lesson.pinned_room_id,
+        "pinned_teacher_id": lesson.pinned_teacher_id,
+    }
@@ -1,20 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List
+from typing import Dict, List, Optional
+from pydantic import BaseModel
 from app.db import get_session
-from app.models import (
-    Project,
-    ScheduleResult,
-    Lesson,
-    Course,
-    Teacher,
-    StudentGroup,
-    Classroom,
-    TimeSlot,
-)
+from app.models import Project, SolverRun
+from app.services.listing import totals_cache
+from app.services.project_clone import clone_project
+from app.services.results import stream_results_json
 from sqlalchemy import desc
-from sqlalchemy.orm import selectinload
 
 router = APIRouter()
 
@@ -65,12 +60,11 @@ async def update_project(
 async def read_project_results(
     project_id: int, session: AsyncSession = Depends(get_session)
 ):
-    # Find the latest run_id for this project
+    # Latest completed run of this project (ix_solverrun_project_id_start_time)
     stmt = (
-        select(ScheduleResult.run_id)
-        .join(Lesson)
-        .where(Lesson.project_id == project_id)
-        .order_by(desc(ScheduleResult.id))
+        select(SolverRun.run_id)
+        .where(SolverRun.project_id == project_id, SolverRun.status == "completed")
+        .order_by(desc(SolverRun.start_time))
         .limit(1)
     )
     result = await session.execute(stmt)
@@ -79,56 +73,37 @@ async def read_project_results(
     if not latest_run_id:
         return []
 
-    # Fetch results for this run_id
-    stmt = (
-        select(ScheduleResult)
-        .where(ScheduleResult.run_id == latest_run_id)
-        .options(
-            selectinload(ScheduleResult.lesson).selectinload(Lesson.course),
-            selectinload(ScheduleResult.lesson).selectinload(Lesson.teacher),
-            selectinload(ScheduleResult.lesson).selectinload(Lesson.group),
-            selectinload(ScheduleResult.room),
-            selectinload(ScheduleResult.timeslot),
-        )
+    return StreamingResponse(
+        stream_results_json(latest_run_id, include_run_id=True),
+        media_type="application/json",
+    )
+
+
+class ProjectClone(BaseModel):
+    name: Optional[str] = None
+    # Copy the latest completed run's results as a warm start
+    copy_results: bool = False
+
+
+class ProjectCloneResult(BaseModel):
+    project: Project
+    run_id: Optional[str] = None
+    counts: Dict[str, int]
+
+
+@router.post("/projects/{project_id}/clone", response_model=ProjectCloneResult)
+async def clone_project_endpoint(
+    project_id: int,
+    clone_in: ProjectClone,
+    session: AsyncSession = Depends(get_session),
+):
+    cloned = await clone_project(
+        session, project_id, name=clone_in.name, copy_results=clone_in.copy_results
     )
-    results = (await session.execute(stmt)).scalars().all()
-
-    output = []
-    # Map times to slots (0-based index)
-    # Assuming standard slots: 08:00, 10:00, 12:00, 14:00, 16:00, 18:00, 20:00
-    slot_map = {
-        "08:00": 0,
-        "10:00": 1,
-        "12:00": 2,
-        "14:00": 3,
-        "16:00": 4,
-        "18:00": 5,
-        "20:00": 6,
-    }
-
-    for r in results:
-        start_time = r.timeslot.start_time if r.timeslot else "08:00"
-        slot_idx = slot_map.get(start_time, 0)
-
-        output.append(
-            {
-                "id": r.id,
-                "week_parity": r.week_parity,
-                "course_name": (
-                    r.lesson.course.name if r.lesson and r.lesson.course else "Unknown"
-                ),
-                "teacher_name": (
-                    r.lesson.teacher.name
-                    if r.lesson and r.lesson.teacher
-                    else "Unknown"
-                ),
-                "group_name": (
-                    r.lesson.group.name if r.lesson and r.lesson.group else "Unknown"
-                ),
-                "room_name": r.room.name if r.room else "Unknown",
-                "day": r.timeslot.day_of_week if r.timeslot else 0,
-                "slot": slot_idx,
-                "run_id": r.run_id,
-            }
-        )
-    return output
+    if cloned is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    await session.commit()
+    await session.refresh(cloned["project"])
+
+    totals_cache.invalidate()
+    return ProjectCloneResult(**cloned)
@@ -1,267 +1,392 @@
-from fastapi import APIRouter, Depends, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi.responses import Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy.exc import IntegrityError
 from app.db import get_session, engine as db_engine
-from sqlalchemy.orm import sessionmaker, selectinload
-from app.models import (
-    Lesson,
-    Classroom,
-    TimeSlot,
-    Course,
-    Teacher,
-    StudentGroup,
-    TeacherCourseLink,
-    TeacherEntranceLink,
-    ScheduleResult,
-    SolverRun,
-    ProjectClassroomLink,
-    ProjectTeacherLink,
-    ProjectCourseLink,
-    ProjectStudentGroupLink,
-)
+from sqlalchemy.orm import sessionmaker
+from app.models import SolverRun
 from app.solver.engine import SolverEngine
-import uuid
+from app.solver.backends import get_backend, backend_available, BACKENDS, ShouldStop
+from app.services.job_queue import get_job_queue, Job, CancellationCheck
+from app.services.run_status import RunStatusStore, get_run_status
+from app.services.persistence import save_run_results
+from app.services.results import stream_results_json
+from app.services.preprocessor import Preprocessor
+from app.services.solver_data import (
+    load_solver_inputs,
+    run_assignments,
+    run_sections,
+)
+from app.services.run_diff import diff_runs
+from app.services.results_cache import (
+    get_results_cache,
+    results_etag,
+    etag_matches,
+)
 import asyncio
 import json
 from datetime import datetime
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 
 router = APIRouter()
 
 
-# Global state for progress tracking (simple in-memory for now)
-solver_status = {}
-
-
 class SolveRequest(BaseModel):
     project_id: int
     weights: dict
     max_stagnant_generations: int = 150
+    room_assignment: str = "genome"  # "genome" or "matching"
+    backend: str = "ga"  # "ga", "cp" or "race"
+    time_limit_seconds: Optional[float] = None
+    priority: int = 0  # Higher runs first when the queue is busy
+    # Repair an existing run instead of solving from scratch: only lessons in
+    # a violation, listed here, or sharing a teacher or group with those are
+    # moved (GA backend with genome rooms only)
+    repair_run_id: Optional[str] = None
+    repair_lesson_ids: List[int] = []
+    repair_teacher_ids: List[int] = []
+    # Bin-pack small groups of a course into shared sections before solving
+    # (see GET /projects/{id}/sections)
+    merge_sections: bool = False
 
 
 async def run_solver_task(
-    run_id: str, project_id: int, weights: dict, max_stagnant_generations: int = 150
-):
-    solver_status[run_id] = {
-        "status": "running",
-        "progress": 0,
-        "best_cost": float("inf"),
-    }
+    run_id: str,
+    project_id: int,
+    weights: dict,
+    max_stagnant_generations: int = 150,
+    room_assignment: str = "genome",
+    backend: str = "ga",
+    time_limit_seconds: Optional[float] = None,
+    should_stop: ShouldStop = None,
+    repair_run_id: Optional[str] = None,
+    repair_lesson_ids: Optional[List[int]] = None,
+    repair_teacher_ids: Optional[List[int]] = None,
+    merge_sections: bool = False,
+) -> str:
+    """Runs the solver for a project. Returns the final run status."""
+    status_store = RunStatusStore(run_id)
 
     # Create a new session for the background task
     async_session = sessionmaker(db_engine, class_=AsyncSession, expire_on_commit=False)
 
-    async with async_session() as session:
-        print(f"Starting solver run {run_id} for project {project_id}...")
+    try:
+        async with async_session() as session:
+            print(f"Starting solver run {run_id} for project {project_id}...")
 
-        # Create SolverRun record
-        solver_run = SolverRun(
-            project_id=project_id,
-            run_id=run_id,
-            status="running",
-            start_time=datetime.utcnow(),
-            config_weights=json.dumps(weights),
-        )
-        session.add(solver_run)
-        await session.commit()
-
-        # Fetch Data
-        lessons = (
-            (
-                await session.execute(
-                    select(Lesson).where(Lesson.project_id == project_id)
-                )
+            # The SolverRun record is created as "queued" when the job is submitted
+            result = await session.execute(
+                select(SolverRun).where(SolverRun.run_id == run_id)
             )
-            .scalars()
-            .all()
-        )
+            solver_run = result.scalars().first()
+            if not solver_run:
+                solver_run = SolverRun(
+                    project_id=project_id,
+                    run_id=run_id,
+                    config_weights=json.dumps(weights),
+                )
+            solver_run.status = "running"
+            solver_run.start_time = datetime.utcnow()
+            session.add(solver_run)
+            await session.commit()
 
-        classrooms = (
-            (
-                await session.execute(
-                    select(Classroom)
-                    .join(ProjectClassroomLink)
-                    .where(ProjectClassroomLink.project_id == project_id)
+            inputs = await load_solver_inputs(session, project_id)
+            if inputs is None:
+                print("Missing data to run solver.")
+                solver_run.status = "failed"
+                solver_run.error = "Missing data"
+                solver_run.end_time = datetime.utcnow()
+                session.add(solver_run)
+                await session.commit()
+                return "failed"
+
+            sections = None
+            if repair_run_id is not None:
+                rows = (await session.execute(run_assignments(repair_run_id))).all()
+                repaired = await session.scalar(
+                    select(SolverRun).where(SolverRun.run_id == repair_run_id)
                 )
+                # A repair keeps the sections of the run it starts from
+                sections = run_sections(repaired) if repaired else None
+            if merge_sections:
+                merges = Preprocessor(
+                    inputs["courses"], inputs["groups"], inputs["classrooms"]
+                ).merge_small_sections(inputs["lessons"])
+                sections = [merge["lesson_ids"] for merge in merges]
+                print(
+                    f"Merged {sum(len(s) for s in sections)} lessons "
+                    f"into {len(sections)} sections."
+                )
+            if sections:
+                # Evaluate, editing and repairs of this run load them back
+                solver_run.sections = json.dumps(sections)
+                session.add(solver_run)
+                await session.commit()
+
+            solver = SolverEngine(
+                **inputs,
+                weights=weights,
+                room_assignment=room_assignment,
+                sections=sections,
             )
-            .scalars()
-            .all()
-        )
+            if repair_run_id is not None:
+                # Lessons or resources changed since that run are simply re-placed
+                free = solver.set_repair(
+                    solver.genes_from_assignments(rows, partial=True),
+                    lesson_ids=repair_lesson_ids or (),
+                    teacher_ids=repair_teacher_ids or (),
+                )
+                print(
+                    f"Repairing run {repair_run_id}: "
+                    f"{free} of {solver.num_genes} sub-lessons free."
+                )
 
-        timeslots = (await session.execute(select(TimeSlot))).scalars().all()
+            # Callback to update progress and the best-so-far snapshot
+            # (both throttled by the status store)
+            latest_best = {"genome": None, "cost": float("inf")}
 
-        courses = (
-            (
-                await session.execute(
-                    select(Course)
-                    .join(ProjectCourseLink)
-                    .where(ProjectCourseLink.project_id == project_id)
+            async def progress_callback(gen, best_cost, best_genome):
+                latest_best["genome"], latest_best["cost"] = best_genome, best_cost
+                await status_store.update_progress(gen, best_cost)
+                await status_store.update_snapshot(
+                    best_genome, best_cost, solver._build_result
                 )
-            )
-            .scalars()
-            .all()
-        )
 
-        # Load teachers with availability
-        teachers = (
-            (
-                await session.execute(
-                    select(Teacher)
-                    .join(ProjectTeacherLink)
-                    .where(ProjectTeacherLink.project_id == project_id)
-                    .options(selectinload(Teacher.availability_links))
-                )
+            solver_backend = get_backend(
+                backend,
+                solver,
+                generations=1000,
+                max_stagnant_generations=max_stagnant_generations,
+            )
+            results, best_cost = await solver_backend.solve(
+                time_limit=time_limit_seconds,
+                should_stop=should_stop,
+                progress_callback=progress_callback,
             )
-            .scalars()
-            .all()
-        )
 
-        groups = (
-            (
-                await session.execute(
-                    select(StudentGroup)
-                    .join(ProjectStudentGroupLink)
-                    .where(ProjectStudentGroupLink.project_id == project_id)
+            if not results:
+                # Keep the last best-so-far schedule of a cancelled / failed run
+                await status_store.update_snapshot(
+                    latest_best["genome"],
+                    latest_best["cost"],
+                    solver._build_result,
+                    force=True,
                 )
-            )
-            .scalars()
-            .all()
-        )
 
-        t_c_links = (await session.execute(select(TeacherCourseLink))).scalars().all()
-        t_e_links = (await session.execute(select(TeacherEntranceLink))).scalars().all()
+            if should_stop is not None and await should_stop():
+                print("Solver run cancelled.")
+                solver_run.status = "cancelled"
+                solver_run.end_time = datetime.utcnow()
+                solver_run.fitness_score = best_cost
+                session.add(solver_run)
+                await session.commit()
+                return "cancelled"
+
+            if results:
+                print(f"Solver finished. Saving {len(results)} assignments...")
+                import math
+
+                solver_run_values = {
+                    "status": "completed",
+                    "end_time": datetime.utcnow(),
+                    "fitness_score": best_cost,
+                    "satisfaction_percentage": min(
+                        100.0, 100.0 * math.exp(-best_cost / 50.0)
+                    ),
+                }
+                # Results and the SolverRun update go out in one transaction
+                await save_run_results(session, run_id, results, solver_run_values)
+                print("Done!")
+                return "completed"
+            else:
+                print("No solution found.")
+                solver_run.status = "failed"
+                solver_run.error = "No valid schedule found"
+                solver_run.end_time = datetime.utcnow()
+                session.add(solver_run)
+                await session.commit()
+                return "failed"
+    except asyncio.CancelledError:
+        # The worker is shutting down
+        await status_store.set_status("failed", error="Solver worker was stopped")
+        raise
+    except Exception as e:
+        # Engine, backend or database errors: the run must not stay "running"
+        print(f"Solver run {run_id} failed: {e}")
+        await status_store.set_status("failed", error=str(e))
+        return "failed"
+
+
+async def run_queued_job(job: Job, should_stop: CancellationCheck) -> str:
+    """Entry point for the solver worker pool."""
+    return await run_solver_task(
+        job["run_id"], job["project_id"], should_stop=should_stop, **job["payload"]
+    )
 
-        if not lessons or not classrooms or not timeslots:
-            print("Missing data to run solver.")
-            solver_status[run_id]["status"] = "failed"
-            solver_status[run_id]["error"] = "Missing data"
 
-            solver_run.status = "failed"
-            solver_run.end_time = datetime.utcnow()
-            session.add(solver_run)
-            await session.commit()
-            return
-
-        solver = SolverEngine(
-            lessons=lessons,
-            classrooms=classrooms,
-            timeslots=timeslots,
-            courses=courses,
-            teachers=teachers,
-            groups=groups,
-            teacher_course_links=t_c_links,
-            teacher_entrance_links=t_e_links,
-            weights=weights,
-        )
+@router.get("/status/{run_id}")
+async def get_status(run_id: str, session: AsyncSession = Depends(get_session)):
+    return await get_run_status(session, run_id)
 
-        # Callback to update progress
-        def progress_callback(gen, best_cost):
-            solver_status[run_id]["progress"] = gen
-            solver_status[run_id]["best_cost"] = best_cost
 
-        # Pass callback to solver (need to update SolverEngine to support this)
-        results, best_cost = await solver.run(
-            generations=1000, max_stagnant_generations=max_stagnant_generations
+@router.post("/solve")
+async def start_solver(
+    request: SolveRequest, session: AsyncSession = Depends(get_session)
+):
+    if request.backend not in BACKENDS:
+        raise HTTPException(
+            status_code=400, detail=f"Unknown backend. Expected one of {BACKENDS}"
         )
-
-        if results:
-            print(f"Solver finished. Saving {len(results)} assignments...")
-            for res in results:
-                db_res = ScheduleResult(
-                    run_id=run_id,
-                    lesson_id=res["lesson_id"],
-                    room_id=res["room_id"],
-                    timeslot_id=res["timeslot_id"],
-                    week_parity=res["week_parity"],
-                    teacher_id=res["teacher_id"],
-                )
-                session.add(db_res)
-
-            # Update SolverRun
-            solver_run.status = "completed"
-            solver_run.end_time = datetime.utcnow()
-            solver_run.fitness_score = best_cost
-            import math
-
-            solver_run.satisfaction_percentage = min(
-                100.0, 100.0 * math.exp(-best_cost / 50.0)
+    if not backend_available(request.backend):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Backend '{request.backend}' needs OR-Tools "
+            "(install the 'cp' extra)",
+        )
+    if request.repair_run_id is not None:
+        if request.backend != "ga" or request.room_assignment != "genome":
+            raise HTTPException(
+                status_code=400,
+                detail="Repair runs need the ga backend with genome rooms",
+            )
+        repaired = await session.scalar(
+            select(SolverRun.run_id).where(
+                SolverRun.run_id == request.repair_run_id,
+                SolverRun.project_id == request.project_id,
             )
+        )
+        if repaired is None:
+            raise HTTPException(status_code=404, detail="Run not found in project")
+    payload = request.model_dump(exclude={"project_id", "priority"})
+    run_id, created = await get_job_queue().enqueue(
+        request.project_id, payload, priority=request.priority
+    )
+    if not created:
+        return {"run_id": run_id, "status": "already_queued"}
 
-            session.add(solver_run)
-            await session.commit()
-            print("Done!")
-            solver_status[run_id]["status"] = "completed"
-        else:
-            print("No solution found.")
-            solver_status[run_id]["status"] = "failed"
-
-            solver_run.status = "failed"
-            solver_run.end_time = datetime.utcnow()
-            session.add(solver_run)
+    # Visible to /status from any worker process while the job waits.
+    # A worker may already have claimed the job and created the row.
+    exists = await session.scalar(
+        select(SolverRun.id).where(SolverRun.run_id == run_id)
+    )
+    if exists is None:
+        session.add(
+            SolverRun(
+                project_id=request.project_id,
+                run_id=run_id,
+                status="queued",
+                start_time=datetime.utcnow(),
+                config_weights=json.dumps(request.weights),
+            )
+        )
+        try:
             await session.commit()
+        except IntegrityError:
+            # Created by the worker in between (run_id is unique)
+            await session.rollback()
+    return {"run_id": run_id, "status": "queued"}
 
 
-@router.get("/status/{run_id}")
-async def get_status(run_id: str):
-    return solver_status.get(run_id, {"status": "not_found"})
+@router.get("/projects/{project_id}/sections")
+async def preview_sections(
+    project_id: int,
+    min_population: Optional[int] = None,
+    session: AsyncSession = Depends(get_session),
+):
+    """
+    The sections a merge_sections run would build: small groups of a course
+    bin-packed together, without solving anything.
+    """
+    inputs = await load_solver_inputs(session, project_id)
+    if inputs is None:
+        raise HTTPException(status_code=409, detail="Project has no data")
+    merges = Preprocessor(
+        inputs["courses"], inputs["groups"], inputs["classrooms"]
+    ).merge_small_sections(inputs["lessons"], min_population=min_population)
+    return {
+        "project_id": project_id,
+        "lessons": len(inputs["lessons"]),
+        "merged_lessons": sum(len(m["lesson_ids"]) for m in merges),
+        "sections": merges,
+    }
 
 
-@router.post("/solve")
-async def start_solver(request: SolveRequest, background_tasks: BackgroundTasks):
-    run_id = str(uuid.uuid4())
-    background_tasks.add_task(
-        run_solver_task,
-        run_id,
-        request.project_id,
-        request.weights,
-        request.max_stagnant_generations,
-    )
-    return {"run_id": run_id, "status": "started"}
+@router.post("/runs/{run_id}/cancel")
+async def cancel_run(run_id: str):
+    status = await get_job_queue().cancel(run_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Run not found")
+    if status == "cancelled":
+        # Never reached a worker, so nothing else will update the run
+        await RunStatusStore(run_id).set_status("cancelled")
+    return {"run_id": run_id, "status": status}
 
 
-@router.get("/results/{run_id}")
-async def get_results(run_id: str, session: AsyncSession = Depends(get_session)):
-    stmt = (
-        select(ScheduleResult)
-        .where(ScheduleResult.run_id == run_id)
-        .options(
-            selectinload(ScheduleResult.lesson).selectinload(Lesson.course),
-            selectinload(ScheduleResult.lesson).selectinload(Lesson.group),
-            selectinload(ScheduleResult.room),
-            selectinload(ScheduleResult.timeslot),
-            selectinload(ScheduleResult.teacher),
+@router.get("/runs/{run_a}/diff/{run_b}")
+async def get_run_diff(
+    run_a: str, run_b: str, session: AsyncSession = Depends(get_session)
+):
+    found = await session.execute(
+        select(SolverRun.run_id, SolverRun.project_id).where(
+            SolverRun.run_id.in_([run_a, run_b])
         )
     )
-    results = (await session.execute(stmt)).scalars().all()
-
-    output = []
-    slot_map = {"08:00": 0, "10:00": 1, "12:00": 2, "14:00": 3, "16:00": 4}
-
-    for r in results:
-        start_time = r.timeslot.start_time if r.timeslot else "08:00"
-        slot_idx = slot_map.get(start_time, 0)
-
-        output.append(
-            {
-                "id": r.id,
-                "week_parity": r.week_parity,
-                "course_name": (
-                    r.lesson.course.name if r.lesson and r.lesson.course else "Unknown"
-                ),
-                "teacher_name": (r.teacher.name if r.teacher else "Unknown"),
-                "group_name": (
-                    r.lesson.group.name if r.lesson and r.lesson.group else "Unknown"
-                ),
-                "room_name": r.room.name if r.room else "Unknown",
-                "day": r.timeslot.day_of_week if r.timeslot else 0,
-                "slot": slot_idx,
-            }
+    projects = dict(found.all())
+    missing = {run_a, run_b} - set(projects)
+    if missing:
+        raise HTTPException(
+            status_code=404, detail=f"Run not found: {', '.join(sorted(missing))}"
+        )
+    if projects[run_a] != projects[run_b]:
+        raise HTTPException(
+            status_code=400, detail="Runs of different projects cannot be compared"
         )
-    return output
+    return await diff_runs(session, run_a, run_b)
 
 
-@router.get("/projects/{project_id}/runs", response_model=List[SolverRun])
+@router.get("/results/{run_id}")
+async def get_results(
+    run_id: str,
+    if_none_match: Optional[str] = Header(default=None),
+    session: AsyncSession = Depends(get_session),
+):
+    # ETags are only issued for completed runs, whose results never change.
+    # A cached body means the run completed, so no database access is needed.
+    etag = results_etag(run_id)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    not_modified = etag_matches(if_none_match, etag)
+
+    cache = get_results_cache()
+    body = cache.get(run_id)
+    if body is not None:
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        return Response(body, media_type="application/json", headers=headers)
+
+    status = await session.scalar(
+        select(SolverRun.status).where(SolverRun.run_id == run_id)
+    )
+    if status == "completed":
+        if not_modified:
+            return Response(status_code=304, headers=headers)
+        body = b"".join([chunk async for chunk in stream_results_json(run_id)])
+        cache.put(run_id, body)
+        return Response(body, media_type="application/json", headers=headers)
+
+    # Still running (or stopped early): serves the best-so-far snapshot
+    return StreamingResponse(
+        stream_results_json(run_id, snapshot_fallback=True),
+        media_type="application/json",
+    )
+
+
+@router.get(
+    "/projects/{project_id}/runs",
+    response_model=List[SolverRun],
+    response_model_exclude={"best_snapshot"},
+)
 async def get_project_runs(
     project_id: int, session: AsyncSession = Depends(get_session)
 ):
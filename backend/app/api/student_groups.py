@@ -1,9 +1,10 @@
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import select, func, col
+from sqlmodel import select
+from sqlalchemy import Integer, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from app.db import get_session
 from app.models import (
     StudentGroup,
@@ -11,6 +12,15 @@ from app.models import (
     Degree,
     ProjectStudentGroupLink,
 )
+from app.solver.masks import days_to_mask
+from app.services.links import (
+    BulkLinkRequest,
+    BulkLinkResult,
+    bulk_link,
+    bulk_unlink,
+    sync_link_ids,
+)
+from app.services.listing import paginate, name_search, next_after_id, totals_cache
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -32,6 +42,7 @@ class PaginatedStudentGroups(BaseModel):
     total: int
     page: int
     size: int
+    next_after_id: Optional[int] = None
 
 
 class StudentGroupCreate(BaseModel):
@@ -51,60 +62,82 @@ class StudentGroupUpdate(BaseModel):
     course_ids: Optional[List[int]] = None
 
 
+def _group_columns():
+    """Group columns plus its course ids aggregated in the database."""
+    course_ids = (
+        select(
+            func.array_agg(
+                aggregate_order_by(
+                    StudentGroupCourseLink.course_id, StudentGroupCourseLink.course_id
+                )
+            )
+        )
+        .where(StudentGroupCourseLink.group_id == StudentGroup.id)
+        .scalar_subquery()
+    )
+    return (
+        StudentGroup.id,
+        StudentGroup.name,
+        StudentGroup.degree,
+        StudentGroup.population,
+        StudentGroup.allowed_days,
+        StudentGroup.created_at,
+        StudentGroup.updated_at,
+        func.coalesce(course_ids, array([], type_=Integer)).label("course_ids"),
+    )
+
+
+async def _read_group(session: AsyncSession, group_id: int) -> StudentGroupRead:
+    row = (
+        await session.execute(
+            select(*_group_columns()).where(StudentGroup.id == group_id)
+        )
+    ).one()
+    return StudentGroupRead(**row._mapping)
+
+
 @router.get("/student_groups/", response_model=PaginatedStudentGroups)
 async def get_student_groups(
     project_id: Optional[int] = Query(None),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Keyset cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    offset = (page - 1) * size
-
     if project_id:
         query = (
-            select(StudentGroup)
+            select(StudentGroup.id)
             .join(ProjectStudentGroupLink)
             .where(ProjectStudentGroupLink.project_id == project_id)
         )
     else:
-        query = select(StudentGroup)
+        query = select(StudentGroup.id)
 
     if search:
-        query = query.where(col(StudentGroup.name).contains(search))
-
-    # Count total
-    count_stmt = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_stmt)
-    total = total_result.scalar_one()
-
-    # Fetch items
-    stmt = (
-        query.options(selectinload(StudentGroup.course_links))
-        .offset(offset)
-        .limit(size)
+        query = query.where(name_search(StudentGroup.name, search))
+
+    stmt, total = await paginate(
+        session,
+        query,
+        StudentGroup.id,
+        ("student_groups", project_id, search),
+        page,
+        size,
+        after_id,
+    )
+    # Course ids are aggregated per page row, not loaded as ORM objects
+    stmt = stmt.with_only_columns(*_group_columns())
+    rows = (await session.execute(stmt)).all()
+    output = [StudentGroupRead(**row._mapping) for row in rows]
+
+    return PaginatedStudentGroups(
+        items=output,
+        total=total,
+        page=page,
+        size=size,
+        next_after_id=next_after_id(output, size),
     )
-
-    result = await session.execute(stmt)
-    groups = result.scalars().all()
-
-    output = []
-    for g in groups:
-        c_ids = [link.course_id for link in g.course_links]
-        output.append(
-            StudentGroupRead(
-                id=g.id,
-                name=g.name,
-                degree=g.degree,
-                population=g.population,
-                allowed_days=g.allowed_days,
-                course_ids=c_ids,
-                created_at=g.created_at,
-                updated_at=g.updated_at,
-            )
-        )
-
-    return PaginatedStudentGroups(items=output, total=total, page=page, size=size)
 
 
 @router.post("/student_groups/", response_model=StudentGroupRead)
@@ -116,6 +149,7 @@ async def create_student_group(
         degree=group_in.degree,
         population=group_in.population,
         allowed_days=group_in.allowed_days,
+        allowed_days_mask=days_to_mask(group_in.allowed_days),
     )
     session.add(group)
     await session.commit()
@@ -134,23 +168,8 @@ async def create_student_group(
 
     await session.commit()
 
-    # Reload
-    stmt = (
-        select(StudentGroup)
-        .where(StudentGroup.id == group.id)
-        .options(selectinload(StudentGroup.course_links))
-    )
-    group = (await session.execute(stmt)).scalar_one()
-
-    c_ids = [link.course_id for link in group.course_links]
-    return StudentGroupRead(
-        id=group.id,
-        name=group.name,
-        degree=group.degree,
-        population=group.population,
-        allowed_days=group.allowed_days,
-        course_ids=c_ids,
-    )
+    totals_cache.invalidate("student_groups")
+    return await _read_group(session, group.id)
 
 
 @router.put("/student_groups/{group_id}", response_model=StudentGroupRead)
@@ -159,12 +178,7 @@ async def update_student_group(
     group_in: StudentGroupUpdate,
     session: AsyncSession = Depends(get_session),
 ):
-    stmt = (
-        select(StudentGroup)
-        .where(StudentGroup.id == group_id)
-        .options(selectinload(StudentGroup.course_links))
-    )
-    group = (await session.execute(stmt)).scalar_one_or_none()
+    group = await session.get(StudentGroup, group_id)
 
     if not group:
         raise HTTPException(status_code=404, detail="StudentGroup not found")
@@ -177,37 +191,23 @@ async def update_student_group(
         group.population = group_in.population
     if group_in.allowed_days is not None:
         group.allowed_days = group_in.allowed_days
+        group.allowed_days_mask = days_to_mask(group_in.allowed_days)
 
     if group_in.course_ids is not None:
-        # Clear existing
-        for link in group.course_links:
-            await session.delete(link)
-
-        # Add new
-        for c_id in group_in.course_ids:
-            link = StudentGroupCourseLink(group_id=group.id, course_id=c_id)
-            session.add(link)
+        # Only the added / removed course links are written
+        await sync_link_ids(
+            session,
+            StudentGroupCourseLink,
+            {"group_id": group.id},
+            "course_id",
+            group_in.course_ids,
+        )
 
     session.add(group)
     await session.commit()
 
-    # Reload
-    stmt = (
-        select(StudentGroup)
-        .where(StudentGroup.id == group_id)
-        .options(selectinload(StudentGroup.course_links))
-    )
-    group = (await session.execute(stmt)).scalar_one()
-
-    c_ids = [link.course_id for link in group.course_links]
-    return StudentGroupRead(
-        id=group.id,
-        name=group.name,
-        degree=group.degree,
-        population=group.population,
-        allowed_days=group.allowed_days,
-        course_ids=c_ids,
-    )
+    totals_cache.invalidate("student_groups")
+    return await _read_group(session, group_id)
 
 
 @router.delete("/student_groups/{group_id}")
@@ -219,9 +219,34 @@ async def delete_student_group(
         raise HTTPException(status_code=404, detail="StudentGroup not found")
     await session.delete(group)
     await session.commit()
+    totals_cache.invalidate("student_groups")
     return {"ok": True}
 
 
+@router.post("/student_groups/link", response_model=BulkLinkResult)
+async def bulk_link_student_groups(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_link(
+        session, StudentGroup, ProjectStudentGroupLink, "group_id", request
+    )
+    await session.commit()
+    totals_cache.invalidate("student_groups")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
+@router.post("/student_groups/unlink", response_model=BulkLinkResult)
+async def bulk_unlink_student_groups(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_unlink(
+        session, StudentGroup, ProjectStudentGroupLink, "group_id", request
+    )
+    await session.commit()
+    totals_cache.invalidate("student_groups")
+    return BulkLinkResult(project_id=request.project_id, count=count)
+
+
 @router.post("/student_groups/{group_id}/link")
 async def link_group_to_project(
     group_id: int, project_id: int, session: AsyncSession = Depends(get_session)
@@ -237,4 +262,5 @@ async def link_group_to_project(
     link = ProjectStudentGroupLink(project_id=project_id, group_id=group_id)
     session.add(link)
     await session.commit()
+    totals_cache.invalidate("student_groups")
     return {"ok": True}
@@ -1,9 +1,10 @@
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlmodel import select, func, col
+from sqlmodel import select
+from sqlalchemy import Integer, func
+from sqlalchemy.dialects.postgresql import aggregate_order_by, array
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
 from app.db import get_session
 from app.models import (
     Teacher,
@@ -11,10 +12,21 @@ from app.models import (
     ProjectTeacherLink,
     TeacherCourseLink,
 )
+from app.services.availability import refresh_teacher_masks
+from app.services.links import (
+    BulkLinkRequest,
+    BulkLinkResult,
+    bulk_link,
+    bulk_unlink,
+    sync_link_ids,
+)
+from app.services.listing import paginate, name_search, next_after_id, totals_cache
 from pydantic import BaseModel
 
 router = APIRouter()
 
+EMPTY_IDS = array([], type_=Integer)
+
 
 class TeacherRead(BaseModel):
     id: int
@@ -30,6 +42,7 @@ class PaginatedTeachers(BaseModel):
     total: int
     page: int
     size: int
+    next_after_id: Optional[int] = None
 
 
 class TeacherCreate(BaseModel):
@@ -46,71 +59,103 @@ class TeacherUpdate(BaseModel):
     project_id: Optional[int] = None
 
 
+def _teacher_columns(project_id: Optional[int]):
+    """
+    Teacher columns plus its link ids aggregated in the database, one row
+    per teacher. Availability is per project; the global view has none.
+    """
+    if project_id:
+        slots = (
+            select(
+                func.array_agg(
+                    aggregate_order_by(
+                        TeacherAvailability.timeslot_id, TeacherAvailability.timeslot_id
+                    )
+                )
+            )
+            .where(
+                TeacherAvailability.teacher_id == Teacher.id,
+                TeacherAvailability.project_id == project_id,
+            )
+            .scalar_subquery()
+        )
+    else:
+        slots = None
+    course_ids = (
+        select(
+            func.array_agg(
+                aggregate_order_by(
+                    TeacherCourseLink.course_id, TeacherCourseLink.course_id
+                )
+            )
+        )
+        .where(TeacherCourseLink.teacher_id == Teacher.id)
+        .scalar_subquery()
+    )
+    return (
+        Teacher.id,
+        Teacher.name,
+        Teacher.created_at,
+        Teacher.updated_at,
+        func.coalesce(slots, EMPTY_IDS).label("available_slots"),
+        func.coalesce(course_ids, EMPTY_IDS).label("course_ids"),
+    )
+
+
+async def _read_teacher(
+    session: AsyncSession, teacher_id: int, project_id: Optional[int]
+) -> TeacherRead:
+    row = (
+        await session.execute(
+            select(*_teacher_columns(project_id)).where(Teacher.id == teacher_id)
+        )
+    ).one()
+    return TeacherRead(**row._mapping)
+
+
 @router.get("/teachers/", response_model=PaginatedTeachers)
 async def get_teachers(
     project_id: Optional[int] = Query(None),
     page: int = Query(1, ge=1),
     size: int = Query(10, ge=1, le=100),
     search: Optional[str] = Query(None),
+    after_id: Optional[int] = Query(None, description="Keyset cursor"),
     session: AsyncSession = Depends(get_session),
 ):
-    offset = (page - 1) * size
-
     if project_id:
         # Fetch teachers linked to project
         query = (
-            select(Teacher)
+            select(Teacher.id)
             .join(ProjectTeacherLink)
             .where(ProjectTeacherLink.project_id == project_id)
         )
     else:
-        query = select(Teacher)
+        query = select(Teacher.id)
 
     if search:
-        query = query.where(col(Teacher.name).contains(search))
-
-    # Count total
-    count_stmt = select(func.count()).select_from(query.subquery())
-    total_result = await session.execute(count_stmt)
-    total = total_result.scalar_one()
-
-    # Fetch items
-    stmt = (
-        query.options(
-            selectinload(Teacher.availability_links),
-            selectinload(Teacher.course_links),
-        )
-        .offset(offset)
-        .limit(size)
+        query = query.where(name_search(Teacher.name, search))
+
+    stmt, total = await paginate(
+        session,
+        query,
+        Teacher.id,
+        ("teachers", project_id, search),
+        page,
+        size,
+        after_id,
+    )
+    # Link ids are aggregated per page row, not loaded as ORM objects
+    stmt = stmt.with_only_columns(*_teacher_columns(project_id))
+    rows = (await session.execute(stmt)).all()
+    output = [TeacherRead(**row._mapping) for row in rows]
+
+    return PaginatedTeachers(
+        items=output,
+        total=total,
+        page=page,
+        size=size,
+        next_after_id=next_after_id(output, size),
     )
-
-    result = await session.execute(stmt)
-    teachers = result.scalars().all()
-
-    output = []
-    for t in teachers:
-        if project_id:
-            slots = [
-                link.timeslot_id
-                for link in t.availability_links
-                if link.project_id == project_id
-            ]
-        else:
-            slots = []  # Global view doesn't show project-specific availability
-
-        c_ids = [link.course_id for link in t.course_links]
-        output.append(
-            TeacherRead(
-                id=t.id,
-                name=t.name,
-                available_slots=slots,
-                course_ids=c_ids,
-                created_at=t.created_at,
-                updated_at=t.updated_at,
-            )
-        )
-
-    return PaginatedTeachers(items=output, total=total, page=page, size=size)
 
 
 @router.post("/teachers/", response_model=TeacherRead)
@@ -142,31 +187,12 @@ async def create_teacher(
         )
         session.add(link)
 
+    if teacher_in.available_slots and teacher_in.project_id:
+        await refresh_teacher_masks(session, teacher_in.project_id, [teacher.id])
     await session.commit()
 
-    # Reload with links
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher.id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one()
-
-    if teacher_in.project_id:
-        slots = [
-            link.timeslot_id
-            for link in teacher.availability_links
-            if link.project_id == teacher_in.project_id
-        ]
-    else:
-        slots = []
-
-    c_ids = [link.course_id for link in teacher.course_links]
-    return TeacherRead(
-        id=teacher.id, name=teacher.name, available_slots=slots, course_ids=c_ids
-    )
+    totals_cache.invalidate("teachers")
+    return await _read_teacher(session, teacher.id, teacher_in.project_id)
 
 
 @router.put("/teachers/{teacher_id}", response_model=TeacherRead)
@@ -175,14 +201,7 @@ async def update_teacher(
     teacher_in: TeacherUpdate,
     session: AsyncSession = Depends(get_session),
 ):
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher_id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one_or_none()
+    teacher = await session.get(Teacher, teacher_id)
 
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
@@ -190,211 +209,65 @@ async def update_teacher(
     if teacher_in.name is not None:
         teacher.name = teacher_in.name
 
+    # Links are synced by set difference: only changed rows are touched
     if teacher_in.available_slots is not None and teacher_in.project_id:
-        # Clear existing for THIS project
-        # Note: modifying the list in place while iterating is dangerous, so we collect to delete first
-        to_delete = [
-            link
-            for link in teacher.availability_links
-            if link.project_id == teacher_in.project_id
-        ]
-        for link in to_delete:
-            await session.delete(link)
-
-        # Add new
-        for ts_id in teacher_in.available_slots:
-            link = TeacherAvailability(
-                teacher_id=teacher.id,
-                timeslot_id=ts_id,
-                project_id=teacher_in.project_id,
-            )
-            session.add(link)
-
-    if teacher_in.course_ids is not None:
-        # Clear existing
-        for link in teacher.course_links:
-            await session.delete(link)
-
-        # Add new
-        for c_id in teacher_in.course_ids:
-            link = TeacherCourseLink(teacher_id=teacher.id, course_id=c_id)
-            session.add(link)
-
-    session.add(teacher)
-    await session.commit()
-
-    # Reload
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher_id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one()
-
-    if teacher_in.project_id:
-        slots = [
-            link.timeslot_id
-            for link in teacher.availability_links
-            if link.project_id == teacher_in.project_id
-        ]
-    else:
-        slots = []
-
-    c_ids = [link.course_id for link in teacher.course_links]
-    return TeacherRead(
-        id=teacher.id, name=teacher.name, available_slots=slots, course_ids=c_ids
-    )
-
-
-@router.get("/teachers/", response_model=List[TeacherRead])
-async def get_teachers(
-    project_id: Optional[int] = Query(None),
-    session: AsyncSession = Depends(get_session),
-):
-    if project_id:
-        # Fetch teachers linked to project
-        stmt = (
-            select(Teacher)
-            .join(ProjectTeacherLink)
-            .where(ProjectTeacherLink.project_id == project_id)
-            .options(
-                selectinload(Teacher.availability_links),
-                selectinload(Teacher.course_links),
-            )
-        )
-    else:
-        stmt = select(Teacher).options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
+        added, removed = await sync_link_ids(
+            session,
+            TeacherAvailability,
+            {"teacher_id": teacher.id, "project_id": teacher_in.project_id},
+            "timeslot_id",
+            teacher_in.available_slots,
         )
+        if added or removed:
+            await refresh_teacher_masks(session, teacher_in.project_id, [teacher.id])
 
-    result = await session.execute(stmt)
-    teachers = result.scalars().all()
-
-    output = []
-    for t in teachers:
-        slots = [link.timeslot_id for link in t.availability_links]
-        c_ids = [link.course_id for link in t.course_links]
-        output.append(
-            TeacherRead(id=t.id, name=t.name, available_slots=slots, course_ids=c_ids)
+    if teacher_in.course_ids is not None:
+        await sync_link_ids(
+            session,
+            TeacherCourseLink,
+            {"teacher_id": teacher.id},
+            "course_id",
+            teacher_in.course_ids,
         )
-    return output
 
-
-@router.post("/teachers/", response_model=TeacherRead)
-async def create_teacher(
-    teacher_in: TeacherCreate, session: AsyncSession = Depends(get_session)
-):
-    teacher = Teacher(name=teacher_in.name)
     session.add(teacher)
     await session.commit()
-    await session.refresh(teacher)
-
-    if teacher_in.available_slots:
-        for ts_id in teacher_in.available_slots:
-            link = TeacherAvailability(teacher_id=teacher.id, timeslot_id=ts_id)
-            session.add(link)
-
-    if teacher_in.course_ids:
-        for c_id in teacher_in.course_ids:
-            link = TeacherCourseLink(teacher_id=teacher.id, course_id=c_id)
-            session.add(link)
-
-    if teacher_in.project_id:
-        link = ProjectTeacherLink(
-            project_id=teacher_in.project_id, teacher_id=teacher.id
-        )
-        session.add(link)
-
-    await session.commit()
-
-    # Reload with links
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher.id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one()
 
-    slots = [link.timeslot_id for link in teacher.availability_links]
-    c_ids = [link.course_id for link in teacher.course_links]
-    return TeacherRead(
-        id=teacher.id, name=teacher.name, available_slots=slots, course_ids=c_ids
-    )
+    totals_cache.invalidate("teachers")
+    return await _read_teacher(session, teacher_id, teacher_in.project_id)
 
 
-@router.put("/teachers/{teacher_id}", response_model=TeacherRead)
-async def update_teacher(
-    teacher_id: int,
-    teacher_in: TeacherUpdate,
-    session: AsyncSession = Depends(get_session),
-):
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher_id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one_or_none()
-
+@router.delete("/teachers/{teacher_id}")
+async def delete_teacher(teacher_id: int, session: AsyncSession = Depends(get_session)):
+    teacher = await session.get(Teacher, teacher_id)
     if not teacher:
         raise HTTPException(status_code=404, detail="Teacher not found")
+    await session.delete(teacher)
+    await session.commit()
+    totals_cache.invalidate("teachers")
+    return {"ok": True}
 
-    if teacher_in.name is not None:
-        teacher.name = teacher_in.name
-
-    if teacher_in.available_slots is not None:
-        # Clear existing
-        for link in teacher.availability_links:
-            await session.delete(link)
-
-        # Add new
-        for ts_id in teacher_in.available_slots:
-            link = TeacherAvailability(teacher_id=teacher.id, timeslot_id=ts_id)
-            session.add(link)
-
-    if teacher_in.course_ids is not None:
-        # Clear existing
-        for link in teacher.course_links:
-            await session.delete(link)
 
-        # Add new
-        for c_id in teacher_in.course_ids:
-            link = TeacherCourseLink(teacher_id=teacher.id, course_id=c_id)
-            session.add(link)
-
-    session.add(teacher)
+@router.post("/teachers/link", response_model=BulkLinkResult)
+async def bulk_link_teachers(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_link(session, Teacher, ProjectTeacherLink, "teacher_id", request)
     await session.commit()
+    totals_cache.invalidate("teachers")
+    return BulkLinkResult(project_id=request.project_id, count=count)
 
-    # Reload
-    stmt = (
-        select(Teacher)
-        .where(Teacher.id == teacher_id)
-        .options(
-            selectinload(Teacher.availability_links), selectinload(Teacher.course_links)
-        )
-    )
-    teacher = (await session.execute(stmt)).scalar_one()
 
-    slots = [link.timeslot_id for link in teacher.availability_links]
-    c_ids = [link.course_id for link in teacher.course_links]
-    return TeacherRead(
-        id=teacher.id, name=teacher.name, available_slots=slots, course_ids=c_ids
+@router.post("/teachers/unlink", response_model=BulkLinkResult)
+async def bulk_unlink_teachers(
+    request: BulkLinkRequest, session: AsyncSession = Depends(get_session)
+):
+    count = await bulk_unlink(
+        session, Teacher, ProjectTeacherLink, "teacher_id", request
     )
-
-
-@router.delete("/teachers/{teacher_id}")
-async def delete_teacher(teacher_id: int, session: AsyncSession = Depends(get_session)):
-    teacher = await session.get(Teacher, teacher_id)
-    if not teacher:
-        raise HTTPException(status_code=404, detail="Teacher not found")
-    await session.delete(teacher)
     await session.commit()
-    return {"ok": True}
+    totals_cache.invalidate("teachers")
+    return BulkLinkResult(project_id=request.project_id, count=count)
 
 
 @router.post("/teachers/{teacher_id}/link")
@@ -413,6 +286,7 @@ async def link_teacher_to_project(
     link = ProjectTeacherLink(project_id=project_id, teacher_id=teacher_id)
     session.add(link)
     await session.commit()
+    totals_cache.invalidate("teachers")
     return {"ok": True}
 
 
@@ -439,4 +313,5 @@ async def remove_teacher_course_link(
     if link:
         await session.delete(link)
         await session.commit()
+    totals_cache.invalidate("teachers")
     return {"ok": True}
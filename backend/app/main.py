@@ -1,6 +1,11 @@
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from app.db import init_db
+from app.services.job_queue import (
+    get_job_queue,
+    SolverWorkerPool,
+    SOLVER_WORKERS_IN_API,
+)
 from app.api import (
     upload,
     classrooms,
@@ -12,6 +17,7 @@ from app.api import (
     terms,
     timeslots,
     lessons,
+    editing,
 )
 from fastapi.middleware.cors import CORSMiddleware
 
@@ -19,7 +25,14 @@ from fastapi.middleware.cors import CORSMiddleware
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     await init_db()
+    # Solver runs are only enqueued here; `python -m app.worker` solves them
+    worker_pool = None
+    if SOLVER_WORKERS_IN_API:
+        worker_pool = SolverWorkerPool(get_job_queue(), solver.run_queued_job)
+        worker_pool.start()
     yield
+    if worker_pool:
+        await worker_pool.stop()
 
 
 app = FastAPI(lifespan=lifespan, title="University Semester Scheduler API")
@@ -42,6 +55,7 @@ app.include_router(terms.router, prefix="/api", tags=["Terms"])
 app.include_router(timeslots.router, prefix="/api", tags=["TimeSlots"])
 app.include_router(lessons.router, prefix="/api", tags=["Lessons"])
 app.include_router(solver.router, prefix="/api", tags=["Solver"])
+app.include_router(editing.router, prefix="/api", tags=["Editing"])
 
 
 @app.get("/")
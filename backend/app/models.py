@@ -1,5 +1,6 @@
 from typing import Optional, List
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from enum import Enum
 
 
@@ -87,6 +88,19 @@ class TeacherAvailability(SQLModel, table=True):
     project: "Project" = Relationship()
 
 
+class TeacherAvailabilityMask(SQLModel, table=True):
+    # TeacherAvailability rows of one teacher in one project as a bitmap
+    # (see app.solver.masks), kept in sync by the teacher endpoints; derived
+    # data, so it goes away with its teacher or project
+    teacher_id: int = Field(
+        foreign_key="teacher.id", primary_key=True, ondelete="CASCADE"
+    )
+    project_id: int = Field(
+        foreign_key="project.id", primary_key=True, ondelete="CASCADE"
+    )
+    slots_mask: bytes
+
+
 class Teacher(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
@@ -96,7 +110,10 @@ class Teacher(SQLModel, table=True):
 
     course_links: List["TeacherCourseLink"] = Relationship(back_populates="teacher")
     entrance_links: List["TeacherEntranceLink"] = Relationship(back_populates="teacher")
-    lessons: List["Lesson"] = Relationship(back_populates="teacher")
+    lessons: List["Lesson"] = Relationship(
+        back_populates="teacher",
+        sa_relationship_kwargs={"foreign_keys": "Lesson.teacher_id"},
+    )
     availability_links: List["TeacherAvailability"] = Relationship(
         back_populates="teacher"
     )
@@ -105,7 +122,7 @@ class Teacher(SQLModel, table=True):
 
 class TeacherCourseLink(SQLModel, table=True):
     teacher_id: int = Field(foreign_key="teacher.id", primary_key=True)
-    course_id: int = Field(foreign_key="course.id", primary_key=True)
+    course_id: int = Field(foreign_key="course.id", primary_key=True, index=True)
 
     teacher: Teacher = Relationship(back_populates="course_links")
     course: Course = Relationship(back_populates="teacher_links")
@@ -121,28 +138,32 @@ class TeacherEntranceLink(SQLModel, table=True):
 
 class ProjectTeacherLink(SQLModel, table=True):
     project_id: int = Field(foreign_key="project.id", primary_key=True)
-    teacher_id: int = Field(foreign_key="teacher.id", primary_key=True)
+    teacher_id: int = Field(foreign_key="teacher.id", primary_key=True, index=True)
     project: "Project" = Relationship(back_populates="teacher_links")
     teacher: "Teacher" = Relationship(back_populates="project_links")
 
 
 class ProjectCourseLink(SQLModel, table=True):
     project_id: int = Field(foreign_key="project.id", primary_key=True)
-    course_id: int = Field(foreign_key="course.id", primary_key=True)
+    course_id: int = Field(foreign_key="course.id", primary_key=True, index=True)
     project: "Project" = Relationship(back_populates="course_links")
     course: "Course" = Relationship(back_populates="project_links")
 
 
 class ProjectStudentGroupLink(SQLModel, table=True):
     project_id: int = Field(foreign_key="project.id", primary_key=True)
-    group_id: int = Field(foreign_key="studentgroup.id", primary_key=True)
+    group_id: int = Field(
+        foreign_key="studentgroup.id", primary_key=True, index=True
+    )
     project: "Project" = Relationship(back_populates="group_links")
     group: "StudentGroup" = Relationship(back_populates="project_links")
 
 
 class ProjectClassroomLink(SQLModel, table=True):
     project_id: int = Field(foreign_key="project.id", primary_key=True)
-    classroom_id: int = Field(foreign_key="classroom.id", primary_key=True)
+    classroom_id: int = Field(
+        foreign_key="classroom.id", primary_key=True, index=True
+    )
     project: "Project" = Relationship(back_populates="classroom_links")
     classroom: "Classroom" = Relationship(back_populates="project_links")
 
@@ -153,6 +174,8 @@ class StudentGroup(SQLModel, table=True):
     degree: Degree
     population: int
     allowed_days: Optional[str] = Field(default=None)  # e.g., "0,2,4"
+    # allowed_days as a bitmap (bit d = day_of_week d), None = all days
+    allowed_days_mask: Optional[int] = Field(default=None)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -165,7 +188,7 @@ class StudentGroup(SQLModel, table=True):
 
 class StudentGroupCourseLink(SQLModel, table=True):
     group_id: int = Field(foreign_key="studentgroup.id", primary_key=True)
-    course_id: int = Field(foreign_key="course.id", primary_key=True)
+    course_id: int = Field(foreign_key="course.id", primary_key=True, index=True)
 
     group: StudentGroup = Relationship(back_populates="course_links")
     course: Course = Relationship(back_populates="student_group_links")
@@ -194,30 +217,113 @@ class Project(SQLModel, table=True):
 
 
 class SolverRun(SQLModel, table=True):
+    # Latest runs of a project
+    __table_args__ = (
+        Index("ix_solverrun_project_id_start_time", "project_id", "start_time"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     project_id: int = Field(foreign_key="project.id")
     run_id: str = Field(index=True, unique=True)  # UUID
-    status: str = Field(default="running")  # running, completed, failed
+    # queued, running, completed, failed, cancelled
+    status: str = Field(default="running")
     start_time: datetime = Field(default_factory=datetime.utcnow)
     end_time: Optional[datetime] = None
     config_weights: str  # JSON string of weights
     fitness_score: float = 0.0
     satisfaction_percentage: float = 0.0
+    # Live progress, written by the worker running the solve
+    progress: int = Field(default=0)  # Generations completed
+    best_cost: Optional[float] = None
+    error: Optional[str] = None
+    progress_updated_at: Optional[datetime] = None
+    # Best-so-far schedule while running: JSON list of
+    # [lesson_id, timeslot_id, room_id, teacher_id, week_parity]
+    best_snapshot: Optional[str] = None
+    snapshot_cost: Optional[float] = None
+    snapshot_valid: bool = Field(default=False)
+    snapshot_at: Optional[datetime] = None
+    # JSON list of the lesson_id lists solved as one section (small groups of
+    # a course merged together); evaluate, editing and repair load it back
+    sections: Optional[str] = None
 
     project: Project = Relationship(back_populates="solver_runs")
 
 
+class SolverJob(SQLModel, table=True):
+    # Only one queued/running job per project (dedupe)
+    __table_args__ = (
+        Index(
+            "ix_solverjob_active_project",
+            "project_id",
+            unique=True,
+            postgresql_where=text("status IN ('queued', 'running')"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    run_id: str = Field(index=True, unique=True)  # UUID, same as SolverRun.run_id
+    project_id: int = Field(foreign_key="project.id")
+    priority: int = Field(default=0)  # Higher runs first
+    # queued, running, completed, failed, cancelled
+    status: str = Field(default="queued")
+    payload: str  # JSON string of solver options
+    cancel_requested: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    # Refreshed by the worker while running; a stale lease means the worker died
+    heartbeat_at: Optional[datetime] = None
+
+
+class EditSession(SQLModel, table=True):
+    # A manual editing session on a run's schedule, stored so any API worker
+    # can serve it (see app.services.editing)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    session_id: str = Field(index=True, unique=True)  # UUID
+    run_id: str = Field(index=True)
+    project_id: int = Field(foreign_key="project.id", ondelete="CASCADE")
+    genes: bytes  # Edited (num_genes, 4) gene array as int32
+    moves: int = Field(default=0)  # Applied moves, bumped on every save
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class ImportJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: str = Field(index=True, unique=True)  # UUID
+    project_id: int = Field(foreign_key="project.id")
+    filename: str
+    status: str = Field(default="queued")  # queued, running, completed, failed
+    progress: Optional[str] = None  # JSON: {sheet: rows processed}
+    summary: Optional[str] = None  # JSON: rows, inserted and timings per sheet
+    error: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
 class Lesson(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
-    project_id: Optional[int] = Field(default=None, foreign_key="project.id")
+    project_id: Optional[int] = Field(
+        default=None, foreign_key="project.id", index=True
+    )
     course_id: int = Field(foreign_key="course.id")
     teacher_id: Optional[int] = Field(default=None, foreign_key="teacher.id")
     group_id: int = Field(foreign_key="studentgroup.id")
     duration_slots: int = Field(default=1)  # Usually 1 slot (2 hours)
+    # Placement agreed outside the solver, kept as-is in every run. The
+    # timeslot is that of the lesson's first part when it has several.
+    pinned_timeslot_id: Optional[int] = Field(default=None, foreign_key="timeslot.id")
+    pinned_room_id: Optional[int] = Field(default=None, foreign_key="classroom.id")
+    pinned_teacher_id: Optional[int] = Field(default=None, foreign_key="teacher.id")
 
     project: Optional[Project] = Relationship(back_populates="lessons")
     course: Course = Relationship(back_populates="lessons")
-    teacher: Optional[Teacher] = Relationship(back_populates="lessons")
+    teacher: Optional[Teacher] = Relationship(
+        back_populates="lessons",
+        sa_relationship_kwargs={"foreign_keys": "Lesson.teacher_id"},
+    )
     group: StudentGroup = Relationship(back_populates="lessons")
     schedule_results: List["ScheduleResult"] = Relationship(back_populates="lesson")
 
@@ -230,6 +336,11 @@ class TimeSlot(SQLModel, table=True):
 
 
 class ScheduleResult(SQLModel, table=True):
+    # A run's results, and lesson lookups within a run (diffs, clones)
+    __table_args__ = (
+        Index("ix_scheduleresult_run_id_lesson_id", "run_id", "lesson_id"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     run_id: str  # UUID for the solver run
     lesson_id: int = Field(foreign_key="lesson.id")
@@ -0,0 +1,51 @@
+from typing import Iterable
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import TeacherAvailability, TeacherAvailabilityMask
+from app.solver.masks import slots_to_mask
+
+
+async def refresh_teacher_masks(
+    session: AsyncSession, project_id: int, teacher_ids: Iterable[int]
+):
+    """
+    Rebuilds the availability bitmaps of the given teachers in a project from
+    their TeacherAvailability rows. Runs in the caller's transaction.
+    """
+    teacher_ids = list(teacher_ids)
+    if not teacher_ids:
+        return
+    rows = await session.execute(
+        select(
+            TeacherAvailability.teacher_id,
+            func.array_agg(TeacherAvailability.timeslot_id),
+        )
+        .where(
+            TeacherAvailability.project_id == project_id,
+            TeacherAvailability.teacher_id.in_(teacher_ids),
+        )
+        .group_by(TeacherAvailability.teacher_id)
+    )
+    masks = [
+        {"teacher_id": t_id, "project_id": project_id, "slots_mask": slots_to_mask(ids)}
+        for t_id, ids in rows
+    ]
+
+    if masks:
+        stmt = pg_insert(TeacherAvailabilityMask).values(masks)
+        await session.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["teacher_id", "project_id"],
+                set_={"slots_mask": stmt.excluded.slots_mask},
+            )
+        )
+    # Teachers left without any availability in this project
+    emptied = set(teacher_ids) - {m["teacher_id"] for m in masks}
+    if emptied:
+        await session.execute(
+            delete(TeacherAvailabilityMask).where(
+                TeacherAvailabilityMask.project_id == project_id,
+                TeacherAvailabilityMask.teacher_id.in_(emptied),
+            )
+        )
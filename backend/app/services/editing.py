@@ -0,0 +1,177 @@
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional
+import numpy as np
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import EditSession
+from app.solver.occupancy import OccupancyIndex
+
+# Indexes of editing sessions kept in memory per process (least recently used
+# dropped); the sessions themselves are stored in the database
+EDIT_SESSION_LIMIT = int(os.getenv("EDIT_SESSION_LIMIT", "32"))
+# Sessions untouched for this many seconds are deleted
+EDIT_SESSION_TTL = float(os.getenv("EDIT_SESSION_TTL", str(24 * 3600)))
+
+
+class EditingSession:
+    """A run's schedule loaded into an OccupancyIndex for manual edits."""
+
+    def __init__(
+        self,
+        run_id: str,
+        project_id: int,
+        index: OccupancyIndex,
+        session_id: Optional[str] = None,
+        moves: int = 0,
+    ):
+        self.session_id = session_id or str(uuid.uuid4())
+        self.run_id = run_id
+        self.project_id = project_id
+        self.index = index
+        self.moves = moves
+
+    def gene(self, lesson_id: int, part: int = 0) -> int:
+        """Gene index of a lesson's part (lessons of 3+ units have several)."""
+        genes = self.index.engine.lesson_genes.get(lesson_id, [])
+        if not 0 <= part < len(genes):
+            raise KeyError(lesson_id)
+        return genes[part]
+
+    def summary(self) -> dict:
+        return {
+            "session_id": self.session_id,
+            "run_id": self.run_id,
+            "project_id": self.project_id,
+            "violations": int(self.index.violations),
+            "soft_cost": float(self.index.soft_cost),
+            "moves": self.moves,
+        }
+
+
+def encode_genes(genes: np.ndarray) -> bytes:
+    return np.ascontiguousarray(genes, dtype=np.int32).tobytes()
+
+
+def decode_genes(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.int32).reshape(-1, 4).astype(int)
+
+
+class EditingSessionStore:
+    """
+    Editing sessions stored as EditSession rows, so every API worker serves
+    every session. The OccupancyIndex built for a session is cached per
+    process and reused while the stored move count matches; a worker that
+    missed moves made elsewhere rebuilds it from the stored genes.
+    """
+
+    def __init__(self, limit: int = EDIT_SESSION_LIMIT, ttl: float = EDIT_SESSION_TTL):
+        self.limit = limit
+        self.ttl = ttl
+        self._sessions: "OrderedDict[str, EditingSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def add(self, db: AsyncSession, editing: EditingSession):
+        now = datetime.utcnow()
+        await db.execute(
+            delete(EditSession).where(
+                EditSession.updated_at < now - timedelta(seconds=self.ttl)
+            )
+        )
+        db.add(
+            EditSession(
+                session_id=editing.session_id,
+                run_id=editing.run_id,
+                project_id=editing.project_id,
+                genes=encode_genes(editing.index.genes),
+                moves=editing.moves,
+                created_at=now,
+                updated_at=now,
+            )
+        )
+        await db.commit()
+        self._cache(editing)
+
+    async def load(self, db: AsyncSession, session_id: str) -> Optional[EditSession]:
+        result = await db.execute(
+            select(EditSession).where(EditSession.session_id == session_id)
+        )
+        return result.scalar_one_or_none()
+
+    def cached(self, row: EditSession) -> Optional[EditingSession]:
+        """This process's index of a stored session, if it is up to date."""
+        with self._lock:
+            editing = self._sessions.get(row.session_id)
+            if editing is None or editing.moves != row.moves:
+                return None
+            self._sessions.move_to_end(row.session_id)
+            return editing
+
+    def restore(self, row: EditSession, index: OccupancyIndex) -> EditingSession:
+        editing = EditingSession(
+            row.run_id,
+            row.project_id,
+            index,
+            session_id=row.session_id,
+            moves=row.moves,
+        )
+        self._cache(editing)
+        return editing
+
+    async def save_move(
+        self, db: AsyncSession, editing: EditingSession, genes: np.ndarray
+    ) -> bool:
+        """
+        Stores genes as editing's schedule after its next move, before the
+        move is applied to the index. False (and the cached index dropped) if
+        another request moved the session first.
+        """
+        result = await db.execute(
+            update(EditSession)
+            .where(
+                EditSession.session_id == editing.session_id,
+                EditSession.moves == editing.moves,
+            )
+            .values(
+                genes=encode_genes(genes),
+                moves=editing.moves + 1,
+                updated_at=datetime.utcnow(),
+            )
+        )
+        await db.commit()
+        if result.rowcount == 1:
+            return True
+        self.forget(editing.session_id)
+        return False
+
+    async def remove(self, db: AsyncSession, session_id: str) -> bool:
+        self.forget(session_id)
+        result = await db.execute(
+            delete(EditSession).where(EditSession.session_id == session_id)
+        )
+        await db.commit()
+        return result.rowcount > 0
+
+    def forget(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _cache(self, editing: EditingSession):
+        with self._lock:
+            self._sessions[editing.session_id] = editing
+            self._sessions.move_to_end(editing.session_id)
+            while len(self._sessions) > self.limit:
+                self._sessions.popitem(last=False)
+
+
+_store: Optional[EditingSessionStore] = None
+
+
+def get_editing_sessions() -> EditingSessionStore:
+    global _store
+    if _store is None:
+        _store = EditingSessionStore()
+    return _store
@@ -0,0 +1,154 @@
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Optional
+from fastapi import UploadFile
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db import engine as db_engine
+from app.models import ImportJob
+from app.services.parser import ExcelParser
+from app.services.importer import DataImporter
+
+# Directory for spooled uploads (system temp dir if unset)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Bytes read from the request per chunk while spooling
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+async def spool_upload(file: UploadFile) -> str:
+    """Copies an upload to a temp file chunk by chunk. Returns its path."""
+    suffix = os.path.splitext(file.filename)[1].lower()
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while chunk := await file.read(SPOOL_CHUNK_SIZE):
+                await asyncio.to_thread(out.write, chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path
+
+
+def _file_batches(path: str) -> Iterable:
+    parser = ExcelParser()
+    if path.endswith(".zip"):
+        return parser.iter_bundle(path)
+    if path.endswith(".xlsx"):
+        return parser.iter_workbook(path)
+    # Legacy .xls is not supported by the streaming reader
+    with open(path, "rb") as f:
+        return parser.parse_file(f.read()).items()
+
+
+class ParseError(Exception):
+    pass
+
+
+async def _parse_in_thread(path: str) -> AsyncIterator:
+    """
+    Yields parsed batches while all file reading and pandas work runs in a
+    worker thread, one batch at a time, so the event loop stays responsive.
+    """
+    done = object()
+    try:
+        batches = iter(await asyncio.to_thread(_file_batches, path))
+        while (batch := await asyncio.to_thread(next, batches, done)) is not done:
+            yield batch
+    except Exception as e:
+        # Parsing is interleaved with the import; tell parse errors apart
+        # from database errors
+        raise ParseError(str(e)) from e
+
+
+class ImportJobStore:
+    """Writes an import job's state in its own short transactions."""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.progress: Dict[str, int] = {}
+        self._session_factory = sessionmaker(
+            db_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    async def create(self, project_id: int, filename: str):
+        async with self._session_factory() as session:
+            session.add(
+                ImportJob(job_id=self.job_id, project_id=project_id, filename=filename)
+            )
+            await session.commit()
+
+    async def update_progress(self, sheet: str, rows: int):
+        self.progress[sheet] = rows
+        await self._write(progress=json.dumps(self.progress))
+
+    async def set_status(self, status: str, **values):
+        await self._write(status=status, **values)
+
+    async def _write(self, **values):
+        async with self._session_factory() as session:
+            await session.execute(
+                update(ImportJob)
+                .where(ImportJob.job_id == self.job_id)
+                .values(**values)
+            )
+            await session.commit()
+
+
+async def create_import_job(project_id: int, filename: str) -> str:
+    job_id = str(uuid.uuid4())
+    await ImportJobStore(job_id).create(project_id, filename)
+    return job_id
+
+
+async def run_import_job(job_id: str, project_id: int, path: str):
+    """Background task: parses the spooled file and imports it."""
+    store = ImportJobStore(job_id)
+    session_factory = sessionmaker(
+        db_engine, class_=AsyncSession, expire_on_commit=False
+    )
+    try:
+        await store.set_status("running", started_at=datetime.utcnow())
+        async with session_factory() as session:
+            summary = await DataImporter(session, project_id).run_batches(
+                _parse_in_thread(path), progress_callback=store.update_progress
+            )
+        await store.set_status(
+            "completed",
+            summary=json.dumps(summary),
+            finished_at=datetime.utcnow(),
+        )
+    except Exception as e:
+        prefix = "Error parsing file" if isinstance(e, ParseError) else "Import failed"
+        print(f"Import job {job_id} failed: {e}")
+        await store.set_status(
+            "failed", error=f"{prefix}: {e}", finished_at=datetime.utcnow()
+        )
+    finally:
+        os.remove(path)
+
+
+async def get_import_job(
+    session: AsyncSession, job_id: str
+) -> Optional[Dict[str, Any]]:
+    job = (
+        await session.execute(select(ImportJob).where(ImportJob.job_id == job_id))
+    ).scalar_one_or_none()
+    if not job:
+        return None
+    return {
+        "job_id": job.job_id,
+        "project_id": job.project_id,
+        "filename": job.filename,
+        "status": job.status,
+        "progress": json.loads(job.progress) if job.progress else {},
+        "summary": json.loads(job.summary) if job.summary else None,
+        "error": job.error,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
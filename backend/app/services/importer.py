@@ -0,0 +1,253 @@
+import time
+from typing import (
+    Any,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+    Union,
+)
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import (
+    Teacher,
+    Classroom,
+    Course,
+    StudentGroup,
+    EntranceTerm,
+    TeacherCourseLink,
+    StudentGroupCourseLink,
+    SemesterType,
+    Lesson,
+)
+from app.services.parser import SHEETS
+from app.services.listing import totals_cache
+from app.solver.masks import days_to_mask
+
+# Sheets in dependency order (see ExcelParser.SHEETS)
+SHEET_ORDER = list(SHEETS.values())
+
+# (sheet key, parsed rows)
+Batch = Tuple[str, List[Dict[str, Any]]]
+
+# Rows per multi-row INSERT ... ON CONFLICT statement
+LINK_BATCH_SIZE = 5000
+
+
+async def _aiter(items):
+    for item in items:
+        yield item
+
+
+class DataImporter:
+    """
+    Writes parsed workbook data (see ExcelParser) in a handful of set-based
+    statements inside one transaction.
+
+    Named entities (teachers, classrooms, courses, groups) are matched by
+    name: existing ids are preloaded with one query per table and only the
+    missing names are inserted. Links and entrance terms use
+    INSERT ... ON CONFLICT DO NOTHING on their primary keys. All references
+    (teacher/course/group names) are then resolved from in-memory maps.
+    """
+
+    def __init__(self, session: AsyncSession, project_id: int):
+        self.session = session
+        self.project_id = project_id
+        self.timings: Dict[str, float] = {}
+        self.inserted: Dict[str, int] = {}
+        self.rows: Dict[str, int] = {}
+        # name -> id maps shared by all batches of one import
+        self.teacher_ids: Dict[str, int] = {}
+        self.classroom_ids: Dict[str, int] = {}
+        self.course_ids: Dict[str, int] = {}
+        self.group_ids: Dict[str, int] = {}
+
+    async def run(self, data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, Any]:
+        return await self.run_batches(
+            [(key, data[key]) for key in SHEET_ORDER if key in data]
+        )
+
+    async def run_batches(
+        self,
+        batches: Union[Iterable[Batch], AsyncIterable[Batch]],
+        progress_callback: Optional[Callable[[str, int], Awaitable[None]]] = None,
+    ) -> Dict[str, Any]:
+        """
+        Imports (sheet key, rows) batches, e.g. from ExcelParser.iter_workbook.
+        Batches must arrive in SHEET_ORDER; one sheet may span many batches.
+        progress_callback(sheet, rows done in that sheet) is awaited after
+        each batch.
+        """
+        handlers = {
+            "teachers": lambda rows: self._upsert_named(
+                Teacher, rows, self.teacher_ids
+            ),
+            "classrooms": lambda rows: self._upsert_named(
+                Classroom, rows, self.classroom_ids
+            ),
+            "courses": lambda rows: self._upsert_named(Course, rows, self.course_ids),
+            "student_groups": self._save_groups,
+            "teacher_courses": self._save_teacher_courses,
+            "student_group_courses": self._save_group_courses,
+            "lessons": self._save_lessons,
+        }
+        if not hasattr(batches, "__aiter__"):
+            batches = _aiter(batches)
+        try:
+            async for key, rows in batches:
+                self.rows[key] = self.rows.get(key, 0) + len(rows)
+                await self._timed(key, handlers[key](rows))
+                if progress_callback:
+                    await progress_callback(key, self.rows[key])
+            await self.session.commit()
+            totals_cache.invalidate()
+        except Exception:
+            await self.session.rollback()
+            raise
+
+        return {"rows": self.rows, "inserted": self.inserted, "timings": self.timings}
+
+    async def _timed(self, sheet: str, coro):
+        start = time.perf_counter()
+        result = await coro
+        elapsed = time.perf_counter() - start
+        self.timings[sheet] = round(self.timings.get(sheet, 0.0) + elapsed, 4)
+        return result
+
+    def _count(self, key: str, n: int):
+        self.inserted[key] = self.inserted.get(key, 0) + n
+
+    async def _name_map(self, model, names) -> Dict[str, int]:
+        if not names:
+            return {}
+        result = await self.session.execute(
+            select(model.name, model.id).where(model.name.in_(names))
+        )
+        # First row wins if the table already holds duplicate names
+        name_map = {}
+        for name, id_ in result.all():
+            name_map.setdefault(name, id_)
+        return name_map
+
+    async def _upsert_named(
+        self, model, rows: List[Dict[str, Any]], name_map: Dict[str, int]
+    ):
+        """Inserts rows whose name is not known yet and adds them to name_map."""
+        # Last occurrence of a name in the batch wins
+        by_name = {row["name"]: row for row in rows}
+        name_map.update(
+            await self._name_map(model, [n for n in by_name if n not in name_map])
+        )
+
+        columns = set(model.__table__.c.keys())
+        missing = [
+            {k: v for k, v in row.items() if k in columns}
+            for name, row in by_name.items()
+            if name not in name_map
+        ]
+        if missing:
+            result = await self.session.execute(
+                insert(model).returning(model.name, model.id), missing
+            )
+            name_map.update(dict(result.all()))
+
+        self._count(model.__tablename__, len(missing))
+
+    async def _save_groups(self, rows: List[Dict[str, Any]]):
+        for g in rows:
+            g["allowed_days_mask"] = days_to_mask(g.get("allowed_days"))
+        terms = {
+            int(f"{g['entrance_year']}{g['entrance_semester']}"): g for g in rows
+        }
+        if terms:
+            await self.session.execute(
+                pg_insert(EntranceTerm)
+                .values(
+                    [
+                        {
+                            "id": term_id,
+                            "year": g["entrance_year"],
+                            "semester": SemesterType(g["entrance_semester"]),
+                        }
+                        for term_id, g in terms.items()
+                    ]
+                )
+                .on_conflict_do_nothing(index_elements=["id"])
+            )
+        await self._upsert_named(StudentGroup, rows, self.group_ids)
+
+    async def _insert_links(self, model, values: List[Dict[str, int]], key: str):
+        self._count(key, 0)
+        # Chunked to stay well below the driver's bind parameter limit
+        for start in range(0, len(values), LINK_BATCH_SIZE):
+            result = await self.session.execute(
+                pg_insert(model)
+                .values(values[start : start + LINK_BATCH_SIZE])
+                .on_conflict_do_nothing()
+            )
+            self._count(key, result.rowcount)
+
+    async def _save_teacher_courses(self, rows):
+        teacher_ids, course_ids = self.teacher_ids, self.course_ids
+        await self._resolve_missing(Teacher, teacher_ids, rows, "teacher_name")
+        await self._resolve_missing(Course, course_ids, rows, "course_name")
+        values = {
+            (teacher_ids[r["teacher_name"]], course_ids[r["course_name"]])
+            for r in rows
+            if r["teacher_name"] in teacher_ids and r["course_name"] in course_ids
+        }
+        await self._insert_links(
+            TeacherCourseLink,
+            [{"teacher_id": t, "course_id": c} for t, c in values],
+            "teachercourselink",
+        )
+
+    async def _save_group_courses(self, rows):
+        group_ids, course_ids = self.group_ids, self.course_ids
+        await self._resolve_missing(StudentGroup, group_ids, rows, "group_name")
+        await self._resolve_missing(Course, course_ids, rows, "course_name")
+        values = {
+            (group_ids[r["group_name"]], course_ids[r["course_name"]])
+            for r in rows
+            if r["group_name"] in group_ids and r["course_name"] in course_ids
+        }
+        await self._insert_links(
+            StudentGroupCourseLink,
+            [{"group_id": g, "course_id": c} for g, c in values],
+            "studentgroupcourselink",
+        )
+
+    async def _save_lessons(self, rows):
+        teacher_ids, course_ids = self.teacher_ids, self.course_ids
+        group_ids = self.group_ids
+        await self._resolve_missing(Course, course_ids, rows, "course_name")
+        await self._resolve_missing(StudentGroup, group_ids, rows, "group_name")
+        await self._resolve_missing(Teacher, teacher_ids, rows, "teacher_name")
+
+        values = [
+            {
+                "project_id": self.project_id,
+                "course_id": course_ids[r["course_name"]],
+                "teacher_id": teacher_ids.get(r["teacher_name"]),
+                "group_id": group_ids[r["group_name"]],
+                "duration_slots": r["duration_slots"],
+            }
+            for r in rows
+            if r["course_name"] in course_ids and r["group_name"] in group_ids
+        ]
+        if values:
+            await self.session.execute(insert(Lesson), values)
+        self._count("lesson", len(values))
+
+    async def _resolve_missing(self, model, name_map, rows, key):
+        # References to entities that exist in the database but were not in
+        # this workbook's own sheet
+        missing = {r[key] for r in rows if r[key] and r[key] not in name_map}
+        if missing:
+            name_map.update(await self._name_map(model, list(missing)))
@@ -0,0 +1,433 @@
+import asyncio
+import heapq
+import itertools
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from sqlalchemy import select, update, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db import engine as db_engine, DATABASE_URL
+from app.models import SolverJob, SolverRun
+
+# Settings
+# SOLVER_QUEUE: "postgres" (durable, shared between processes) or "memory"
+SOLVER_QUEUE = os.getenv(
+    "SOLVER_QUEUE", "postgres" if DATABASE_URL.startswith("postgresql") else "memory"
+)
+# Solver jobs run at the same time (worker processes of app.worker)
+SOLVER_MAX_WORKERS = int(os.getenv("SOLVER_MAX_WORKERS", "2"))
+# Whether the API process runs solver jobs itself instead of app.worker. Only
+# for development: a solve holds up the API's event loop. The memory queue
+# cannot be shared with other processes, so with it this is always on.
+SOLVER_WORKERS_IN_API = SOLVER_QUEUE == "memory" or (
+    os.getenv("SOLVER_WORKERS_IN_API", "0") == "1"
+)
+SOLVER_POLL_INTERVAL = float(os.getenv("SOLVER_POLL_INTERVAL", "1.0"))
+# A running job whose heartbeat is older than SOLVER_LEASE_TIMEOUT seconds is
+# considered lost (worker crashed or was redeployed) and marked failed
+SOLVER_LEASE_TIMEOUT = float(os.getenv("SOLVER_LEASE_TIMEOUT", "120"))
+SOLVER_HEARTBEAT_INTERVAL = float(os.getenv("SOLVER_HEARTBEAT_INTERVAL", "15"))
+
+ACTIVE_STATUSES = ("queued", "running")
+
+# A claimed job: {"run_id": ..., "project_id": ..., "payload": {...}}
+Job = Dict[str, Any]
+
+
+class SolverJobQueue:
+    """
+    Admission control for solver runs.
+
+    Jobs are ordered by priority (higher first) then by submission order. A
+    project can only have one queued or running job at a time; submitting
+    again returns the existing run_id.
+    """
+
+    async def enqueue(
+        self, project_id: int, payload: Dict[str, Any], priority: int = 0
+    ) -> Tuple[str, bool]:
+        """Returns (run_id, created). created is False for a deduplicated job."""
+        raise NotImplementedError
+
+    async def claim(self) -> Optional[Job]:
+        """Marks the next queued job as running and returns it."""
+        raise NotImplementedError
+
+    async def finish(self, run_id: str, status: str):
+        raise NotImplementedError
+
+    async def heartbeat(self, run_id: str):
+        """Renews the lease of a running job."""
+        raise NotImplementedError
+
+    async def expire_stale(self, lease_timeout: float) -> List[str]:
+        """
+        Fails running jobs whose lease expired, freeing their project for new
+        submissions. Returns their run_ids.
+        """
+        raise NotImplementedError
+
+    async def cancel(self, run_id: str) -> Optional[str]:
+        """
+        Cancels a queued job or asks a running one to stop.
+        Returns the job status afterwards, or None if the job is unknown.
+        """
+        raise NotImplementedError
+
+    async def is_cancel_requested(self, run_id: str) -> bool:
+        raise NotImplementedError
+
+    async def get_status(self, run_id: str) -> Optional[str]:
+        raise NotImplementedError
+
+
+class InMemoryJobQueue(SolverJobQueue):
+    """Process-local fallback for development. Jobs are lost on restart."""
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    async def enqueue(self, project_id, payload, priority=0):
+        for run_id, job in self._jobs.items():
+            if job["project_id"] == project_id and job["status"] in ACTIVE_STATUSES:
+                return run_id, False
+
+        run_id = str(uuid.uuid4())
+        self._jobs[run_id] = {
+            "project_id": project_id,
+            "payload": payload,
+            "status": "queued",
+            "cancel_requested": False,
+        }
+        heapq.heappush(self._heap, (-priority, next(self._counter), run_id))
+        return run_id, True
+
+    async def claim(self):
+        while self._heap:
+            _, _, run_id = heapq.heappop(self._heap)
+            job = self._jobs[run_id]
+            if job["status"] != "queued":
+                # Cancelled while waiting
+                continue
+            job["status"] = "running"
+            return {
+                "run_id": run_id,
+                "project_id": job["project_id"],
+                "payload": job["payload"],
+            }
+        return None
+
+    async def finish(self, run_id, status):
+        if run_id in self._jobs:
+            self._jobs[run_id]["status"] = status
+
+    async def heartbeat(self, run_id):
+        pass
+
+    async def expire_stale(self, lease_timeout):
+        # Jobs live and die with this process, so none can be orphaned
+        return []
+
+    async def cancel(self, run_id):
+        job = self._jobs.get(run_id)
+        if not job:
+            return None
+        if job["status"] == "queued":
+            job["status"] = "cancelled"
+        elif job["status"] == "running":
+            job["cancel_requested"] = True
+        return job["status"]
+
+    async def is_cancel_requested(self, run_id):
+        job = self._jobs.get(run_id)
+        return bool(job and job["cancel_requested"])
+
+    async def get_status(self, run_id):
+        job = self._jobs.get(run_id)
+        return job["status"] if job else None
+
+
+class PostgresJobQueue(SolverJobQueue):
+    """
+    Durable queue on the solverjob table. Workers in any process claim jobs
+    with SELECT ... FOR UPDATE SKIP LOCKED, and the partial unique index on
+    project_id enforces the per-project dedupe.
+    """
+
+    def __init__(self):
+        self._session_factory = sessionmaker(
+            db_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    async def enqueue(self, project_id, payload, priority=0):
+        run_id = str(uuid.uuid4())
+        stmt = (
+            pg_insert(SolverJob)
+            .values(
+                run_id=run_id,
+                project_id=project_id,
+                priority=priority,
+                status="queued",
+                payload=json.dumps(payload),
+                cancel_requested=False,
+                created_at=datetime.utcnow(),
+            )
+            .on_conflict_do_nothing(
+                index_elements=["project_id"],
+                index_where=text("status IN ('queued', 'running')"),
+            )
+            .returning(SolverJob.run_id)
+        )
+        async with self._session_factory() as session:
+            while True:
+                inserted = (await session.execute(stmt)).scalar_one_or_none()
+                await session.commit()
+                if inserted:
+                    return inserted, True
+
+                existing = await session.execute(
+                    select(SolverJob.run_id).where(
+                        SolverJob.project_id == project_id,
+                        SolverJob.status.in_(ACTIVE_STATUSES),
+                    )
+                )
+                active = existing.scalar_one_or_none()
+                if active:
+                    return active, False
+                # The conflicting job finished in between; try again
+
+    async def claim(self):
+        next_job = (
+            select(SolverJob.id)
+            .where(SolverJob.status == "queued")
+            .order_by(SolverJob.priority.desc(), SolverJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        stmt = (
+            update(SolverJob)
+            .where(SolverJob.id == next_job)
+            .values(
+                status="running",
+                started_at=datetime.utcnow(),
+                heartbeat_at=datetime.utcnow(),
+            )
+            .returning(SolverJob.run_id, SolverJob.project_id, SolverJob.payload)
+        )
+        async with self._session_factory() as session:
+            row = (await session.execute(stmt)).first()
+            await session.commit()
+        if not row:
+            return None
+        return {
+            "run_id": row.run_id,
+            "project_id": row.project_id,
+            "payload": json.loads(row.payload),
+        }
+
+    async def finish(self, run_id, status):
+        async with self._session_factory() as session:
+            await session.execute(
+                update(SolverJob)
+                .where(SolverJob.run_id == run_id)
+                .values(status=status, finished_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def heartbeat(self, run_id):
+        async with self._session_factory() as session:
+            await session.execute(
+                update(SolverJob)
+                .where(SolverJob.run_id == run_id, SolverJob.status == "running")
+                .values(heartbeat_at=datetime.utcnow())
+            )
+            await session.commit()
+
+    async def expire_stale(self, lease_timeout):
+        now = datetime.utcnow()
+        cutoff = now - timedelta(seconds=lease_timeout)
+        async with self._session_factory() as session:
+            result = await session.execute(
+                update(SolverJob)
+                .where(
+                    SolverJob.status == "running",
+                    SolverJob.heartbeat_at < cutoff,
+                )
+                .values(status="failed", finished_at=now)
+                .returning(SolverJob.run_id)
+            )
+            run_ids = list(result.scalars())
+            if run_ids:
+                await session.execute(
+                    update(SolverRun)
+                    .where(
+                        SolverRun.run_id.in_(run_ids),
+                        SolverRun.status.in_(ACTIVE_STATUSES),
+                    )
+                    .values(
+                        status="failed",
+                        error="Solver worker stopped responding",
+                        end_time=now,
+                    )
+                )
+            await session.commit()
+        return run_ids
+
+    async def cancel(self, run_id):
+        async with self._session_factory() as session:
+            # Queued jobs are cancelled outright
+            await session.execute(
+                update(SolverJob)
+                .where(SolverJob.run_id == run_id, SolverJob.status == "queued")
+                .values(status="cancelled", finished_at=datetime.utcnow())
+            )
+            # Running jobs stop at their next cancellation check
+            await session.execute(
+                update(SolverJob)
+                .where(SolverJob.run_id == run_id, SolverJob.status == "running")
+                .values(cancel_requested=True)
+            )
+            await session.commit()
+            result = await session.execute(
+                select(SolverJob.status).where(SolverJob.run_id == run_id)
+            )
+            return result.scalar_one_or_none()
+
+    async def is_cancel_requested(self, run_id):
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(SolverJob.cancel_requested).where(SolverJob.run_id == run_id)
+            )
+            return bool(result.scalar_one_or_none())
+
+    async def get_status(self, run_id):
+        async with self._session_factory() as session:
+            result = await session.execute(
+                select(SolverJob.status).where(SolverJob.run_id == run_id)
+            )
+            return result.scalar_one_or_none()
+
+
+class CancellationCheck:
+    """
+    Async callable handed to the solver as should_stop. Polls the queue at
+    most once per interval so a database-backed queue is not hit on every
+    generation.
+    """
+
+    def __init__(self, queue: SolverJobQueue, run_id: str, interval: float = 1.0):
+        self.queue = queue
+        self.run_id = run_id
+        self.interval = interval
+        self.cancelled = False
+        self._last_check = 0.0
+
+    async def __call__(self) -> bool:
+        now = time.monotonic()
+        if not self.cancelled and now - self._last_check >= self.interval:
+            self._last_check = now
+            self.cancelled = await self.queue.is_cancel_requested(self.run_id)
+        return self.cancelled
+
+
+# Runner: async (job, should_stop) -> final status
+JobRunner = Callable[[Job, CancellationCheck], Awaitable[str]]
+
+
+class SolverWorkerPool:
+    """
+    Runs at most max_workers solver jobs at a time in this process (see
+    app.worker for the processes that serve the postgres queue).
+
+    Running jobs renew their lease every heartbeat_interval seconds. On start,
+    and then periodically, jobs whose lease is older than lease_timeout are
+    failed so a crashed worker does not hold its project forever.
+    """
+
+    def __init__(
+        self,
+        queue: SolverJobQueue,
+        runner: JobRunner,
+        max_workers: int = SOLVER_MAX_WORKERS,
+        poll_interval: float = SOLVER_POLL_INTERVAL,
+        lease_timeout: float = SOLVER_LEASE_TIMEOUT,
+        heartbeat_interval: float = SOLVER_HEARTBEAT_INTERVAL,
+    ):
+        self.queue = queue
+        self.runner = runner
+        self.max_workers = max_workers
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval
+        self._tasks = []
+
+    def start(self):
+        self._tasks.append(asyncio.create_task(self._reaper()))
+        for _ in range(self.max_workers):
+            self._tasks.append(asyncio.create_task(self._worker()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _worker(self):
+        while True:
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                print(f"Solver queue claim failed: {e}")
+                job = None
+
+            if not job:
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            run_id = job["run_id"]
+            status = "failed"
+            heartbeat = asyncio.create_task(self._heartbeat(run_id))
+            try:
+                status = await self.runner(job, CancellationCheck(self.queue, run_id))
+            except Exception as e:
+                print(f"Solver job {run_id} crashed: {e}")
+            finally:
+                heartbeat.cancel()
+                await self.queue.finish(run_id, status)
+
+    async def _heartbeat(self, run_id: str):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            try:
+                await self.queue.heartbeat(run_id)
+            except Exception as e:
+                print(f"Solver job {run_id} heartbeat failed: {e}")
+
+    async def _reaper(self):
+        while True:
+            try:
+                for run_id in await self.queue.expire_stale(self.lease_timeout):
+                    print(f"Solver job {run_id} lost its worker, marked failed")
+            except Exception as e:
+                print(f"Solver queue lease check failed: {e}")
+            await asyncio.sleep(self.lease_timeout / 2)
+
+
+_queue: Optional[SolverJobQueue] = None
+
+
+def get_job_queue() -> SolverJobQueue:
+    global _queue
+    if _queue is None:
+        _queue = (
+            PostgresJobQueue() if SOLVER_QUEUE == "postgres" else InMemoryJobQueue()
+        )
+    return _queue
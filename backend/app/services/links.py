@@ -0,0 +1,142 @@
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from fastapi import HTTPException
+from pydantic import BaseModel
+from sqlalchemy import delete, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import Project
+from app.services.listing import name_search
+
+
+async def sync_link_ids(
+    session: AsyncSession,
+    model,
+    owner: Dict[str, Any],
+    column: str,
+    wanted: Iterable[int],
+) -> Tuple[Set[int], Set[int]]:
+    """
+    Makes the link rows of `model` matching `owner` (column -> value) point
+    at exactly the `wanted` ids of `column`: one bulk DELETE for the ids that
+    went away and one bulk INSERT for the new ones, nothing for unchanged
+    links. Runs in the caller's transaction; returns (added, removed).
+    """
+    wanted = set(wanted)
+    owner_filter = [getattr(model, k) == v for k, v in owner.items()]
+    link_column = getattr(model, column)
+
+    current = set(
+        (await session.execute(select(link_column).where(*owner_filter))).scalars()
+    )
+    added = wanted - current
+    removed = current - wanted
+
+    if removed:
+        await session.execute(
+            delete(model).where(*owner_filter, link_column.in_(removed))
+        )
+    if added:
+        # Concurrent saves of the same grid may race; the later one wins
+        await session.execute(
+            pg_insert(model)
+            .values([{**owner, column: i} for i in sorted(added)])
+            .on_conflict_do_nothing()
+        )
+    return added, removed
+
+
+class BulkLinkRequest(BaseModel):
+    """
+    Global resources to (un)link from a project. Filters combine with AND;
+    at least one must be given so an empty body never touches everything.
+    """
+
+    project_id: int
+    ids: Optional[List[int]] = None
+    search: Optional[str] = None
+    # Resources linked to another project, e.g. last term's project
+    from_project_id: Optional[int] = None
+
+
+class BulkLinkResult(BaseModel):
+    ok: bool = True
+    project_id: int
+    count: int
+
+
+async def _bulk_filters(
+    session: AsyncSession,
+    resource_model,
+    link_model,
+    column: str,
+    request: BulkLinkRequest,
+):
+    if not await session.get(Project, request.project_id):
+        raise HTTPException(status_code=404, detail="Project not found")
+    if request.ids is None and not request.search and request.from_project_id is None:
+        raise HTTPException(
+            status_code=400, detail="Give ids, search or from_project_id"
+        )
+    filters = []
+    if request.ids is not None:
+        filters.append(resource_model.id.in_(request.ids))
+    if request.search:
+        filters.append(name_search(resource_model.name, request.search))
+    if request.from_project_id is not None:
+        filters.append(
+            resource_model.id.in_(
+                select(getattr(link_model, column)).where(
+                    link_model.project_id == request.from_project_id
+                )
+            )
+        )
+    return filters
+
+
+async def bulk_link(
+    session: AsyncSession,
+    resource_model,
+    link_model,
+    column: str,
+    request: BulkLinkRequest,
+) -> int:
+    """
+    Links every matching resource to the project in one
+    INSERT ... SELECT ... ON CONFLICT DO NOTHING; returns the number of new links.
+    """
+    filters = await _bulk_filters(
+        session, resource_model, link_model, column, request
+    )
+    if request.ids == []:
+        return 0
+    source = select(literal(request.project_id), resource_model.id).where(*filters)
+    result = await session.execute(
+        pg_insert(link_model)
+        .from_select(["project_id", column], source)
+        .on_conflict_do_nothing()
+    )
+    return result.rowcount
+
+
+async def bulk_unlink(
+    session: AsyncSession,
+    resource_model,
+    link_model,
+    column: str,
+    request: BulkLinkRequest,
+) -> int:
+    """Removes the matching resources' links to the project in one DELETE."""
+    filters = await _bulk_filters(
+        session, resource_model, link_model, column, request
+    )
+    if request.ids == []:
+        return 0
+    result = await session.execute(
+        delete(link_model).where(
+            link_model.project_id == request.project_id,
+            getattr(link_model, column).in_(
+                select(resource_model.id).where(*filters)
+            ),
+        )
+    )
+    return result.rowcount
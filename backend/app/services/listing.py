@@ -0,0 +1,81 @@
+import os
+import time
+from typing import Any, Dict, Optional, Tuple
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Seconds a cached total is trusted. Writes in this process drop it right
+# away; the TTL bounds how stale it can get after writes in other processes.
+LIST_TOTAL_TTL = float(os.getenv("LIST_TOTAL_TTL", "30"))
+
+
+class TotalsCache:
+    """Row counts of list queries per (resource, project_id, search)."""
+
+    def __init__(self, ttl: float = LIST_TOTAL_TTL):
+        self.ttl = ttl
+        self._totals: Dict[Tuple[str, Any, Any], Tuple[float, int]] = {}
+
+    def get(self, key: Tuple[str, Any, Any]) -> Optional[int]:
+        entry = self._totals.get(key)
+        if entry is None or time.monotonic() - entry[0] > self.ttl:
+            return None
+        return entry[1]
+
+    def set(self, key: Tuple[str, Any, Any], total: int):
+        self._totals[key] = (time.monotonic(), total)
+
+    def invalidate(self, *resources: str):
+        """Drops every cached total of the given resources (all if none given)."""
+        if not resources:
+            self._totals.clear()
+            return
+        for key in [k for k in self._totals if k[0] in resources]:
+            del self._totals[key]
+
+
+totals_cache = TotalsCache()
+
+
+def name_search(column, search: str):
+    """
+    Case-insensitive substring match. Served by the pg_trgm GIN indexes on
+    the name columns instead of a sequential scan.
+    """
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return column.ilike(f"%{escaped}%", escape="\\")
+
+
+async def paginate(
+    session: AsyncSession,
+    query,
+    id_column,
+    cache_key: Tuple[str, Any, Any],
+    page: int,
+    size: int,
+    after_id: Optional[int] = None,
+):
+    """
+    Returns (query for one page, total). Pages are ordered by id; with after_id
+    the page starts after that id (keyset pagination, no OFFSET scan),
+    otherwise page numbers are used. Totals come from totals_cache when
+    possible.
+    """
+    total = totals_cache.get(cache_key)
+    if total is None:
+        total = (
+            await session.execute(select(func.count()).select_from(query.subquery()))
+        ).scalar_one()
+        totals_cache.set(cache_key, total)
+
+    query = query.order_by(id_column).limit(size)
+    if after_id is not None:
+        query = query.where(id_column > after_id)
+    else:
+        query = query.offset((page - 1) * size)
+    return query, total
+
+
+def next_after_id(items, size: int) -> Optional[int]:
+    # Cursor for the following page, None on the last page
+    return items[-1].id if len(items) == size else None
@@ -1,179 +1,239 @@
+import io
+import zipfile
 import pandas as pd
-from typing import Dict, List, Any, Tuple
+from typing import Dict, List, Any, Iterable, Iterator, Optional, Tuple
 from app.models import ClassroomType, Degree, SemesterType
 
+# Workbook sheet name -> key in the parsed data.
+# Order matters: later sheets reference names defined by earlier ones.
+SHEETS = {
+    "Teachers": "teachers",
+    "Classrooms": "classrooms",
+    "Courses": "courses",
+    "StudentGroups": "student_groups",
+    "TeacherCourses": "teacher_courses",
+    "StudentGroupCourses": "student_group_courses",
+    "Lessons": "lessons",
+}
+
+# Rows per batch yielded by the streaming readers
+BATCH_SIZE = 5000
 
-class ExcelParser:
-    def parse_file(self, file_content: bytes) -> Dict[str, List[Dict[str, Any]]]:
-        xls = pd.ExcelFile(file_content)
-        data = {}
 
-        if "Teachers" in xls.sheet_names:
-            data["teachers"] = self._parse_teachers(pd.read_excel(xls, "Teachers"))
+def _text(df: pd.DataFrame, column: str) -> pd.Series:
+    """Stripped strings, None for missing cells or a missing column."""
+    out = pd.Series(None, index=df.index, dtype=object)
+    if column in df.columns:
+        mask = df[column].notna()
+        out[mask] = df.loc[mask, column].astype(str).str.strip()
+    return out
 
-        if "Classrooms" in xls.sheet_names:
-            data["classrooms"] = self._parse_classrooms(
-                pd.read_excel(xls, "Classrooms")
-            )
 
-        if "Courses" in xls.sheet_names:
-            data["courses"] = self._parse_courses(pd.read_excel(xls, "Courses"))
+def _int(df: pd.DataFrame, column: str, default: Optional[int] = None) -> pd.Series:
+    """Integers, default for missing cells or a missing column."""
+    out = pd.Series(default, index=df.index, dtype=object)
+    if column in df.columns:
+        numbers = pd.to_numeric(df[column], errors="coerce")
+        mask = numbers.notna()
+        out[mask] = [int(v) for v in numbers[mask]]
+    return out
 
-        if "StudentGroups" in xls.sheet_names:
-            data["student_groups"] = self._parse_student_groups(
-                pd.read_excel(xls, "StudentGroups")
-            )
 
-        if "TeacherCourses" in xls.sheet_names:
-            data["teacher_courses"] = self._parse_teacher_courses(
-                pd.read_excel(xls, "TeacherCourses")
-            )
+def _required_int(df: pd.DataFrame, column: str, valid: pd.Series) -> pd.Series:
+    values = _int(df, column)
+    if values[valid].isna().any():
+        raise ValueError(f"Column '{column}' has missing or non-numeric values")
+    return values
 
-        if "StudentGroupCourses" in xls.sheet_names:
-            data["student_group_courses"] = self._parse_student_group_courses(
-                pd.read_excel(xls, "StudentGroupCourses")
-            )
 
-        if "Lessons" in xls.sheet_names:
-            data["lessons"] = self._parse_lessons(pd.read_excel(xls, "Lessons"))
+def _enum(
+    df: pd.DataFrame, column: str, enum_cls, default, spaces_to_underscores=False
+) -> pd.Series:
+    """Maps normalized text onto enum members, default for unknown values."""
+    text = _text(df, column).str.lower()
+    if spaces_to_underscores:
+        text = text.str.replace(" ", "_")
+    mapped = text.map({member.value: member for member in enum_cls})
+    return mapped.where(mapped.notna(), default)
 
+
+def _records(columns: Dict[str, pd.Series], valid: pd.Series) -> List[Dict[str, Any]]:
+    frame = pd.DataFrame(columns)[valid]
+    return frame.astype(object).where(frame.notna(), None).to_dict("records")
+
+
+class ExcelParser:
+    def parse_file(self, file_content: bytes) -> Dict[str, List[Dict[str, Any]]]:
+        xls = pd.ExcelFile(io.BytesIO(file_content))
+        data = {}
+        for sheet, key in SHEETS.items():
+            if sheet in xls.sheet_names:
+                data[key] = self.parse_frame(key, pd.read_excel(xls, sheet))
+        return data
+
+    def parse_frame(self, key: str, df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """Parses one sheet (or one batch of its rows) by data key."""
+        return getattr(self, f"_parse_{key}")(df)
+
+    def iter_workbook(
+        self,
+        source,
+        sheets: Optional[Iterable[str]] = None,
+        batch_size: int = BATCH_SIZE,
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Streams a workbook (path or file object) in read-only mode, yielding
+        (data key, parsed rows) batches. Only the requested sheets are read,
+        and at most batch_size rows are held in memory at a time.
+        """
+        from openpyxl import load_workbook
+
+        wanted = set(sheets) if sheets is not None else set(SHEETS)
+        workbook = load_workbook(source, read_only=True, data_only=True)
+        try:
+            for sheet, key in SHEETS.items():
+                if sheet not in wanted or sheet not in workbook.sheetnames:
+                    continue
+                rows = workbook[sheet].iter_rows(values_only=True)
+                header = next(rows, None)
+                if header is None:
+                    continue
+                columns = [str(h).strip() if h is not None else "" for h in header]
+
+                batch = []
+                for row in rows:
+                    batch.append(row)
+                    if len(batch) >= batch_size:
+                        yield key, self.parse_frame(
+                            key, pd.DataFrame(batch, columns=columns)
+                        )
+                        batch = []
+                if batch:
+                    yield key, self.parse_frame(
+                        key, pd.DataFrame(batch, columns=columns)
+                    )
+        finally:
+            workbook.close()
+
+    def iter_bundle(
+        self, source, batch_size: int = BATCH_SIZE
+    ) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        Streams a zip bundle of <Sheet>.csv or <Sheet>.parquet files (same
+        sheet names and columns as the workbook), skipping Excel entirely.
+        Parquet needs pyarrow or fastparquet installed.
+        """
+        with zipfile.ZipFile(source) as bundle:
+            files = {}
+            for name in bundle.namelist():
+                stem, _, ext = name.rsplit("/", 1)[-1].rpartition(".")
+                files[stem.lower()] = (name, ext.lower())
+
+            for sheet, key in SHEETS.items():
+                if sheet.lower() not in files:
+                    continue
+                name, ext = files[sheet.lower()]
+                if ext == "csv":
+                    with bundle.open(name) as f:
+                        for chunk in pd.read_csv(f, chunksize=batch_size):
+                            yield key, self.parse_frame(key, chunk)
+                elif ext == "parquet":
+                    df = pd.read_parquet(io.BytesIO(bundle.read(name)))
+                    for start in range(0, len(df), batch_size):
+                        yield key, self.parse_frame(
+                            key, df.iloc[start : start + batch_size]
+                        )
+
+    def parse_bundle(self, file_content: bytes) -> Dict[str, List[Dict[str, Any]]]:
+        data: Dict[str, List[Dict[str, Any]]] = {}
+        for key, rows in self.iter_bundle(io.BytesIO(file_content)):
+            data.setdefault(key, []).extend(rows)
         return data
 
     def _parse_teachers(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        teachers = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("Name")):
-                teachers.append({"name": str(row["Name"]).strip()})
-        return teachers
+        name = _text(df, "Name")
+        return _records({"name": name}, name.notna())
 
     def _parse_classrooms(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        classrooms = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("Name")):
-                # Handle Enum conversion safely
-                try:
-                    c_type = ClassroomType(
-                        str(row["Type"]).lower().strip().replace(" ", "_")
-                    )
-                except ValueError:
-                    c_type = ClassroomType.NORMAL
-
-                classrooms.append(
-                    {
-                        "name": str(row["Name"]).strip(),
-                        "faculty": str(row["Faculty"]).strip(),
-                        "capacity": int(row["Capacity"]),
-                        "type": c_type,
-                        "accessibility_features": (
-                            str(row.get("Accessibility", ""))
-                            if pd.notna(row.get("Accessibility"))
-                            else None
-                        ),
-                    }
-                )
-        return classrooms
+        name = _text(df, "Name")
+        valid = name.notna()
+        return _records(
+            {
+                "name": name,
+                "faculty": _text(df, "Faculty"),
+                "capacity": _required_int(df, "Capacity", valid),
+                "type": _enum(
+                    df,
+                    "Type",
+                    ClassroomType,
+                    ClassroomType.NORMAL,
+                    spaces_to_underscores=True,
+                ),
+                "accessibility_features": _text(df, "Accessibility"),
+            },
+            valid,
+        )
 
     def _parse_courses(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        courses = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("Name")):
-                try:
-                    r_type = ClassroomType(
-                        str(row["RequiredRoomType"]).lower().strip().replace(" ", "_")
-                    )
-                except ValueError:
-                    r_type = ClassroomType.NORMAL
-
-                # New fields
-                units = int(row.get("Units", 2))
-                min_pop = (
-                    int(row.get("MinPopulation"))
-                    if pd.notna(row.get("MinPopulation"))
-                    else None
-                )
-                max_pop = (
-                    int(row.get("MaxPopulation"))
-                    if pd.notna(row.get("MaxPopulation"))
-                    else None
-                )
-
-                courses.append(
-                    {
-                        "name": str(row["Name"]).strip(),
-                        "required_room_type": r_type,
-                        "units": units,
-                        "min_population": min_pop,
-                        "max_population": max_pop,
-                    }
-                )
-        return courses
+        name = _text(df, "Name")
+        return _records(
+            {
+                "name": name,
+                "required_room_type": _enum(
+                    df,
+                    "RequiredRoomType",
+                    ClassroomType,
+                    ClassroomType.NORMAL,
+                    spaces_to_underscores=True,
+                ),
+                "units": _int(df, "Units", default=2),
+                "min_population": _int(df, "MinPopulation"),
+                "max_population": _int(df, "MaxPopulation"),
+            },
+            name.notna(),
+        )
 
     def _parse_student_groups(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        groups = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("Name")):
-                try:
-                    degree = Degree(str(row["Degree"]).lower().strip())
-                except ValueError:
-                    degree = Degree.BACHELOR
-
-                allowed_days = (
-                    str(row.get("AllowedDays", "")).strip()
-                    if pd.notna(row.get("AllowedDays"))
-                    else None
-                )
-
-                groups.append(
-                    {
-                        "name": str(row["Name"]).strip(),
-                        "field": str(row["Field"]).strip(),
-                        "degree": degree,
-                        "entrance_year": int(row["EntranceYear"]),
-                        "entrance_semester": int(row["EntranceSemester"]),
-                        "population": int(row["Population"]),
-                        "allowed_days": allowed_days,
-                    }
-                )
-        return groups
+        name = _text(df, "Name")
+        valid = name.notna()
+        return _records(
+            {
+                "name": name,
+                "field": _text(df, "Field"),
+                "degree": _enum(df, "Degree", Degree, Degree.BACHELOR),
+                "entrance_year": _required_int(df, "EntranceYear", valid),
+                "entrance_semester": _required_int(df, "EntranceSemester", valid),
+                "population": _required_int(df, "Population", valid),
+                "allowed_days": _text(df, "AllowedDays"),
+            },
+            valid,
+        )
 
     def _parse_student_group_courses(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        links = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("GroupName")) and pd.notna(row.get("CourseName")):
-                links.append(
-                    {
-                        "group_name": str(row["GroupName"]).strip(),
-                        "course_name": str(row["CourseName"]).strip(),
-                    }
-                )
-        return links
+        group = _text(df, "GroupName")
+        course = _text(df, "CourseName")
+        return _records(
+            {"group_name": group, "course_name": course},
+            group.notna() & course.notna(),
+        )
 
     def _parse_teacher_courses(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        links = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("TeacherName")) and pd.notna(row.get("CourseName")):
-                links.append(
-                    {
-                        "teacher_name": str(row["TeacherName"]).strip(),
-                        "course_name": str(row["CourseName"]).strip(),
-                    }
-                )
-        return links
+        teacher = _text(df, "TeacherName")
+        course = _text(df, "CourseName")
+        return _records(
+            {"teacher_name": teacher, "course_name": course},
+            teacher.notna() & course.notna(),
+        )
 
     def _parse_lessons(self, df: pd.DataFrame) -> List[Dict[str, Any]]:
-        lessons = []
-        for _, row in df.iterrows():
-            if pd.notna(row.get("Course")) and pd.notna(row.get("Group")):
-                lessons.append(
-                    {
-                        "course_name": str(row["Course"]).strip(),
-                        "group_name": str(row["Group"]).strip(),
-                        "teacher_name": (
-                            str(row["Teacher"]).strip()
-                            if pd.notna(row.get("Teacher"))
-                            else None
-                        ),
-                        "duration_slots": int(row.get("DurationSlots", 1)),
-                    }
-                )
-        return lessons
+        course = _text(df, "Course")
+        group = _text(df, "Group")
+        return _records(
+            {
+                "course_name": course,
+                "group_name": group,
+                "teacher_name": _text(df, "Teacher"),
+                "duration_slots": _int(df, "DurationSlots", default=1),
+            },
+            course.notna() & group.notna(),
+        )
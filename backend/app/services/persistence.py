@@ -0,0 +1,51 @@
+import os
+from typing import Any, Dict, List, Optional
+from sqlalchemy import insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import ScheduleResult, SolverRun, WeekParity
+
+# Rows per executemany batch when saving schedule results
+RESULT_BATCH_SIZE = int(os.getenv("RESULT_BATCH_SIZE", "5000"))
+
+
+async def save_run_results(
+    session: AsyncSession,
+    run_id: str,
+    results: List[Dict[str, Any]],
+    run_values: Optional[Dict[str, Any]] = None,
+    batch_size: int = RESULT_BATCH_SIZE,
+):
+    """
+    Writes a run's assignments with Core insert executemany batches (no ORM
+    objects) and applies run_values to its SolverRun row, all in one
+    transaction. Pending ORM changes on the session (e.g. a new SolverRun)
+    are flushed into the same transaction. results are the dicts produced by
+    SolverEngine._build_result.
+    """
+    table = ScheduleResult.__table__
+    rows = [
+        {
+            "run_id": run_id,
+            "lesson_id": res["lesson_id"],
+            "room_id": res["room_id"],
+            "timeslot_id": res["timeslot_id"],
+            "teacher_id": res["teacher_id"],
+            "week_parity": WeekParity(res["week_parity"]),
+        }
+        for res in results
+    ]
+
+    try:
+        for start in range(0, len(rows), batch_size):
+            await session.execute(insert(table), rows[start : start + batch_size])
+
+        if run_values:
+            await session.execute(
+                update(SolverRun)
+                .where(SolverRun.run_id == run_id)
+                .values(**run_values)
+            )
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
@@ -1,23 +1,135 @@
-from typing import List
-from app.models import Lesson
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from app.models import Classroom, Course, Lesson, StudentGroup
+
+# allowed_days_mask of a group without restrictions
+ALL_DAYS = (1 << 7) - 1
 
 
 class Preprocessor:
+    def __init__(
+        self,
+        courses: List[Course],
+        groups: List[StudentGroup],
+        classrooms: List[Classroom],
+    ):
+        self.courses_map = {c.id: c for c in courses}
+        self.groups_map = {g.id: g for g in groups}
+        self.classrooms = classrooms
+
     def merge_small_sections(
-        self, lessons: List[Lesson], min_population: int = 50
-    ) -> List[Lesson]:
+        self, lessons: List[Lesson], min_population: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
         """
-        Merges lessons of the same course and same student group (or compatible groups)
-        if their combined population is less than min_population.
+        Merges small groups taking the same course into shared sections.
+
+        A lesson is small if its group has fewer students than min_population
+        (the course's min_population by default). Per course, small lessons
+        are bin-packed first fit decreasing into sections no larger than the
+        course's max_population and its largest room of the required type.
+        Lessons only share a section with groups of the same degree with a
+        day in common, one of them at most having a pre-assigned teacher;
+        pinned lessons are left alone.
 
-        Note: This is a simplified version. In reality, we might merge different groups
-        taking the same course if they are in the same semester/field.
+        Returns one entry per merged section (two or more lessons). Their
+        lesson_ids are what SolverEngine takes as sections.
         """
-        # Group by course_id and group_id (or just course_id if we want to merge different groups)
-        # For now, let's assume we only merge sections of the exact same group and course
-        # (which might happen if data is split in source).
+        by_course = defaultdict(list)
+        for lesson in lessons:
+            pinned = (
+                lesson.pinned_timeslot_id,
+                lesson.pinned_room_id,
+                lesson.pinned_teacher_id,
+            )
+            if pinned != (None, None, None):
+                continue
+            if lesson.group_id in self.groups_map:
+                by_course[lesson.course_id].append(lesson)
+
+        merges = []
+        for course_id in sorted(by_course):
+            course = self.courses_map.get(course_id)
+            if course is None:
+                continue
+            capacity = self._capacity(course)
+            limit = course.min_population if min_population is None else min_population
+            if not capacity or limit is None:
+                continue
+
+            small = [
+                l
+                for l in by_course[course_id]
+                if self.groups_map[l.group_id].population < limit
+            ]
+            small.sort(key=lambda l: (-self.groups_map[l.group_id].population, l.id))
+
+            sections = []
+            for lesson in small:
+                for section in sections:
+                    if self._fits(section, lesson, capacity):
+                        self._add(section, lesson)
+                        break
+                else:
+                    section = {"lessons": [], "groups": set(), "population": 0}
+                    self._add(section, lesson)
+                    sections.append(section)
+
+            for section in sections:
+                if len(section["lessons"]) < 2:
+                    continue
+                merges.append(
+                    {
+                        "course_id": course_id,
+                        "lesson_ids": [l.id for l in section["lessons"]],
+                        "group_ids": [l.group_id for l in section["lessons"]],
+                        "population": section["population"],
+                        "capacity": capacity,
+                    }
+                )
+        return merges
+
+    def _capacity(self, course: Course) -> int:
+        rooms = [
+            r.capacity
+            for r in self.classrooms
+            if r.type == course.required_room_type
+        ]
+        capacity = max(rooms, default=0)
+        if course.max_population:
+            capacity = min(capacity, course.max_population)
+        return capacity
+
+    def _fits(self, section: Dict[str, Any], lesson: Lesson, capacity: int) -> bool:
+        group = self.groups_map[lesson.group_id]
+        if lesson.group_id in section["groups"]:
+            return False
+        if section["population"] + group.population > capacity:
+            return False
+        if group.degree != section["degree"]:
+            return False
+        if not section["days"] & _days(group):
+            return False
+        teacher_id = lesson.teacher_id
+        return (
+            teacher_id is None
+            or section["teacher_id"] is None
+            or teacher_id == section["teacher_id"]
+        )
+
+    def _add(self, section: Dict[str, Any], lesson: Lesson):
+        group = self.groups_map[lesson.group_id]
+        if not section["lessons"]:
+            section["degree"] = group.degree
+            section["days"] = _days(group)
+            section["teacher_id"] = None
+        section["lessons"].append(lesson)
+        section["groups"].add(lesson.group_id)
+        section["population"] += group.population
+        section["days"] &= _days(group)
+        if lesson.teacher_id is not None:
+            section["teacher_id"] = lesson.teacher_id
 
-        # A more advanced strategy: Group by Course. Then bin-pack groups into sections.
 
-        # Placeholder for advanced logic
-        return lessons
+def _days(group: StudentGroup) -> int:
+    mask = group.allowed_days_mask
+    return ALL_DAYS if mask is None else mask
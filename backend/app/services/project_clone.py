@@ -0,0 +1,156 @@
+import uuid
+from datetime import datetime
+from typing import Any, Dict, Optional
+from sqlalchemy import column, desc, insert, literal, select, table, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import (
+    Project,
+    Lesson,
+    SolverRun,
+    ScheduleResult,
+    TeacherAvailability,
+    TeacherAvailabilityMask,
+    ProjectTeacherLink,
+    ProjectCourseLink,
+    ProjectStudentGroupLink,
+    ProjectClassroomLink,
+)
+
+# Project-scoped tables copied as-is with the project id swapped
+PROJECT_TABLES = {
+    "teacher_links": ProjectTeacherLink,
+    "course_links": ProjectCourseLink,
+    "group_links": ProjectStudentGroupLink,
+    "classroom_links": ProjectClassroomLink,
+    "teacher_availability": TeacherAvailability,
+    "teacher_availability_masks": TeacherAvailabilityMask,
+}
+
+# old lesson id -> new lesson id, dropped when the transaction commits
+lesson_map = table("lesson_clone_map", column("old_id"), column("new_id"))
+
+
+async def _copy_rows(session: AsyncSession, model, source_id: int, target_id: int):
+    cols = [c.name for c in model.__table__.columns if c.name != "project_id"]
+    source = select(
+        literal(target_id).label("project_id"),
+        *(model.__table__.c[c] for c in cols),
+    ).where(model.project_id == source_id)
+    result = await session.execute(
+        insert(model).from_select(["project_id", *cols], source)
+    )
+    return result.rowcount
+
+
+async def clone_project(
+    session: AsyncSession,
+    project_id: int,
+    name: Optional[str] = None,
+    copy_results: bool = False,
+) -> Optional[Dict[str, Any]]:
+    """
+    Copies a project's links, lessons and teacher availability into a new
+    project with a handful of INSERT ... SELECT statements. With copy_results
+    the latest completed run's results are copied too, as a completed run
+    of the new project (a warm start). Runs in the caller's transaction;
+    returns None if the project does not exist.
+    """
+    source = await session.get(Project, project_id)
+    if not source:
+        return None
+
+    clone = Project(
+        name=name or f"{source.name} (copy)",
+        description=source.description,
+        term_id=source.term_id,
+        is_active=source.is_active,
+    )
+    session.add(clone)
+    await session.flush()
+
+    counts = {}
+    for key, model in PROJECT_TABLES.items():
+        counts[key] = await _copy_rows(session, model, project_id, clone.id)
+
+    # New lesson ids are drawn from the sequence up front so results can be
+    # remapped to the copies with a join instead of row by row
+    await session.execute(
+        text(
+            "CREATE TEMPORARY TABLE lesson_clone_map ON COMMIT DROP AS "
+            "SELECT id AS old_id, nextval(pg_get_serial_sequence('lesson', 'id')) "
+            "AS new_id FROM lesson WHERE project_id = :project_id"
+        ),
+        {"project_id": project_id},
+    )
+    lesson_cols = [
+        c.name for c in Lesson.__table__.columns if c.name not in ("id", "project_id")
+    ]
+    result = await session.execute(
+        insert(Lesson).from_select(
+            ["id", "project_id", *lesson_cols],
+            select(
+                lesson_map.c.new_id,
+                literal(clone.id),
+                *(Lesson.__table__.c[c] for c in lesson_cols),
+            ).join(lesson_map, lesson_map.c.old_id == Lesson.id),
+        )
+    )
+    counts["lessons"] = result.rowcount
+
+    run_id = None
+    if copy_results:
+        latest = (
+            await session.execute(
+                select(SolverRun)
+                .where(
+                    SolverRun.project_id == project_id,
+                    SolverRun.status == "completed",
+                )
+                .order_by(desc(SolverRun.start_time))
+                .limit(1)
+            )
+        ).scalar_one_or_none()
+        if latest:
+            run_id = str(uuid.uuid4())
+            now = datetime.utcnow()
+            session.add(
+                SolverRun(
+                    project_id=clone.id,
+                    run_id=run_id,
+                    status="completed",
+                    start_time=now,
+                    end_time=now,
+                    config_weights=latest.config_weights,
+                    fitness_score=latest.fitness_score,
+                    satisfaction_percentage=latest.satisfaction_percentage,
+                    best_cost=latest.best_cost,
+                )
+            )
+            await session.flush()
+            result = await session.execute(
+                insert(ScheduleResult).from_select(
+                    [
+                        "run_id",
+                        "lesson_id",
+                        "room_id",
+                        "timeslot_id",
+                        "teacher_id",
+                        "week_parity",
+                    ],
+                    select(
+                        literal(run_id),
+                        lesson_map.c.new_id,
+                        ScheduleResult.room_id,
+                        ScheduleResult.timeslot_id,
+                        ScheduleResult.teacher_id,
+                        ScheduleResult.week_parity,
+                    )
+                    .join(lesson_map, lesson_map.c.old_id == ScheduleResult.lesson_id)
+                    .where(ScheduleResult.run_id == latest.run_id)
+                    # Keep the source's row order for multi-slot lessons
+                    .order_by(ScheduleResult.id),
+                )
+            )
+            counts["schedule_results"] = result.rowcount
+
+    return {"project": clone, "run_id": run_id, "counts": counts}
@@ -0,0 +1,169 @@
+import json
+import os
+from typing import Any, AsyncIterator, Dict, List
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection
+from app.db import engine as db_engine
+from app.models import (
+    ScheduleResult,
+    SolverRun,
+    Lesson,
+    Course,
+    Teacher,
+    StudentGroup,
+    Classroom,
+    TimeSlot,
+)
+
+try:
+    import orjson
+except ImportError:  # optional, see the "json" extra
+    orjson = None
+
+# Rows fetched per round trip from the server-side cursor
+RESULTS_CHUNK_SIZE = int(os.getenv("RESULTS_CHUNK_SIZE", "2000"))
+
+
+def dumps(obj: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), default=str).encode()
+
+
+def slot_index_subquery():
+    """timeslot id -> day and 0-based slot index within its day (by start time)."""
+    return select(
+        TimeSlot.id.label("timeslot_id"),
+        TimeSlot.day_of_week,
+        (
+            func.row_number().over(
+                partition_by=TimeSlot.day_of_week, order_by=TimeSlot.start_time
+            )
+            - 1
+        ).label("slot"),
+    ).subquery("slots")
+
+
+def results_query(run_id: str, include_run_id: bool = False):
+    """
+    One joined query selecting exactly the timetable output columns of a run.
+    The teacher is the one assigned by the solver (ScheduleResult.teacher_id).
+    """
+    slots = slot_index_subquery()
+    columns = [
+        ScheduleResult.id,
+        ScheduleResult.week_parity,
+        func.coalesce(Course.name, "Unknown").label("course_name"),
+        func.coalesce(Teacher.name, "Unknown").label("teacher_name"),
+        func.coalesce(StudentGroup.name, "Unknown").label("group_name"),
+        func.coalesce(Classroom.name, "Unknown").label("room_name"),
+        func.coalesce(slots.c.day_of_week, 0).label("day"),
+        func.coalesce(slots.c.slot, 0).label("slot"),
+    ]
+    if include_run_id:
+        columns.append(ScheduleResult.run_id)
+
+    return (
+        select(*columns)
+        .select_from(ScheduleResult)
+        .outerjoin(Lesson, Lesson.id == ScheduleResult.lesson_id)
+        .outerjoin(Course, Course.id == Lesson.course_id)
+        .outerjoin(StudentGroup, StudentGroup.id == Lesson.group_id)
+        .outerjoin(Classroom, Classroom.id == ScheduleResult.room_id)
+        .outerjoin(Teacher, Teacher.id == ScheduleResult.teacher_id)
+        .outerjoin(slots, slots.c.timeslot_id == ScheduleResult.timeslot_id)
+        .where(ScheduleResult.run_id == run_id)
+        .order_by(ScheduleResult.id)
+    )
+
+
+async def snapshot_rows(
+    conn: AsyncConnection, rows: List[list]
+) -> List[Dict[str, Any]]:
+    """
+    Resolves a best-so-far snapshot (see RunStatusStore.update_snapshot) into
+    the same output rows as results_query, with "id": None.
+    """
+    lesson_ids = {r[0] for r in rows}
+    lessons = await conn.execute(
+        select(
+            Lesson.id,
+            func.coalesce(Course.name, "Unknown"),
+            func.coalesce(StudentGroup.name, "Unknown"),
+        )
+        .outerjoin(Course, Course.id == Lesson.course_id)
+        .outerjoin(StudentGroup, StudentGroup.id == Lesson.group_id)
+        .where(Lesson.id.in_(lesson_ids))
+    )
+    lessons = {lesson_id: (course, group) for lesson_id, course, group in lessons}
+    rooms = await conn.execute(
+        select(Classroom.id, Classroom.name).where(
+            Classroom.id.in_({r[2] for r in rows})
+        )
+    )
+    rooms = dict(rooms.all())
+    teachers = await conn.execute(
+        select(Teacher.id, Teacher.name).where(
+            Teacher.id.in_({r[3] for r in rows if r[3] is not None})
+        )
+    )
+    teachers = dict(teachers.all())
+    slots = slot_index_subquery()
+    slots = await conn.execute(
+        select(slots.c.timeslot_id, slots.c.day_of_week, slots.c.slot)
+    )
+    slots = {ts_id: (day, slot) for ts_id, day, slot in slots}
+
+    output = []
+    for lesson_id, timeslot_id, room_id, teacher_id, week_parity in rows:
+        course_name, group_name = lessons.get(lesson_id, ("Unknown", "Unknown"))
+        day, slot = slots.get(timeslot_id, (0, 0))
+        output.append(
+            {
+                "id": None,  # Not persisted yet
+                "week_parity": week_parity,
+                "course_name": course_name,
+                "teacher_name": teachers.get(teacher_id, "Unknown"),
+                "group_name": group_name,
+                "room_name": rooms.get(room_id, "Unknown"),
+                "day": day,
+                "slot": slot,
+            }
+        )
+    return output
+
+
+async def stream_results_json(
+    run_id: str,
+    include_run_id: bool = False,
+    snapshot_fallback: bool = False,
+) -> AsyncIterator[bytes]:
+    """
+    Yields a run's results as one JSON array, encoded chunk by chunk from a
+    server-side cursor so memory stays flat however large the run is.
+    With snapshot_fallback, a run without stored results (still running or
+    stopped early) returns its best-so-far snapshot instead.
+    """
+    stmt = results_query(run_id, include_run_id).execution_options(
+        yield_per=RESULTS_CHUNK_SIZE
+    )
+    async with db_engine.connect() as conn:
+        result = await conn.stream(stmt)
+        empty = True
+        async for partition in result.partitions():
+            # Encode the chunk as a list and drop its brackets
+            chunk = dumps([row._asdict() for row in partition])[1:-1]
+            yield (b"[" if empty else b",") + chunk
+            empty = False
+
+        if empty:
+            rows = []
+            if snapshot_fallback:
+                snapshot = await conn.scalar(
+                    select(SolverRun.best_snapshot).where(SolverRun.run_id == run_id)
+                )
+                if snapshot:
+                    rows = await snapshot_rows(conn, json.loads(snapshot))
+            yield dumps(rows)
+        else:
+            yield b"]"
@@ -0,0 +1,133 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+# Bytes of serialized results kept in memory per process
+RESULTS_CACHE_MAX_BYTES = int(os.getenv("RESULTS_CACHE_MAX_BYTES", str(64 * 1024**2)))
+# Optional directory shared by the API processes of one host
+RESULTS_CACHE_DIR = os.getenv("RESULTS_CACHE_DIR") or None
+RESULTS_CACHE_DISK_MAX_BYTES = int(
+    os.getenv("RESULTS_CACHE_DISK_MAX_BYTES", str(1024**3))
+)
+# Bump when the results JSON format changes so clients drop stale ETags
+RESULTS_FORMAT_VERSION = "1"
+
+
+def results_etag(run_id: str) -> str:
+    # A completed run's results never change, so the run id is enough
+    return f'"v{RESULTS_FORMAT_VERSION}-{run_id}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    # "*" is not honoured: it would answer 304 for runs that have no results
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        if tag.strip().removeprefix("W/") == etag:
+            return True
+    return False
+
+
+class ResultsCache:
+    """
+    Size-bounded LRU cache of serialized results of completed runs, keyed by
+    run_id. With a directory, entries are also written there so other
+    processes on the host can reuse them; the directory is pruned oldest
+    first once it grows past disk_max_bytes.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = RESULTS_CACHE_MAX_BYTES,
+        directory: Optional[str] = RESULTS_CACHE_DIR,
+        disk_max_bytes: int = RESULTS_CACHE_DISK_MAX_BYTES,
+    ):
+        self.max_bytes = max_bytes
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, run_id: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(run_id)
+            if body is not None:
+                self._entries.move_to_end(run_id)
+                return body
+
+        body = self._read_disk(run_id)
+        if body is not None:
+            self._put_memory(run_id, body)
+        return body
+
+    def put(self, run_id: str, body: bytes):
+        self._put_memory(run_id, body)
+        self._write_disk(run_id, body)
+
+    def _put_memory(self, run_id: str, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(run_id, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[run_id] = body
+            self._size += len(body)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def _path(self, run_id: str) -> str:
+        # run ids are UUIDs; keep anything else from escaping the directory
+        safe = "".join(c for c in run_id if c.isalnum() or c in "-_")
+        return os.path.join(self.directory, f"{safe}.json")
+
+    def _read_disk(self, run_id: str) -> Optional[bytes]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(run_id), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_disk(self, run_id: str, body: bytes):
+        if not self.directory or len(body) > self.disk_max_bytes:
+            return
+        path = self._path(run_id)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        # Atomic, so readers in other processes never see a partial file
+        os.replace(tmp, path)
+        self._prune_disk()
+
+    def _prune_disk(self):
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+
+_cache: Optional[ResultsCache] = None
+
+
+def get_results_cache() -> ResultsCache:
+    global _cache
+    if _cache is None:
+        _cache = ResultsCache()
+    return _cache
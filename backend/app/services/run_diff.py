@@ -0,0 +1,93 @@
+from typing import Any, Dict
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import ScheduleResult
+
+# Compact assignment tuple in the diff: [timeslot_id, room_id, teacher_id, week_parity]
+FIELDS = ("timeslot_id", "room_id", "teacher_id", "week_parity")
+
+
+def _run_rows(run_id: str, name: str):
+    # A lesson spanning several slots has several rows per run; they are
+    # paired across runs by their order within the lesson
+    return select(
+        ScheduleResult.lesson_id,
+        func.row_number()
+        .over(partition_by=ScheduleResult.lesson_id, order_by=ScheduleResult.id)
+        .label("ordinal"),
+        *(getattr(ScheduleResult, f) for f in FIELDS),
+    ).where(ScheduleResult.run_id == run_id).subquery(name)
+
+
+async def diff_runs(session: AsyncSession, run_a: str, run_b: str) -> Dict[str, Any]:
+    """
+    Compares two runs' assignments with one full outer join on
+    (lesson_id, ordinal). Only changed assignments are returned.
+    """
+    a = _run_rows(run_a, "a")
+    b = _run_rows(run_b, "b")
+    joined = a.join(
+        b,
+        and_(a.c.lesson_id == b.c.lesson_id, a.c.ordinal == b.c.ordinal),
+        full=True,
+    )
+
+    only_a = b.c.lesson_id.is_(None)
+    only_b = a.c.lesson_id.is_(None)
+    both = and_(a.c.lesson_id.isnot(None), b.c.lesson_id.isnot(None))
+    changed = {
+        "moved": a.c.timeslot_id.is_distinct_from(b.c.timeslot_id),
+        "re_roomed": a.c.room_id.is_distinct_from(b.c.room_id),
+        "re_teachered": a.c.teacher_id.is_distinct_from(b.c.teacher_id),
+        "parity_changed": a.c.week_parity.is_distinct_from(b.c.week_parity),
+    }
+    any_change = or_(*changed.values())
+
+    summary = (
+        await session.execute(
+            select(
+                func.count().filter(and_(both, ~any_change)).label("unchanged"),
+                *(
+                    func.count().filter(and_(both, cond)).label(kind)
+                    for kind, cond in changed.items()
+                ),
+                # Assignments only in a (removed in b) or only in b (added)
+                func.count().filter(only_a).label("removed"),
+                func.count().filter(only_b).label("added"),
+            ).select_from(joined)
+        )
+    ).one()
+
+    rows = await session.execute(
+        select(
+            func.coalesce(a.c.lesson_id, b.c.lesson_id).label("lesson_id"),
+            *(a.c[f] for f in FIELDS),
+            *(b.c[f].label(f"b_{f}") for f in FIELDS),
+            *(cond.label(kind) for kind, cond in changed.items()),
+        )
+        .select_from(joined)
+        .where(or_(only_a, only_b, any_change))
+        .order_by("lesson_id")
+    )
+
+    changes = []
+    for row in rows:
+        old = [row.timeslot_id, row.room_id, row.teacher_id, row.week_parity]
+        new = [row.b_timeslot_id, row.b_room_id, row.b_teacher_id, row.b_week_parity]
+        if new[0] is None:
+            kinds, new = ["removed"], None
+        elif old[0] is None:
+            kinds, old = ["added"], None
+        else:
+            kinds = [kind for kind in changed if getattr(row, kind)]
+        changes.append(
+            {"lesson_id": row.lesson_id, "a": old, "b": new, "changes": kinds}
+        )
+
+    return {
+        "run_a": run_a,
+        "run_b": run_b,
+        "fields": list(FIELDS),
+        "summary": dict(summary._mapping),
+        "changes": changes,
+    }
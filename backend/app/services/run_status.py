@@ -0,0 +1,136 @@
+import json
+import math
+import os
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.db import engine as db_engine
+from app.models import SolverRun
+
+# Minimum seconds between two progress writes for the same run
+STATUS_WRITE_INTERVAL = float(os.getenv("STATUS_WRITE_INTERVAL", "2.0"))
+# Minimum seconds between two best-so-far schedule snapshots for the same run
+SNAPSHOT_INTERVAL = float(os.getenv("SNAPSHOT_INTERVAL", "10.0"))
+
+
+class RunStatusStore:
+    """
+    Keeps a run's status and progress on its SolverRun row so every API
+    worker process (and node) sees the same state, and it survives restarts.
+
+    Progress updates arrive every generation; they are written at most once
+    per min_interval seconds. Status changes are always written.
+    """
+
+    def __init__(
+        self,
+        run_id: str,
+        min_interval: float = STATUS_WRITE_INTERVAL,
+        snapshot_interval: float = SNAPSHOT_INTERVAL,
+    ):
+        self.run_id = run_id
+        self.min_interval = min_interval
+        self.snapshot_interval = snapshot_interval
+        self._last_write = 0.0
+        self._last_snapshot = 0.0
+        self._snapshot_genome = None
+        self._session_factory = sessionmaker(
+            db_engine, class_=AsyncSession, expire_on_commit=False
+        )
+
+    async def update_progress(self, progress: int, best_cost: float, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < self.min_interval:
+            return
+        self._last_write = now
+        await self._write(
+            progress=progress,
+            # inf is not valid JSON for the status endpoint
+            best_cost=best_cost if math.isfinite(best_cost) else None,
+            progress_updated_at=datetime.utcnow(),
+        )
+
+    async def update_snapshot(
+        self,
+        genome,
+        best_cost: float,
+        build_rows: Callable[[Any], List[Dict[str, Any]]],
+        force=False,
+    ):
+        """
+        Stores the best genome so far as one compact JSON snapshot.
+        Skipped if this genome was already stored or the last snapshot is too
+        recent; build_rows (e.g. SolverEngine._build_result) only runs when a
+        snapshot is actually written.
+        """
+        if genome is None or genome is self._snapshot_genome:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_snapshot < self.snapshot_interval:
+            return
+        self._last_snapshot = now
+        self._snapshot_genome = genome
+
+        compact = [
+            [
+                r["lesson_id"],
+                r["timeslot_id"],
+                r["room_id"],
+                r["teacher_id"],
+                r["week_parity"],
+            ]
+            for r in build_rows(genome)
+        ]
+        await self._write(
+            best_snapshot=json.dumps(compact, separators=(",", ":"), default=int),
+            snapshot_cost=best_cost if math.isfinite(best_cost) else None,
+            snapshot_valid=bool(genome.is_valid),
+            snapshot_at=datetime.utcnow(),
+        )
+
+    async def set_status(self, status: str, error: Optional[str] = None):
+        await self._write(status=status, error=error)
+
+    async def _write(self, **values):
+        async with self._session_factory() as session:
+            await session.execute(
+                update(SolverRun)
+                .where(SolverRun.run_id == self.run_id)
+                .values(**values)
+            )
+            await session.commit()
+
+
+async def get_run_status(session: AsyncSession, run_id: str) -> Dict[str, Any]:
+    result = await session.execute(
+        select(
+            SolverRun.status,
+            SolverRun.progress,
+            SolverRun.best_cost,
+            SolverRun.error,
+            SolverRun.progress_updated_at,
+            SolverRun.snapshot_cost,
+            SolverRun.snapshot_valid,
+            SolverRun.snapshot_at,
+        ).where(SolverRun.run_id == run_id)
+    )
+    row = result.first()
+    if not row:
+        return {"status": "not_found"}
+
+    status = {
+        "status": row.status,
+        "progress": row.progress,
+        "best_cost": row.best_cost,
+        "updated_at": row.progress_updated_at,
+        # Best-so-far schedule served by /results/{run_id} while running
+        "snapshot_cost": row.snapshot_cost,
+        "snapshot_valid": row.snapshot_valid,
+        "snapshot_at": row.snapshot_at,
+    }
+    if row.error:
+        status["error"] = row.error
+    return status
@@ -0,0 +1,165 @@
+import json
+from typing import Any, Dict, List, Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.models import (
+    Lesson,
+    Classroom,
+    TimeSlot,
+    Course,
+    Teacher,
+    TeacherAvailabilityMask,
+    StudentGroup,
+    TeacherCourseLink,
+    TeacherEntranceLink,
+    ProjectClassroomLink,
+    ProjectTeacherLink,
+    ProjectCourseLink,
+    ProjectStudentGroupLink,
+    ScheduleResult,
+    SolverRun,
+)
+from app.solver.engine import SolverEngine
+
+
+async def load_solver_inputs(
+    session: AsyncSession, project_id: int
+) -> Optional[Dict[str, Any]]:
+    """
+    A project's data as SolverEngine keyword arguments (everything except
+    weights and room_assignment). None if there is nothing to schedule.
+    """
+    lessons = (
+        (
+            await session.execute(
+                select(Lesson).where(Lesson.project_id == project_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    classrooms = (
+        (
+            await session.execute(
+                select(Classroom)
+                .join(ProjectClassroomLink)
+                .where(ProjectClassroomLink.project_id == project_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    timeslots = (await session.execute(select(TimeSlot))).scalars().all()
+
+    courses = (
+        (
+            await session.execute(
+                select(Course)
+                .join(ProjectCourseLink)
+                .where(ProjectCourseLink.project_id == project_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    teachers = (
+        (
+            await session.execute(
+                select(Teacher)
+                .join(ProjectTeacherLink)
+                .where(ProjectTeacherLink.project_id == project_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    # One availability bitmask per teacher instead of the link rows
+    availability_masks = dict(
+        (
+            await session.execute(
+                select(
+                    TeacherAvailabilityMask.teacher_id,
+                    TeacherAvailabilityMask.slots_mask,
+                ).where(TeacherAvailabilityMask.project_id == project_id)
+            )
+        ).all()
+    )
+
+    groups = (
+        (
+            await session.execute(
+                select(StudentGroup)
+                .join(ProjectStudentGroupLink)
+                .where(ProjectStudentGroupLink.project_id == project_id)
+            )
+        )
+        .scalars()
+        .all()
+    )
+
+    t_c_links = (await session.execute(select(TeacherCourseLink))).scalars().all()
+    t_e_links = (await session.execute(select(TeacherEntranceLink))).scalars().all()
+
+    if not lessons or not classrooms or not timeslots:
+        return None
+
+    return {
+        "lessons": lessons,
+        "classrooms": classrooms,
+        "timeslots": timeslots,
+        "courses": courses,
+        "teachers": teachers,
+        "groups": groups,
+        "teacher_course_links": t_c_links,
+        "teacher_entrance_links": t_e_links,
+        "teacher_availability_masks": availability_masks,
+    }
+
+
+async def load_solver_engine(
+    session: AsyncSession,
+    project_id: int,
+    weights: Dict[str, float],
+    room_assignment: str = "genome",
+    sections: Optional[List[List[int]]] = None,
+) -> Optional[SolverEngine]:
+    """
+    A SolverEngine for the project, with the given sections (e.g. those a
+    run was solved with, see run_sections) merged.
+    """
+    inputs = await load_solver_inputs(session, project_id)
+    if inputs is None:
+        return None
+    return SolverEngine(
+        **inputs,
+        weights=weights,
+        room_assignment=room_assignment,
+        sections=sections,
+    )
+
+
+def run_sections(run: SolverRun) -> Optional[List[List[int]]]:
+    """The merged sections a run was solved with, None if it had none."""
+    return json.loads(run.sections) if run.sections else None
+
+
+def run_assignments(run_id: str):
+    """
+    Query for a run's (lesson_id, timeslot_id, room_id, teacher_id,
+    week_parity) rows, as SolverEngine.genes_from_assignments reads them.
+    """
+    return (
+        select(
+            ScheduleResult.lesson_id,
+            ScheduleResult.timeslot_id,
+            ScheduleResult.room_id,
+            ScheduleResult.teacher_id,
+            ScheduleResult.week_parity,
+        )
+        .where(ScheduleResult.run_id == run_id)
+        .order_by(ScheduleResult.id)
+    )
@@ -0,0 +1,335 @@
+import asyncio
+import importlib.util
+import os
+from typing import List, Dict, Any, Optional, Callable, Awaitable
+from collections import defaultdict
+from app.solver.engine import SolverEngine
+from app.solver.genome import Genome
+
+# A backend returns the same shape as SolverEngine.run:
+# (list of assignment dicts or None, best cost)
+SolveResult = tuple[List[Dict[str, Any]] | None, float]
+# Polled between iterations; returning True stops the search
+ShouldStop = Optional[Callable[[], Awaitable[bool]]]
+# Called with (iteration, best cost so far, best genome so far)
+ProgressCallback = Optional[Callable[[int, float, Optional[Genome]], Awaitable[None]]]
+
+# Settings
+# CP-SAT time limit in seconds when a run does not set one; CP-SAT has no
+# stagnation stop, so it would otherwise search until cancelled
+SOLVER_TIME_LIMIT = float(os.getenv("SOLVER_TIME_LIMIT", "300"))
+
+
+class SolverBackend:
+    """
+    Base class for solver backends.
+
+    A backend works on an already compiled problem: the SolverEngine instance
+    holds the gene arrays (valid rooms / teachers per gene, fixed parities,
+    allowed days, teacher availability) and the constraint / fitness
+    evaluators, so every backend is scored the same way.
+    """
+
+    name = "base"
+
+    def __init__(self, engine: SolverEngine):
+        self.engine = engine
+
+    async def solve(
+        self,
+        time_limit: Optional[float] = None,
+        should_stop: ShouldStop = None,
+        progress_callback: ProgressCallback = None,
+    ) -> SolveResult:
+        raise NotImplementedError
+
+
+class GeneticBackend(SolverBackend):
+    name = "ga"
+
+    def __init__(
+        self,
+        engine: SolverEngine,
+        population_size: int = 100,
+        generations: int = 1000,
+        max_stagnant_generations: int = 150,
+    ):
+        super().__init__(engine)
+        self.population_size = population_size
+        self.generations = generations
+        self.max_stagnant_generations = max_stagnant_generations
+
+    async def solve(
+        self,
+        time_limit: Optional[float] = None,
+        should_stop: ShouldStop = None,
+        progress_callback: ProgressCallback = None,
+    ) -> SolveResult:
+        return await self.engine.run(
+            population_size=self.population_size,
+            generations=self.generations,
+            max_stagnant_generations=self.max_stagnant_generations,
+            time_limit=time_limit,
+            should_stop=should_stop,
+            progress_callback=progress_callback,
+        )
+
+
+class CPSatBackend(SolverBackend):
+    """
+    Exact feasibility model solved with OR-Tools CP-SAT (optional dependency).
+
+    Every gene picks exactly one (timeslot, room, parity) option and one
+    teacher. Rooms, groups and teachers may hold at most one sub-lesson per
+    (timeslot, week), where ODD sub-lessons occupy the odd week, EVEN the even
+    week and BOTH occupy both. The model has no objective: it either finds a
+    schedule with zero hard violations or proves that none exists. The soft
+    cost of the returned schedule is computed with the engine's
+    FitnessCalculator so it is comparable with the GA.
+    """
+
+    name = "cp"
+
+    def __init__(self, engine: SolverEngine, num_workers: int = 8):
+        super().__init__(engine)
+        self.num_workers = num_workers
+        self.proved_infeasible = False
+        self._solver = None
+
+    async def solve(
+        self,
+        time_limit: Optional[float] = None,
+        should_stop: ShouldStop = None,
+        progress_callback: ProgressCallback = None,
+    ) -> SolveResult:
+        task = asyncio.ensure_future(asyncio.to_thread(self._solve_sync, time_limit))
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=0.5)
+                if should_stop is not None and await should_stop():
+                    self._stop_search()
+            return task.result()
+        except asyncio.CancelledError:
+            # The worker thread keeps running unless CP-SAT is told to stop
+            self._stop_search()
+            raise
+
+    def _stop_search(self):
+        if self._solver is not None:
+            self._solver.StopSearch()
+
+    def _solve_sync(self, time_limit: Optional[float]) -> SolveResult:
+        try:
+            from ortools.sat.python import cp_model
+        except ImportError as e:
+            raise ImportError(
+                "The 'cp' solver backend requires OR-Tools. Install it with "
+                "`pip install ortools`."
+            ) from e
+
+        engine = self.engine
+        checker = engine.constraint_checker
+        num_timeslots = len(engine.timeslots)
+        teacher_slots = checker.teacher_slot_allowed
+
+        def teacher_available(t_idx, ts_idx):
+            return teacher_slots is None or teacher_slots[t_idx, ts_idx]
+
+        model = cp_model.CpModel()
+        # Week 0 = odd, week 1 = even
+        parity_weeks = {0: (0,), 1: (1,), 2: (0, 1)}
+
+        gene_options = []  # per gene: list of (var, ts_idx, room_idx, parity)
+        gene_teacher_vars = []  # per gene: {teacher_idx: var}
+        room_cells = defaultdict(list)
+        group_cells = defaultdict(list)
+        teacher_cells = defaultdict(list)
+
+        for g in range(engine.num_genes):
+            allowed_days = checker.gene_day_allowed[g]
+            valid_teachers = engine.valid_teachers_per_gene[g]
+            rooms = engine.valid_rooms_per_gene[g]
+            parities = [2] if engine.fixed_parities[g] != -1 else [0, 1]
+
+            candidate_slots = range(num_timeslots)
+            if engine.pins[g, 0] >= 0:
+                candidate_slots = [int(engine.pins[g, 0])]
+            slots = [
+                ts
+                for ts in candidate_slots
+                if allowed_days[engine.timeslot_day_map[ts]]
+                and any(teacher_available(k, ts) for k in valid_teachers)
+            ]
+            if not rooms or not slots or not valid_teachers:
+                print(f"CP-SAT: gene {g} has no feasible option.")
+                self.proved_infeasible = True
+                return None, float("inf")
+
+            options = []
+            # (ts, week) -> option vars that put this gene there
+            cell_vars = defaultdict(list)
+            for ts in slots:
+                for parity in parities:
+                    for r in rooms:
+                        var = model.NewBoolVar(f"g{g}_t{ts}_r{r}_p{parity}")
+                        options.append((var, ts, r, parity))
+                        for w in parity_weeks[parity]:
+                            room_cells[(r, ts, w)].append(var)
+                            cell_vars[(ts, w)].append(var)
+            model.AddExactlyOne([o[0] for o in options])
+            gene_options.append(options)
+
+            for (ts, w), cvars in cell_vars.items():
+                for group_id in engine.gene_groups[g]:
+                    group_cells[(group_id, ts, w)].append(sum(cvars))
+
+            if len(valid_teachers) == 1:
+                k = valid_teachers[0]
+                for (ts, w), cvars in cell_vars.items():
+                    teacher_cells[(k, ts, w)].append(sum(cvars))
+                gene_teacher_vars.append({k: None})
+                continue
+
+            # Dynamic teacher: pick one teacher for the gene, and route each
+            # occupied (timeslot, week) cell to that teacher
+            z = {k: model.NewBoolVar(f"g{g}_k{k}") for k in valid_teachers}
+            model.AddExactlyOne(list(z.values()))
+            for (ts, w), cvars in cell_vars.items():
+                routed = []
+                for k in valid_teachers:
+                    if not teacher_available(k, ts):
+                        continue
+                    c = model.NewBoolVar(f"g{g}_t{ts}_w{w}_k{k}")
+                    model.AddImplication(c, z[k])
+                    teacher_cells[(k, ts, w)].append(c)
+                    routed.append(c)
+                model.Add(sum(routed) == sum(cvars))
+            gene_teacher_vars.append(z)
+
+        for cells in (room_cells, group_cells, teacher_cells):
+            for terms in cells.values():
+                if len(terms) > 1:
+                    model.Add(sum(terms) <= 1)
+
+        solver = cp_model.CpSolver()
+        solver.parameters.num_workers = self.num_workers
+        solver.parameters.max_time_in_seconds = float(time_limit or SOLVER_TIME_LIMIT)
+        self._solver = solver
+
+        print(f"CP-SAT: solving model with {engine.num_genes} genes...")
+        status = solver.Solve(model)
+
+        if status == cp_model.INFEASIBLE:
+            print("CP-SAT: problem proved infeasible.")
+            self.proved_infeasible = True
+            return None, float("inf")
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            print(f"CP-SAT: no solution ({solver.StatusName(status)}).")
+            return None, float("inf")
+
+        genome = Genome(engine.num_genes)
+        for g in range(engine.num_genes):
+            for var, ts, r, parity in gene_options[g]:
+                if solver.Value(var):
+                    genome.genes[g, 0] = ts
+                    genome.genes[g, 1] = r
+                    genome.genes[g, 2] = parity
+                    break
+            for k, z in gene_teacher_vars[g].items():
+                if z is None or solver.Value(z):
+                    genome.genes[g, 3] = k
+                    break
+
+        violations, soft_cost = engine.evaluate(genome.genes)
+        genome.fitness = soft_cost + violations
+        genome.is_valid = violations == 0
+        if not genome.is_valid:
+            # Should not happen: the model encodes the same hard constraints
+            print(f"CP-SAT: decoded schedule has {violations} violations.")
+            return None, genome.fitness
+        return engine._build_result(genome), genome.fitness
+
+
+class RaceBackend(SolverBackend):
+    """
+    Runs several backends concurrently with a shared time limit and returns
+    the first valid schedule. If no backend finds one, the lowest cost wins.
+    """
+
+    name = "race"
+
+    def __init__(self, engine: SolverEngine, backends: List[SolverBackend]):
+        super().__init__(engine)
+        self.backends = backends
+
+    async def solve(
+        self,
+        time_limit: Optional[float] = None,
+        should_stop: ShouldStop = None,
+        progress_callback: ProgressCallback = None,
+    ) -> SolveResult:
+        tasks = {
+            asyncio.create_task(
+                b.solve(
+                    time_limit=time_limit,
+                    should_stop=should_stop,
+                    progress_callback=progress_callback,
+                )
+            ): b
+            for b in self.backends
+        }
+        best: SolveResult = (None, float("inf"))
+        pending = set(tasks)
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    backend = tasks[task]
+                    if task.exception() is not None:
+                        print(f"Backend '{backend.name}' failed: {task.exception()}")
+                        continue
+                    results, cost = task.result()
+                    if results:
+                        print(f"Backend '{backend.name}' won the race (cost {cost}).")
+                        return results, cost
+                    if cost < best[1]:
+                        best = (results, cost)
+            return best
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+BACKENDS = ("ga", "cp", "race")
+
+
+def backend_available(name: str) -> bool:
+    """Whether the optional dependencies of a backend are installed."""
+    if name in ("cp", "race"):
+        return importlib.util.find_spec("ortools") is not None
+    return name in BACKENDS
+
+
+def get_backend(
+    name: str,
+    engine: SolverEngine,
+    population_size: int = 100,
+    generations: int = 1000,
+    max_stagnant_generations: int = 150,
+) -> SolverBackend:
+    """Builds the backend selected by name ("ga", "cp" or "race")."""
+    ga = GeneticBackend(
+        engine,
+        population_size=population_size,
+        generations=generations,
+        max_stagnant_generations=max_stagnant_generations,
+    )
+    if name == "ga":
+        return ga
+    if name == "cp":
+        return CPSatBackend(engine)
+    if name == "race":
+        return RaceBackend(engine, [ga, CPSatBackend(engine)])
+    raise ValueError(f"Unknown solver backend '{name}'. Expected one of {BACKENDS}.")
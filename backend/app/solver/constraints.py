@@ -1,7 +1,18 @@
 import numpy as np
-from typing import List, Dict
+from typing import Dict, List, Optional
 from app.models import Classroom
 
+# Score of one violation of each kind; overlaps make a schedule unusable
+VIOLATION_WEIGHTS = {
+    "teacher_overlap": 1000,
+    "group_overlap": 1000,
+    "room_overlap": 1000,
+    "capacity": 100,
+    "room_type": 100,
+    "day_not_allowed": 100,
+    "teacher_unavailable": 100,
+}
+
 
 class ConstraintChecker:
     def __init__(
@@ -11,21 +22,50 @@ class ConstraintChecker:
         lesson_course_ids: np.ndarray,
         lesson_populations: np.ndarray,
         lesson_required_room_types: np.ndarray,
-        lesson_allowed_days: List[List[int]],  # List of allowed days for each gene
+        gene_day_allowed: np.ndarray,  # (num_genes, num_days) bool
         classrooms: List[Classroom],
         timeslot_days: np.ndarray,  # Map timeslot_id -> day_of_week
-        teacher_allowed_slots_by_index: Dict[
-            int, List[int]
-        ] = None,  # Map teacher_idx -> allowed_slots
+        teacher_slot_allowed: Optional[
+            np.ndarray
+        ] = None,  # (num_teachers, num_timeslots) bool, None if unrestricted
+        member_genes: Optional[np.ndarray] = None,
+        member_groups: Optional[np.ndarray] = None,
+        pins: Optional[np.ndarray] = None,
     ):
+        # member_genes / member_groups: (gene, group) pairs, several per gene
+        # for a merged section; one per gene from lesson_group_ids by default
+        # pins: (num_genes, 4) pinned values, -1 where free (see SolverEngine)
         self.num_genes = num_genes
         self.lesson_group_ids = lesson_group_ids
         self.lesson_course_ids = lesson_course_ids
         self.lesson_populations = lesson_populations
         self.lesson_required_room_types = lesson_required_room_types
-        self.lesson_allowed_days = lesson_allowed_days
+        self.gene_day_allowed = gene_day_allowed
         self.timeslot_days = timeslot_days
-        self.teacher_allowed_slots_by_index = teacher_allowed_slots_by_index or {}
+        self.teacher_slot_allowed = teacher_slot_allowed
+        self.gene_indices = np.arange(num_genes)
+        if member_genes is None:
+            member_genes, member_groups = self.gene_indices, lesson_group_ids
+        self.member_genes = member_genes
+        self.member_groups = member_groups
+
+        # Overlaps are found by sorting (teacher | group | room, timeslot,
+        # gene) cell keys. Genes pinned to a timeslot and teacher / room
+        # keep their key in every schedule, so those are sorted once here
+        # and only the other keys are sorted per evaluation.
+        self.num_timeslots = len(timeslot_days)
+        self.fixed_keys = {}
+        if pins is not None:
+            slot_pinned = pins[:, 0] >= 0
+            for kind, entity_ids, genes in (
+                ("teacher", pins[:, 3], self.gene_indices),
+                ("group", member_groups, member_genes),
+                ("room", pins[:, 1], self.gene_indices),
+            ):
+                fixed = slot_pinned[genes] & (entity_ids >= 0)
+                if fixed.any():
+                    keys = self._cell_keys(entity_ids[fixed], pins[:, 0], genes[fixed])
+                    self.fixed_keys[kind] = (fixed, keys, np.sort(keys))
 
         self.classroom_capacities = np.array([c.capacity for c in classrooms])
         # Convert Enum to string or int for comparison. Assuming types are consistent.
@@ -40,7 +80,11 @@ class ConstraintChecker:
         col 3 = teacher_idx
         Returns total violation score (0 means valid).
         """
-        violations = 0
+        counts = self.violation_counts(genome_genes)
+        return sum(VIOLATION_WEIGHTS[kind] * n for kind, n in counts.items())
+
+    def violation_counts(self, genome_genes: np.ndarray) -> Dict[str, int]:
+        """Number of violations of each kind (see VIOLATION_WEIGHTS)."""
         timeslot_indices = genome_genes[:, 0]
         room_indices = genome_genes[:, 1]
         parities = genome_genes[:, 2]
@@ -54,71 +98,114 @@ class ConstraintChecker:
         # Overlap if (mask1 & mask2) > 0
         parity_masks = np.choose(parities, [1, 2, 3])
 
-        def count_conflicts(entity_ids):
-            # Sort by (timeslot, entity)
-            # We want to find rows with same timeslot AND same entity
-            sorted_indices = np.lexsort((timeslot_indices, entity_ids))
-            sorted_times = timeslot_indices[sorted_indices]
-            sorted_entities = entity_ids[sorted_indices]
-            sorted_masks = parity_masks[sorted_indices]
-
-            diff_entity = np.diff(sorted_entities)
-            diff_time = np.diff(sorted_times)
-
-            # Candidates are adjacent rows with same entity and same time
-            candidates = (diff_entity == 0) & (diff_time == 0)
+        def count_conflicts(kind, entity_ids, genes=self.gene_indices):
+            # entity_ids[i] is the entity of gene genes[i]. Sorted cell keys
+            # put the genes of a cell next to each other, in gene order;
+            # adjacent genes meeting in a common week overlap.
+            keys = self._cell_keys(entity_ids, timeslot_indices, genes)
+            sorted_keys = self._sort_keys(kind, keys)
+            sorted_genes = sorted_keys % self.num_genes
+            same_cell = np.diff(sorted_keys // self.num_genes) == 0
 
-            if not np.any(candidates):
+            if not np.any(same_cell):
                 return 0
 
-            # Check parity overlap for candidates
-            mask_i = sorted_masks[:-1]
-            mask_next = sorted_masks[1:]
-            overlaps = (mask_i & mask_next) > 0
-
-            return np.sum(candidates & overlaps)
-
-        # Teacher Overlap
-        v_teacher = count_conflicts(teacher_indices) * 1000
-        violations += v_teacher
-
-        # Group Overlap
-        v_group = count_conflicts(self.lesson_group_ids) * 1000
-        violations += v_group
+            sorted_masks = parity_masks[sorted_genes]
+            overlaps = (sorted_masks[:-1] & sorted_masks[1:]) > 0
+            return int(np.sum(same_cell & overlaps))
 
-        # Room Overlap
-        v_room = count_conflicts(room_indices) * 1000
-        violations += v_room
+        counts = {
+            "teacher_overlap": count_conflicts("teacher", teacher_indices),
+            "group_overlap": count_conflicts(
+                "group", self.member_groups, self.member_genes
+            ),
+            "room_overlap": count_conflicts("room", room_indices),
+        }
 
         # 2. Capacity & Type Check
         assigned_capacities = self.classroom_capacities[room_indices]
-        v_cap = np.sum(assigned_capacities < self.lesson_populations) * 100
-        violations += v_cap
+        counts["capacity"] = int(
+            np.count_nonzero(assigned_capacities < self.lesson_populations)
+        )
 
         assigned_room_types = self.classroom_types[room_indices]
-        v_type = np.sum(assigned_room_types != self.lesson_required_room_types) * 100
-        violations += v_type
+        counts["room_type"] = int(
+            np.count_nonzero(assigned_room_types != self.lesson_required_room_types)
+        )
 
         # 3. Allowed Days Check
         assigned_days = self.timeslot_days[timeslot_indices]
-        v_days = 0
-        for i in range(self.num_genes):
-            allowed = self.lesson_allowed_days[i]
-            if allowed is not None and assigned_days[i] not in allowed:
-                v_days += 100
-        violations += v_days
+        counts["day_not_allowed"] = int(
+            np.count_nonzero(~self.gene_day_allowed[self.gene_indices, assigned_days])
+        )
 
         # 3.5 Teacher Availability Check
-        if self.teacher_allowed_slots_by_index:
-            v_teacher_avail = 0
-            for i in range(self.num_genes):
-                t_idx = teacher_indices[i]
-                assigned_slot = timeslot_indices[i]
-
-                if t_idx in self.teacher_allowed_slots_by_index:
-                    allowed = self.teacher_allowed_slots_by_index[t_idx]
-                    if allowed and assigned_slot not in allowed:
-                        v_teacher_avail += 100
-            violations += v_teacher_avail
-
-        return violations
+        counts["teacher_unavailable"] = 0
+        if self.teacher_slot_allowed is not None:
+            counts["teacher_unavailable"] = int(
+                np.count_nonzero(
+                    ~self.teacher_slot_allowed[teacher_indices, timeslot_indices]
+                )
+            )
+
+        return counts
+
+    def _cell_keys(self, entity_ids, timeslot_indices, genes) -> np.ndarray:
+        # (entity, timeslot, gene) as one sortable int64 per gene
+        keys = entity_ids.astype(np.int64) * self.num_timeslots
+        keys += timeslot_indices[genes]
+        return keys * self.num_genes + genes
+
+    def _sort_keys(self, kind: str, keys: np.ndarray) -> np.ndarray:
+        # keys sorted, merging in the presorted keys of pinned genes
+        if kind not in self.fixed_keys:
+            return np.sort(keys)
+        fixed, fixed_keys, sorted_fixed = self.fixed_keys[kind]
+        if not np.array_equal(keys[fixed], fixed_keys):
+            # A schedule moving pinned genes (e.g. one being evaluated)
+            return np.sort(keys)
+        free = np.sort(keys[~fixed])
+        sorted_keys = np.empty_like(keys)
+        at = np.searchsorted(sorted_fixed, free) + np.arange(len(free))
+        sorted_keys[at] = free
+        in_fixed = np.ones(len(keys), dtype=bool)
+        in_fixed[at] = False
+        sorted_keys[in_fixed] = sorted_fixed
+        return sorted_keys
+
+    def violating_genes(self, genome_genes: np.ndarray) -> np.ndarray:
+        """
+        Bool mask of the genes in at least one violation: sharing a teacher,
+        group or room with another gene in the same timeslot and week, or
+        breaking a per-gene constraint (capacity, room type, day, availability).
+        """
+        timeslot_indices = genome_genes[:, 0]
+        room_indices = genome_genes[:, 1]
+        teacher_indices = genome_genes[:, 3]
+        parity_masks = np.choose(genome_genes[:, 2], [1, 2, 3])
+        num_timeslots = int(timeslot_indices.max(initial=0)) + 1
+
+        violating = np.zeros(len(genome_genes), dtype=bool)
+        for entity_ids, genes in (
+            (teacher_indices, self.gene_indices),
+            (self.member_groups, self.member_genes),
+            (room_indices, self.gene_indices),
+        ):
+            cells = entity_ids.astype(np.int64) * num_timeslots
+            cells += timeslot_indices[genes]
+            for week_bit in (1, 2):
+                in_week = np.flatnonzero(parity_masks[genes] & week_bit)
+                _, inverse, counts = np.unique(
+                    cells[in_week], return_inverse=True, return_counts=True
+                )
+                violating[genes[in_week[counts[inverse] > 1]]] = True
+
+        violating |= self.classroom_capacities[room_indices] < self.lesson_populations
+        violating |= (
+            self.classroom_types[room_indices] != self.lesson_required_room_types
+        )
+        assigned_days = self.timeslot_days[timeslot_indices]
+        violating |= ~self.gene_day_allowed[self.gene_indices, assigned_days]
+        if self.teacher_slot_allowed is not None:
+            violating |= ~self.teacher_slot_allowed[teacher_indices, timeslot_indices]
+        return violating
@@ -1,6 +1,7 @@
 import asyncio
+import time
 import numpy as np
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Callable, Awaitable, Iterable, Optional
 from collections import defaultdict
 from app.models import (
     Lesson,
@@ -13,9 +14,17 @@ from app.models import (
     TimeSlot,
 )
 from app.solver.genome import Population, Genome
-from app.solver.constraints import ConstraintChecker
+from app.solver.constraints import ConstraintChecker, VIOLATION_WEIGHTS
 from app.solver.fitness import FitnessCalculator
 from app.solver.operators import GeneticOperators
+from app.solver.matching import RoomMatcher
+from app.solver.masks import days_mask_to_bool, mask_to_bool
+
+# Gene parity column <-> WeekParity value
+PARITY_NAMES = ("odd", "even", "both")
+PARITY_INDEX = {name: i for i, name in enumerate(PARITY_NAMES)}
+# Lesson fields pinning its timeslot, room and teacher
+PIN_FIELDS = ("pinned_timeslot_id", "pinned_room_id", "pinned_teacher_id")
 
 
 class SolverEngine:
@@ -30,7 +39,20 @@ class SolverEngine:
         teacher_course_links: List[TeacherCourseLink],
         teacher_entrance_links: List[TeacherEntranceLink],
         weights: Dict[str, float],
+        room_assignment: str = "genome",
+        teacher_availability_masks: Optional[Dict[int, bytes]] = None,
+        sections: Optional[List[List[int]]] = None,
     ):
+        # room_assignment:
+        #   "genome"   -> rooms are evolved by the GA like every other column
+        #   "matching" -> the GA evolves time, parity and teacher only; rooms are
+        #                 decoded per timeslot by bipartite matching
+        # teacher_availability_masks: teacher_id -> slots bitmask for the
+        #   project (see app.solver.masks); teachers without one are unrestricted
+        # sections: lesson ids taught together as one section (see
+        #   Preprocessor.merge_small_sections); their lessons share genes
+        if room_assignment not in ("genome", "matching"):
+            raise ValueError(f"Unknown room_assignment mode: {room_assignment}")
 
         self.lessons = lessons
         self.classrooms = classrooms
@@ -50,30 +72,77 @@ class SolverEngine:
                 t_idx = self.teacher_id_to_idx[link.teacher_id]
                 self.course_valid_teachers[link.course_id].append(t_idx)
 
+        self.timeslot_id_to_idx = {ts.id: i for i, ts in enumerate(timeslots)}
+        self.room_id_to_idx = {r.id: i for i, r in enumerate(classrooms)}
+
         # 1. Preprocess Lessons into Genes (SubLessons)
         self.gene_metadata = []  # List of dicts with metadata
+        self.lesson_genes = defaultdict(list)  # lesson_id -> gene indices
         self.fixed_parities = []
+        # Per gene: [timeslot, room, -, teacher] index a lesson is pinned to,
+        # -1 where the solver is free
+        pins = []
+
+        # Section lesson -> the lessons it teaches; sections naming lessons
+        # that are gone or already in another section are ignored, as are
+        # sections repeating a group or pinning their lessons differently
+        lessons_by_id = {lesson.id: lesson for lesson in lessons}
+        free_lessons = set(lessons_by_id)
+        section_of = {}
+        for section in sections or []:
+            if not set(section) <= free_lessons:
+                continue
+            section_lessons = [lessons_by_id[lesson_id] for lesson_id in section]
+            if len({l.group_id for l in section_lessons}) < len(section):
+                print(f"Ignoring section {section}: it repeats a student group.")
+                continue
+            if any(
+                len({getattr(l, field) for l in section_lessons} - {None}) > 1
+                for field in PIN_FIELDS
+            ):
+                print(f"Ignoring section {section}: its lessons are pinned apart.")
+                continue
+            free_lessons -= set(section)
+            for lesson_id in section[1:]:
+                section_of[lesson_id] = section[0]
+        members = defaultdict(list)
+        for lesson in lessons:
+            members[section_of.get(lesson.id, lesson.id)].append(lesson)
 
         # Arrays for ConstraintChecker
         group_ids = []
         course_ids = []
         populations = []
         req_room_types = []
-        allowed_days = []
+        gene_groups = []
 
         self.valid_teachers_per_gene = []
 
         for lesson in lessons:
+            if lesson.id in section_of:
+                continue  # Scheduled with its section
+            section = members[lesson.id]
+            section_groups = [self.groups_map[l.group_id] for l in section]
+            population = sum(group.population for group in section_groups)
+            teacher_id = next(
+                (l.teacher_id for l in section if l.teacher_id is not None), None
+            )
+            # A section's lessons are pinned alike (or not at all)
+            pinned_slot_id, pinned_room_id, pinned_teacher_id = (
+                next((getattr(l, field) for l in section if getattr(l, field)), None)
+                for field in PIN_FIELDS
+            )
+            if pinned_teacher_id in self.teacher_id_to_idx:
+                teacher_id = pinned_teacher_id
             course = self.courses_map[lesson.course_id]
-            group = self.groups_map[lesson.group_id]
             units = course.units
 
             # Determine valid teachers for this lesson
             valid_teacher_indices = []
-            if lesson.teacher_id is not None:
+            if teacher_id is not None:
                 # Pre-assigned teacher
-                if lesson.teacher_id in self.teacher_id_to_idx:
-                    valid_teacher_indices = [self.teacher_id_to_idx[lesson.teacher_id]]
+                if teacher_id in self.teacher_id_to_idx:
+                    valid_teacher_indices = [self.teacher_id_to_idx[teacher_id]]
                 else:
                     # Fallback
                     valid_teacher_indices = self.course_valid_teachers.get(
@@ -87,15 +156,6 @@ class SolverEngine:
                 # Fallback: all teachers if none found (should be handled by validation ideally)
                 valid_teacher_indices = list(self.teacher_id_to_idx.values())
 
-            # Parse allowed days
-            g_allowed = None
-            if group.allowed_days:
-                # "0,2,4" -> [0, 2, 4]
-                try:
-                    g_allowed = [int(d) for d in group.allowed_days.split(",")]
-                except:
-                    pass
-
             # Determine SubLessons
             # 2 Units -> 1 Gene (Both)
             # 3 Units -> 2 Genes (1 Both, 1 Variable)
@@ -118,12 +178,23 @@ class SolverEngine:
                 if rem:
                     sub_lessons.append({"parity": -1})
 
-            for sl in sub_lessons:
+            pinned_teacher = self.teacher_id_to_idx.get(pinned_teacher_id, -1)
+            pinned_room = self.room_id_to_idx.get(pinned_room_id, -1)
+            pinned_slot = self.timeslot_id_to_idx.get(pinned_slot_id, -1)
+
+            for part, sl in enumerate(sub_lessons):
+                # The other parts of a pinned lesson still need their own slot
+                pins.append(
+                    (pinned_slot if part == 0 else -1, pinned_room, -1, pinned_teacher)
+                )
+                for l in section:
+                    self.lesson_genes[l.id].append(len(self.gene_metadata))
                 self.gene_metadata.append(
                     {
                         "lesson_id": lesson.id,
+                        "lesson_ids": [l.id for l in section],
                         "course_id": lesson.course_id,
-                        "teacher_id": lesson.teacher_id,
+                        "teacher_id": teacher_id,
                         "group_id": lesson.group_id,
                     }
                 )
@@ -131,16 +202,38 @@ class SolverEngine:
 
                 group_ids.append(lesson.group_id)
                 course_ids.append(lesson.course_id)
-                populations.append(group.population)
+                populations.append(population)
                 req_room_types.append(course.required_room_type)
-                allowed_days.append(g_allowed)
+                gene_groups.append(section_groups)
                 self.valid_teachers_per_gene.append(valid_teacher_indices)
 
         self.num_genes = len(self.gene_metadata)
         self.fixed_parities = np.array(self.fixed_parities)
+        self.pins = np.array(pins, dtype=int).reshape(-1, 4)
+        # Genes with nothing left to choose are never mutated
+        self.movable_genes = ~(
+            (self.pins[:, [0, 1, 3]] >= 0).all(axis=1) & (self.fixed_parities == 2)
+        )
 
         # Maps
-        self.timeslot_day_map = np.array([ts.day_of_week for ts in timeslots])
+        self.timeslot_day_map = np.array(
+            [ts.day_of_week for ts in timeslots], dtype=int
+        )
+
+        # Allowed days per gene: the days all of its groups allow
+        num_days = max(7, int(self.timeslot_day_map.max(initial=0)) + 1)
+        group_days = {}
+        gene_day_allowed = np.ones((self.num_genes, num_days), dtype=bool)
+        for i, section_groups in enumerate(gene_groups):
+            for group in section_groups:
+                if group.id not in group_days:
+                    group_days[group.id] = days_mask_to_bool(
+                        group.allowed_days_mask, num_days
+                    )
+                gene_day_allowed[i] &= group_days[group.id]
+
+        # Group ids per gene, more than one for merged sections
+        self.gene_groups = [[group.id for group in grps] for grps in gene_groups]
 
         # Compute daily index
         ts_daily_idx = np.zeros(len(timeslots), dtype=int)
@@ -156,28 +249,20 @@ class SolverEngine:
 
         self.timeslot_daily_idx_map = ts_daily_idx
 
-        # Process Teacher Availability
-        teacher_allowed_slots_by_index = {}
-        # Map timeslot ID to index
-        ts_id_to_idx = {ts.id: i for i, ts in enumerate(timeslots)}
-
-        for teacher in teachers:
-            # Check availability_links if loaded, or assume passed separately?
-            # The SolverEngine receives `teachers` list.
-            # We need to ensure `availability_links` are loaded on these teacher objects.
-            # Or we can pass a separate map.
-            # Assuming `teachers` have `availability_links` loaded.
-            if hasattr(teacher, "availability_links") and teacher.availability_links:
-                allowed_indices = []
-                for link in teacher.availability_links:
-                    if link.timeslot_id in ts_id_to_idx:
-                        allowed_indices.append(ts_id_to_idx[link.timeslot_id])
-
-                if allowed_indices:
-                    t_idx = self.teacher_id_to_idx[teacher.id]
-                    teacher_allowed_slots_by_index[t_idx] = allowed_indices
-            # Fallback for old string format if still present (migration removed it but object might have it if not refreshed?)
-            # No, migration removed it.
+        # Process Teacher Availability: (teacher_idx, timeslot_idx) -> allowed
+        teacher_slot_allowed = None
+        if teacher_availability_masks:
+            ts_ids = np.array([ts.id for ts in timeslots], dtype=np.int64)
+            teacher_slot_allowed = np.ones(
+                (len(teachers), len(timeslots)), dtype=bool
+            )
+            for t_idx, teacher in enumerate(teachers):
+                allowed = mask_to_bool(
+                    teacher_availability_masks.get(teacher.id), ts_ids
+                )
+                # No availability in this project's slots means unrestricted
+                if allowed.any():
+                    teacher_slot_allowed[t_idx] = allowed
 
         # Precompute valid rooms for each gene
         self.valid_rooms_per_gene = []
@@ -189,6 +274,13 @@ class SolverEngine:
                 # Check Type (Strict equality as per constraint checker)
                 if room.type == req_type and room.capacity >= pop:
                     valid_rooms.append(r_idx)
+            if self.pins[i, 1] >= 0:
+                if self.pins[i, 1] not in valid_rooms:
+                    print(
+                        f"Lesson {self.gene_metadata[i]['lesson_id']} is pinned "
+                        f"to a room of the wrong type or capacity."
+                    )
+                valid_rooms = [int(self.pins[i, 1])]
 
             self.valid_rooms_per_gene.append(valid_rooms)
 
@@ -198,10 +290,17 @@ class SolverEngine:
             np.array(course_ids),
             np.array(populations),
             np.array(req_room_types),
-            allowed_days,
+            gene_day_allowed,
             classrooms,
             self.timeslot_day_map,
-            teacher_allowed_slots_by_index=teacher_allowed_slots_by_index,
+            teacher_slot_allowed=teacher_slot_allowed,
+            member_genes=np.repeat(
+                np.arange(self.num_genes), [len(g) for g in self.gene_groups]
+            ).astype(int),
+            member_groups=np.array(
+                [gid for grps in self.gene_groups for gid in grps], dtype=int
+            ),
+            pins=self.pins,
         )
 
         self.fitness_calculator = FitnessCalculator(weights)
@@ -211,14 +310,145 @@ class SolverEngine:
             self.fixed_parities,
             self.valid_rooms_per_gene,
             self.valid_teachers_per_gene,
+            mutate_rooms=room_assignment == "genome",
+            pins=self.pins,
+        )
+        if not self.movable_genes.all():
+            self.operators.free_genes = self.movable_genes
+
+        self.room_matcher = None
+        if room_assignment == "matching":
+            self.room_matcher = RoomMatcher(len(classrooms), self.valid_rooms_per_gene)
+
+        # Repair mode (see set_repair): the schedule run() starts from
+        self.repair_genes = None
+
+    def evaluate(self, genome_genes: np.ndarray) -> tuple[int, float]:
+        """
+        Returns (hard violations, soft cost) for a genome's genes.
+        In matching mode the room column is decoded in place first.
+        """
+        if self.room_matcher:
+            # Unmatched sub-lessons keep a clashing room and surface
+            # as room overlaps in the constraint checker
+            self.room_matcher.assign(genome_genes)
+
+        violations = self.constraint_checker.calculate_violations(genome_genes)
+
+        soft_cost = self.fitness_calculator.calculate_cost(
+            genome_genes,
+            self.constraint_checker.member_groups,
+            self.timeslot_day_map,
+            self.timeslot_daily_idx_map,
+            group_genes=self.constraint_checker.member_genes,
+        )
+        return violations, soft_cost
+
+    def evaluate_breakdown(self, genome_genes: np.ndarray) -> Dict[str, Any]:
+        """
+        evaluate() itemized: violation counts per kind and soft cost per term,
+        for reporting on a schedule rather than ranking genomes.
+        """
+        if self.room_matcher:
+            self.room_matcher.assign(genome_genes)
+        hard = self.constraint_checker.violation_counts(genome_genes)
+        soft = self.fitness_calculator.cost_breakdown(
+            genome_genes,
+            self.constraint_checker.member_groups,
+            self.timeslot_day_map,
+            self.timeslot_daily_idx_map,
+            group_genes=self.constraint_checker.member_genes,
+        )
+        violations = sum(VIOLATION_WEIGHTS[kind] * n for kind, n in hard.items())
+        return {
+            "valid": violations == 0,
+            "violations": violations,
+            "soft_cost": sum(term["cost"] for term in soft.values()),
+            "hard": hard,
+            "soft": soft,
+        }
+
+    def apply_pins(self, genes: np.ndarray) -> np.ndarray:
+        """
+        Overwrites the pinned columns of genes in place. Returns the mask of
+        genes that were not at their pinned values.
+        """
+        pinned = self.pins >= 0
+        moved = (pinned & (genes != self.pins)).any(axis=1)
+        genes[pinned] = self.pins[pinned]
+        return moved
+
+    def set_repair(
+        self,
+        genes: np.ndarray,
+        lesson_ids: Iterable[int] = (),
+        teacher_ids: Iterable[int] = (),
+    ) -> int:
+        """
+        Switches run() to repairing an existing schedule instead of solving
+        from scratch. Only the genes that have to move are evolved: those
+        left unassigned (-1 rows, see genes_from_assignments(partial=True)),
+        those in a violation under the current data (e.g. a teacher's new
+        availability), those of the given lessons and teachers, and their
+        conflict neighbourhood, i.e. every gene sharing a teacher or group
+        with them. All other genes keep their place. Returns the number of
+        free genes.
+        """
+        if self.room_matcher:
+            raise ValueError("Repair needs rooms in the genome, not matching")
+        genes = np.array(genes, dtype=int, copy=True)
+
+        # Unassigned genes get a random valid placement to start from
+        unassigned = (genes < 0).any(axis=1)
+        if unassigned.any():
+            filler = Genome(self.num_genes)
+            filler.random_init(
+                len(self.timeslots),
+                len(self.classrooms),
+                self.fixed_parities,
+                self.valid_rooms_per_gene,
+                self.valid_teachers_per_gene,
+            )
+            genes[unassigned] = filler.genes[unassigned]
+
+        # Pins set since the run move their lessons too
+        changed = unassigned | self.apply_pins(genes)
+        changed |= self.constraint_checker.violating_genes(genes)
+        for lesson_id in lesson_ids:
+            changed[self.lesson_genes.get(lesson_id, [])] = True
+        teacher_idx = [
+            self.teacher_id_to_idx[t]
+            for t in teacher_ids
+            if t in self.teacher_id_to_idx
+        ]
+        changed |= np.isin(genes[:, 3], teacher_idx)
+
+        member_genes = self.constraint_checker.member_genes
+        member_groups = self.constraint_checker.member_groups
+        changed_groups = member_groups[changed[member_genes]]
+        near = np.zeros_like(changed)
+        near[member_genes[np.isin(member_groups, changed_groups)]] = True
+        free = self.movable_genes & (
+            changed | near | np.isin(genes[:, 3], genes[changed, 3])
         )
 
+        self.repair_genes = genes
+        self.operators.free_genes = free
+        return int(np.count_nonzero(free))
+
     async def run(
         self,
         population_size: int = 100,
         generations: int = 1000,
         max_stagnant_generations: int = 150,
+        time_limit: float | None = None,
+        should_stop: Optional[Callable[[], Awaitable[bool]]] = None,
+        progress_callback: Optional[
+            Callable[[int, float, Optional[Genome]], Awaitable[None]]
+        ] = None,
     ) -> tuple[List[Dict[str, Any]] | None, float]:
+        deadline = time.monotonic() + time_limit if time_limit else None
+
         population = Population(population_size, self.num_genes)
         population.init_population(
             len(self.timeslots),
@@ -227,6 +457,15 @@ class SolverEngine:
             self.valid_rooms_per_gene,
             self.valid_teachers_per_gene,
         )
+        for genome in population.genomes:
+            self.apply_pins(genome.genes)
+        if self.repair_genes is not None:
+            # The existing schedule plus variants with its free genes
+            # scattered; frozen genes never change after this
+            frozen = ~self.operators.free_genes
+            population.genomes[0].genes[:] = self.repair_genes
+            for genome in population.genomes[1:]:
+                genome.genes[frozen] = self.repair_genes[frozen]
 
         best_genome = None
         best_cost = float("inf")
@@ -237,14 +476,7 @@ class SolverEngine:
             valid_genomes = []
             improved = False
             for genome in population.genomes:
-                violations = self.constraint_checker.calculate_violations(genome.genes)
-
-                soft_cost = self.fitness_calculator.calculate_cost(
-                    genome.genes,
-                    self.constraint_checker.lesson_group_ids,
-                    self.timeslot_day_map,
-                    self.timeslot_daily_idx_map,
-                )
+                violations, soft_cost = self.evaluate(genome.genes)
 
                 genome.fitness = soft_cost + violations
 
@@ -264,12 +496,26 @@ class SolverEngine:
             else:
                 stagnant_counter += 1
 
+            if progress_callback is not None:
+                # best_genome is only replaced on improvement, so callers can
+                # detect a new best by identity
+                await progress_callback(gen, best_cost, best_genome)
+
             if stagnant_counter >= max_stagnant_generations:
                 print(
                     f"Stopping early at generation {gen} due to stagnation ({max_stagnant_generations} gens without improvement)."
                 )
                 break
 
+            if deadline is not None and time.monotonic() >= deadline:
+                print(f"Stopping at generation {gen}: time limit reached.")
+                break
+
+            # Cooperative cancellation between generations
+            if should_stop is not None and await should_stop():
+                print(f"Stopping at generation {gen}: cancelled.")
+                break
+
             # Selection (Tournament)
             new_genomes = []
             # Elitism: Keep best
@@ -301,6 +547,9 @@ class SolverEngine:
             if gen % 10 == 0:
                 print(f"Generation {gen}/{generations}: Best Cost = {best_cost}")
 
+            # Yield to the event loop so other tasks (and cancellation) can run
+            await asyncio.sleep(0)
+
         if best_genome and best_genome.is_valid:
             # Calculate satisfaction percentage
             # Assuming max possible cost is roughly estimated or we normalize
@@ -321,31 +570,72 @@ class SolverEngine:
         return selected[0]
 
     def _build_result(self, genome: Genome) -> List[Dict[str, Any]]:
+        return self.results_from_genes(genome.genes)
+
+    def results_from_genes(self, genes: np.ndarray) -> List[Dict[str, Any]]:
         results = []
-        for i, gene in enumerate(genome.genes):
+        for i, gene in enumerate(genes):
             ts_idx = gene[0]
             room_idx = gene[1]
             parity = gene[2]  # 0, 1, 2
             teacher_idx = gene[3]
 
             meta = self.gene_metadata[i]
-
-            # Map parity int to Enum string
-            parity_str = "both"
-            if parity == 0:
-                parity_str = "odd"
-            elif parity == 1:
-                parity_str = "even"
-
             teacher_id = self.teacher_idx_to_id.get(teacher_idx)
 
-            results.append(
-                {
-                    "lesson_id": meta["lesson_id"],
-                    "timeslot_id": self.timeslots[ts_idx].id,
-                    "room_id": self.classrooms[room_idx].id,
-                    "week_parity": parity_str,
-                    "teacher_id": teacher_id,
-                }
-            )
+            # One row per lesson of a merged section, all in the same place
+            for lesson_id in meta["lesson_ids"]:
+                results.append(
+                    {
+                        "lesson_id": lesson_id,
+                        "timeslot_id": self.timeslots[ts_idx].id,
+                        "room_id": self.classrooms[room_idx].id,
+                        "week_parity": PARITY_NAMES[parity],
+                        "teacher_id": teacher_id,
+                    }
+                )
         return results
+
+    def genes_from_assignments(
+        self, assignments, partial: bool = False
+    ) -> np.ndarray:
+        """
+        Inverse of results_from_genes: (lesson_id, timeslot_id, room_id,
+        teacher_id, week_parity) rows, in ScheduleResult id order, to a
+        (num_genes, 4) gene array. A missing teacher_id means the lesson's
+        own teacher. Raises ValueError if the rows do not match this
+        engine's lessons and resources (e.g. a stale run); with partial,
+        such rows are skipped and genes without a usable row stay -1.
+        """
+        genes = np.full((self.num_genes, 4), -1, dtype=int)
+        seen = defaultdict(int)
+        for lesson_id, timeslot_id, room_id, teacher_id, week_parity in assignments:
+            lesson_genes = self.lesson_genes.get(lesson_id)
+            if not lesson_genes or seen[lesson_id] >= len(lesson_genes):
+                if partial:
+                    continue
+                raise ValueError(f"Assignment for unknown lesson {lesson_id}")
+            g = lesson_genes[seen[lesson_id]]
+            seen[lesson_id] += 1
+            if teacher_id is None:
+                teacher_id = self.gene_metadata[g]["teacher_id"]
+            try:
+                genes[g] = (
+                    self.timeslot_id_to_idx[timeslot_id],
+                    self.room_id_to_idx[room_id],
+                    PARITY_INDEX[getattr(week_parity, "value", week_parity)],
+                    self.teacher_id_to_idx[teacher_id],
+                )
+            except KeyError as e:
+                if partial:
+                    continue
+                raise ValueError(
+                    f"Assignment of lesson {lesson_id} uses unknown id {e}"
+                ) from None
+        if not partial and (genes[:, 0] < 0).any():
+            missing = {
+                self.gene_metadata[g]["lesson_id"]
+                for g in np.flatnonzero(genes[:, 0] < 0)
+            }
+            raise ValueError(f"No assignment for lessons {sorted(missing)}")
+        return genes
@@ -13,78 +13,211 @@ class FitnessCalculator:
         lesson_group_ids: np.ndarray,
         timeslot_day_map: np.ndarray,  # Map timeslot_idx -> day_idx (0-5)
         timeslot_daily_idx_map: np.ndarray,  # Map timeslot_idx -> 0, 1, 2, 3, 4
+        group_genes: np.ndarray = None,
     ) -> float:
         """
         Calculate the weighted cost (lower is better).
+        With group_genes, lesson_group_ids[i] is a group of gene
+        group_genes[i] (genes of merged sections have several groups).
         """
         cost = 0.0
         timeslot_indices = genome_genes[:, 0]
         parities = genome_genes[:, 2]  # 0, 1, 2
         teacher_indices = genome_genes[:, 3]
 
-        # Helper to calculate gaps for a set of slots
-        def calc_gaps(slots):
-            if len(slots) <= 1:
-                return 0
-            daily_slots = timeslot_daily_idx_map[slots]
-            # Sort by daily slot
-            daily_slots.sort()
-            # Gaps = sum(diff - 1)
-            return np.sum(np.diff(daily_slots) - 1)
-
         # 1. Teacher Idle Time (Gaps)
         unique_teachers = np.unique(teacher_indices)
         for t_idx in unique_teachers:
             t_mask = teacher_indices == t_idx
-            t_slots = timeslot_indices[t_mask]
-            t_parities = parities[t_mask]
-            t_days = timeslot_day_map[t_slots]
-
-            # For each day the teacher works
-            for d in np.unique(t_days):
-                day_mask = t_days == d
-                d_slots = t_slots[day_mask]
-                d_parities = t_parities[day_mask]
-
-                # Odd Week Slots: Parity is ODD(0) or BOTH(2)
-                odd_mask = (d_parities == 0) | (d_parities == 2)
-                odd_slots = d_slots[odd_mask]
-                cost += calc_gaps(odd_slots) * self.weights.get("teacher_idle", 1.0)
-
-                # Even Week Slots: Parity is EVEN(1) or BOTH(2)
-                even_mask = (d_parities == 1) | (d_parities == 2)
-                even_slots = d_slots[even_mask]
-                cost += calc_gaps(even_slots) * self.weights.get("teacher_idle", 1.0)
+            cost += self.teacher_cost(
+                timeslot_indices[t_mask],
+                parities[t_mask],
+                timeslot_day_map,
+                timeslot_daily_idx_map,
+            )
 
         # 2. Student Constraints
+        if group_genes is not None:
+            timeslot_indices = timeslot_indices[group_genes]
+            parities = parities[group_genes]
         unique_groups = np.unique(lesson_group_ids)
         for g_id in unique_groups:
             g_mask = lesson_group_ids == g_id
-            g_slots = timeslot_indices[g_mask]
-            g_parities = parities[g_mask]
-            g_days = timeslot_day_map[g_slots]
+            cost += self.group_cost(
+                timeslot_indices[g_mask],
+                parities[g_mask],
+                timeslot_day_map,
+                timeslot_daily_idx_map,
+            )
+
+        return cost
+
+    def cost_breakdown(
+        self,
+        genome_genes: np.ndarray,
+        lesson_group_ids: np.ndarray,
+        timeslot_day_map: np.ndarray,
+        timeslot_daily_idx_map: np.ndarray,
+        group_genes: np.ndarray = None,
+    ) -> Dict[str, Dict[str, float]]:
+        """
+        calculate_cost split by term, each as its raw count (idle slots,
+        days on campus) and weighted cost. Vectorized over all teachers and
+        groups at once; the costs sum to calculate_cost.
+        """
+        timeslot_indices = genome_genes[:, 0]
+        parities = genome_genes[:, 2]
+        teacher_indices = genome_genes[:, 3]
+        maps = (timeslot_day_map, timeslot_daily_idx_map)
+        num_days = int(timeslot_day_map.max()) + 1
+
+        teacher_stats = day_slot_stats(
+            teacher_indices,
+            int(teacher_indices.max(initial=-1)) + 1,
+            timeslot_indices,
+            parities,
+            *maps,
+            num_days,
+        )
+        if group_genes is not None:
+            timeslot_indices = timeslot_indices[group_genes]
+            parities = parities[group_genes]
+        _, group_owners = np.unique(lesson_group_ids, return_inverse=True)
+        group_stats = day_slot_stats(
+            group_owners,
+            int(group_owners.max(initial=-1)) + 1,
+            timeslot_indices,
+            parities,
+            *maps,
+            num_days,
+        )
+        counts = {
+            "teacher_idle": int(span_gaps(*teacher_stats).sum()),
+            "student_idle": int(span_gaps(*group_stats).sum()),
+            "student_compactness": int(np.count_nonzero(group_stats[0])),
+        }
+        return {
+            term: {"count": n, "cost": n * self.weights.get(term, 1.0)}
+            for term, n in counts.items()
+        }
+
+    # Per-entity costs: calculate_cost is their sum over every teacher and
+    # group, so an edit only needs the entities it touches re-scored
+
+    def teacher_cost(
+        self,
+        t_slots: np.ndarray,
+        t_parities: np.ndarray,
+        timeslot_day_map: np.ndarray,
+        timeslot_daily_idx_map: np.ndarray,
+    ) -> float:
+        """Idle time of one teacher given the timeslots / parities they teach."""
+        cost = 0.0
+        t_days = timeslot_day_map[t_slots]
+
+        # For each day the teacher works
+        for d in np.unique(t_days):
+            day_mask = t_days == d
+            d_slots = t_slots[day_mask]
+            d_parities = t_parities[day_mask]
+
+            # Odd Week Slots: Parity is ODD(0) or BOTH(2)
+            odd_mask = (d_parities == 0) | (d_parities == 2)
+            odd_slots = d_slots[odd_mask]
+            cost += _gaps(odd_slots, timeslot_daily_idx_map) * self.weights.get(
+                "teacher_idle", 1.0
+            )
+
+            # Even Week Slots: Parity is EVEN(1) or BOTH(2)
+            even_mask = (d_parities == 1) | (d_parities == 2)
+            even_slots = d_slots[even_mask]
+            cost += _gaps(even_slots, timeslot_daily_idx_map) * self.weights.get(
+                "teacher_idle", 1.0
+            )
+        return cost
 
-            # Compactness: Count unique days
-            # Odd Week Days
-            odd_mask = (g_parities == 0) | (g_parities == 2)
-            odd_days = np.unique(g_days[odd_mask])
-            cost += len(odd_days) * self.weights.get("student_compactness", 1.0)
+    def group_cost(
+        self,
+        g_slots: np.ndarray,
+        g_parities: np.ndarray,
+        timeslot_day_map: np.ndarray,
+        timeslot_daily_idx_map: np.ndarray,
+    ) -> float:
+        """Compactness and idle time of one student group."""
+        cost = 0.0
+        g_days = timeslot_day_map[g_slots]
 
-            # Even Week Days
-            even_mask = (g_parities == 1) | (g_parities == 2)
-            even_days = np.unique(g_days[even_mask])
-            cost += len(even_days) * self.weights.get("student_compactness", 1.0)
+        # Compactness: Count unique days
+        # Odd Week Days
+        odd_mask = (g_parities == 0) | (g_parities == 2)
+        odd_days = np.unique(g_days[odd_mask])
+        cost += len(odd_days) * self.weights.get("student_compactness", 1.0)
 
-            # Idle Time (Gaps)
-            for d in np.unique(g_days):
-                day_mask = g_days == d
-                d_slots = g_slots[day_mask]
-                d_parities = g_parities[day_mask]
+        # Even Week Days
+        even_mask = (g_parities == 1) | (g_parities == 2)
+        even_days = np.unique(g_days[even_mask])
+        cost += len(even_days) * self.weights.get("student_compactness", 1.0)
 
-                odd_slots = d_slots[(d_parities == 0) | (d_parities == 2)]
-                cost += calc_gaps(odd_slots) * self.weights.get("student_idle", 1.0)
+        # Idle Time (Gaps)
+        for d in np.unique(g_days):
+            day_mask = g_days == d
+            d_slots = g_slots[day_mask]
+            d_parities = g_parities[day_mask]
 
-                even_slots = d_slots[(d_parities == 1) | (d_parities == 2)]
-                cost += calc_gaps(even_slots) * self.weights.get("student_idle", 1.0)
+            odd_slots = d_slots[(d_parities == 0) | (d_parities == 2)]
+            cost += _gaps(odd_slots, timeslot_daily_idx_map) * self.weights.get(
+                "student_idle", 1.0
+            )
 
+            even_slots = d_slots[(d_parities == 1) | (d_parities == 2)]
+            cost += _gaps(even_slots, timeslot_daily_idx_map) * self.weights.get(
+                "student_idle", 1.0
+            )
         return cost
+
+
+def _gaps(slots: np.ndarray, timeslot_daily_idx_map: np.ndarray) -> int:
+    # Gaps between a set of slots of one day: sum(diff - 1)
+    if len(slots) <= 1:
+        return 0
+    daily_slots = np.sort(timeslot_daily_idx_map[slots])
+    return np.sum(np.diff(daily_slots) - 1)
+
+
+# Weeks a parity meets as (odd, even) flags: 0=Odd, 1=Even, 2=Both
+WEEK_ROWS = np.array([[1, 0], [0, 1], [1, 1]])
+NO_SLOT = 1 << 30
+
+
+def day_slot_stats(
+    owners: np.ndarray,
+    num_owners: int,
+    slots: np.ndarray,
+    parities: np.ndarray,
+    timeslot_day_map: np.ndarray,
+    timeslot_daily_idx_map: np.ndarray,
+    num_days: int,
+):
+    """
+    Per (owner, day, week): number of slots and the first / last daily slot
+    index, as three (num_owners, num_days, 2) arrays.
+    """
+    n = np.zeros((num_owners, num_days, 2), dtype=int)
+    first = np.full_like(n, NO_SLOT)
+    last = np.full_like(n, -1)
+    days = timeslot_day_map[slots]
+    daily = timeslot_daily_idx_map[slots]
+    weeks = WEEK_ROWS[parities]
+    for week in (0, 1):
+        sel = weeks[:, week] == 1
+        key = (owners[sel], days[sel], np.full(np.count_nonzero(sel), week))
+        np.add.at(n, key, 1)
+        np.minimum.at(first, key, daily[sel])
+        np.maximum.at(last, key, daily[sel])
+    return n, first, last
+
+
+def span_gaps(n: np.ndarray, first: np.ndarray, last: np.ndarray) -> np.ndarray:
+    # _gaps of n sorted daily slots: sum(diff - 1) telescopes to
+    # last - first - (n - 1)
+    return np.where(n >= 2, last - first - n + 1, 0)
@@ -0,0 +1,54 @@
+import numpy as np
+from typing import Iterable, List, Optional
+
+# Availability is stored as bitmaps: bit i of a teacher's slots mask is set if
+# the teacher is available at the timeslot with id i (bytes little-endian,
+# least significant bit first). A group's days mask has bit d set for each
+# allowed day_of_week d.
+
+
+def slots_to_mask(timeslot_ids: Iterable[int]) -> bytes:
+    ids = np.fromiter(timeslot_ids, dtype=np.int64)
+    if ids.size == 0:
+        return b""
+    bits = np.zeros(int(ids.max()) + 1, dtype=np.uint8)
+    bits[ids] = 1
+    return np.packbits(bits, bitorder="little").tobytes()
+
+
+def mask_to_slots(mask: Optional[bytes]) -> List[int]:
+    if not mask:
+        return []
+    bits = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), bitorder="little")
+    return np.flatnonzero(bits).tolist()
+
+
+def mask_to_bool(mask: Optional[bytes], timeslot_ids: np.ndarray) -> np.ndarray:
+    """Availability of each of the given timeslot ids."""
+    allowed = np.zeros(len(timeslot_ids), dtype=bool)
+    if not mask:
+        return allowed
+    bits = np.unpackbits(np.frombuffer(mask, dtype=np.uint8), bitorder="little")
+    inside = timeslot_ids < bits.size
+    allowed[inside] = bits[timeslot_ids[inside]].astype(bool)
+    return allowed
+
+
+def days_to_mask(allowed_days: Optional[str]) -> Optional[int]:
+    """"0,2,4" -> 0b10101. None (all days allowed) if empty or unparsable."""
+    if not allowed_days:
+        return None
+    try:
+        days = [int(d) for d in allowed_days.split(",") if d.strip()]
+    except ValueError:
+        return None
+    mask = 0
+    for d in days:
+        mask |= 1 << d
+    return mask or None
+
+
+def days_mask_to_bool(mask: Optional[int], num_days: int) -> np.ndarray:
+    if mask is None:
+        return np.ones(num_days, dtype=bool)
+    return (mask >> np.arange(num_days)) & 1 == 1
@@ -0,0 +1,88 @@
+import numpy as np
+from typing import List, Dict, Set
+
+
+class RoomMatcher:
+    """
+    Decodes the room column of a genome from its timeslot and parity columns.
+
+    Once every sub-lesson has a timeslot and a parity, room allocation inside a
+    single timeslot is a bipartite matching between sub-lessons and their valid
+    rooms. BOTH-parity sub-lessons need a room for the whole fortnight, so they
+    are matched first; ODD and EVEN sub-lessons are then matched independently
+    on the rooms that are left, since they never meet each other.
+    """
+
+    def __init__(self, num_classrooms: int, valid_rooms_per_gene: List[List[int]]):
+        self.num_classrooms = num_classrooms
+        self.valid_rooms_per_gene = valid_rooms_per_gene
+
+    def assign(self, genome_genes: np.ndarray) -> int:
+        """
+        Overwrites column 1 (room) of genome_genes in place.
+        Returns the number of sub-lessons that could not be matched. Those keep a
+        fallback room, so the ConstraintChecker sees them as room overlaps.
+        """
+        timeslot_indices = genome_genes[:, 0]
+        parities = genome_genes[:, 2]
+
+        order = np.argsort(timeslot_indices, kind="stable")
+        sorted_times = timeslot_indices[order]
+        # Split sorted gene indices into one block per timeslot
+        splits = np.flatnonzero(np.diff(sorted_times)) + 1
+
+        unmatched = 0
+        for block in np.split(order, splits):
+            both = [g for g in block if parities[g] == 2]
+            odd = [g for g in block if parities[g] == 0]
+            even = [g for g in block if parities[g] == 1]
+
+            assigned = self._match(both, genome_genes, blocked=set())
+            blocked = set(assigned.values())
+            assigned.update(self._match(odd, genome_genes, blocked))
+            assigned.update(self._match(even, genome_genes, blocked))
+
+            for g in block:
+                if g in assigned:
+                    genome_genes[g, 1] = assigned[g]
+                else:
+                    unmatched += 1
+                    valid_rooms = self.valid_rooms_per_gene[g]
+                    if valid_rooms and genome_genes[g, 1] not in valid_rooms:
+                        genome_genes[g, 1] = valid_rooms[0]
+
+        return unmatched
+
+    def _match(
+        self, genes: List[int], genome_genes: np.ndarray, blocked: Set[int]
+    ) -> Dict[int, int]:
+        # Kuhn's augmenting path algorithm. room -> gene
+        room_owner: Dict[int, int] = {}
+        for g in genes:
+            self._augment(g, genome_genes, room_owner, blocked, set())
+        return {g: r for r, g in room_owner.items()}
+
+    def _augment(
+        self,
+        gene: int,
+        genome_genes: np.ndarray,
+        room_owner: Dict[int, int],
+        blocked: Set[int],
+        visited: Set[int],
+    ) -> bool:
+        current = genome_genes[gene, 1]
+        valid_rooms = self.valid_rooms_per_gene[gene]
+        # Try the room the gene already holds first to keep decoding stable
+        candidates = [current] if current in valid_rooms else []
+        candidates += [r for r in valid_rooms if r != current]
+
+        for r in candidates:
+            if r in blocked or r in visited:
+                continue
+            visited.add(r)
+            if r not in room_owner or self._augment(
+                room_owner[r], genome_genes, room_owner, blocked, visited
+            ):
+                room_owner[r] = gene
+                return True
+        return False
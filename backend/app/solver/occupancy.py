@@ -0,0 +1,460 @@
+import numpy as np
+from collections import defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+from app.solver.constraints import VIOLATION_WEIGHTS
+from app.solver.engine import PARITY_INDEX, PARITY_NAMES, SolverEngine
+from app.solver.fitness import WEEK_ROWS, day_slot_stats, span_gaps
+
+# Weeks occupied by a gene parity: 0=Odd, 1=Even, 2=Both
+PARITY_WEEKS = ((0,), (1,), (0, 1))
+# Week bitmask of a gene parity, as in ConstraintChecker
+PARITY_MASKS = (1, 2, 3)
+
+# Violation weights, as in ConstraintChecker
+OVERLAP_WEIGHT = VIOLATION_WEIGHTS["teacher_overlap"]
+GENE_WEIGHT = VIOLATION_WEIGHTS["capacity"]
+
+Cell = Tuple[str, int, int]  # (kind, entity, timeslot_idx)
+
+
+class OccupancyIndex:
+    """
+    A schedule (gene array) kept as the set of genes in every
+    (teacher | group | room, timeslot, week) cell, so a single gene move is
+    checked in O(1) instead of re-evaluating the whole schedule.
+
+    Scores are those of ConstraintChecker: 1000 per overlap, 100 per
+    capacity, room type, allowed day or teacher availability violation.
+    Overlaps of a cell are counted as the checker does: its genes in index
+    order, one per consecutive pair meeting in a common week. Soft cost
+    deltas re-score only the teachers and group a move touches with
+    FitnessCalculator's per-entity costs.
+    """
+
+    def __init__(self, engine: SolverEngine, genes: np.ndarray):
+        self.engine = engine
+        self.checker = engine.constraint_checker
+        self.fitness = engine.fitness_calculator
+        self.genes = np.array(genes, dtype=int, copy=True)
+
+        self.cells: Dict[Tuple[str, int, int, int], Set[int]] = defaultdict(set)
+        self.teacher_genes: Dict[int, Set[int]] = defaultdict(set)
+        self.group_genes: Dict[int, Set[int]] = defaultdict(set)
+        for g in range(len(self.genes)):
+            self._place(g, self.genes[g])
+
+        genes_range = range(len(self.genes))
+        cells = {cell for g in genes_range for cell in self._cells(g)}
+        overlaps = sum(self._overlaps(c) for c in cells)
+        issues = sum(len(self.gene_issues(g, self.genes[g])) for g in genes_range)
+        self.violations = OVERLAP_WEIGHT * overlaps + GENE_WEIGHT * issues
+        self.soft_cost = float(
+            self.fitness.calculate_cost(
+                self.genes,
+                self.checker.member_groups,
+                engine.timeslot_day_map,
+                engine.timeslot_daily_idx_map,
+                group_genes=self.checker.member_genes,
+            )
+        )
+
+    # --- cells -----------------------------------------------------------
+
+    def _cells(self, g: int, gene: Optional[np.ndarray] = None) -> Iterator[Cell]:
+        gene = self.genes[g] if gene is None else gene
+        ts = int(gene[0])
+        yield ("teacher", int(gene[3]), ts)
+        for group in self.engine.gene_groups[g]:
+            yield ("group", group, ts)
+        yield ("room", int(gene[1]), ts)
+
+    def _place(self, g: int, gene: np.ndarray):
+        for kind, entity, ts in self._cells(g, gene):
+            for week in PARITY_WEEKS[gene[2]]:
+                self.cells[(kind, entity, ts, week)].add(g)
+        self.teacher_genes[int(gene[3])].add(g)
+        for group in self.engine.gene_groups[g]:
+            self.group_genes[group].add(g)
+
+    def _remove(self, g: int, gene: np.ndarray):
+        for kind, entity, ts in self._cells(g, gene):
+            for week in PARITY_WEEKS[gene[2]]:
+                key = (kind, entity, ts, week)
+                self.cells[key].discard(g)
+                if not self.cells[key]:
+                    del self.cells[key]
+        self.teacher_genes[int(gene[3])].discard(g)
+        for group in self.engine.gene_groups[g]:
+            self.group_genes[group].discard(g)
+
+    def _overlaps(self, cell: Cell) -> int:
+        genes = self.cells.get(cell + (0,), set()) | self.cells.get(cell + (1,), set())
+        if len(genes) < 2:
+            return 0
+        masks = [PARITY_MASKS[self.genes[g, 2]] for g in sorted(genes)]
+        return sum(1 for a, b in zip(masks, masks[1:]) if a & b)
+
+    # --- per-gene checks ---------------------------------------------------
+
+    def gene_issues(self, g: int, gene: np.ndarray) -> List[str]:
+        """Violations of a gene on its own (no overlaps)."""
+        c = self.checker
+        ts, room, teacher = gene[0], gene[1], gene[3]
+        issues = []
+        if c.classroom_capacities[room] < c.lesson_populations[g]:
+            issues.append("capacity")
+        if c.classroom_types[room] != c.lesson_required_room_types[g]:
+            issues.append("room_type")
+        if not c.gene_day_allowed[g, c.timeslot_days[ts]]:
+            issues.append("day_not_allowed")
+        allowed = c.teacher_slot_allowed
+        if allowed is not None and not allowed[teacher, ts]:
+            issues.append("teacher_unavailable")
+        return issues
+
+    def _entity_cost(self, teachers: Set[int], groups: List[int]) -> float:
+        maps = (self.engine.timeslot_day_map, self.engine.timeslot_daily_idx_map)
+        cost = 0.0
+        for t in teachers:
+            genes = self.genes[sorted(self.teacher_genes[t])]
+            if len(genes):
+                cost += self.fitness.teacher_cost(genes[:, 0], genes[:, 2], *maps)
+        for group in groups:
+            genes = self.genes[sorted(self.group_genes[group])]
+            if len(genes):
+                cost += self.fitness.group_cost(genes[:, 0], genes[:, 2], *maps)
+        return cost
+
+    # --- moves -------------------------------------------------------------
+
+    def gene_for_move(
+        self,
+        g: int,
+        timeslot_id: Optional[int] = None,
+        room_id: Optional[int] = None,
+        teacher_id: Optional[int] = None,
+        week_parity: Optional[str] = None,
+    ) -> np.ndarray:
+        """Gene g with the given fields replaced. ValueError for invalid ids."""
+        e = self.engine
+        gene = self.genes[g].copy()
+        try:
+            if timeslot_id is not None:
+                gene[0] = e.timeslot_id_to_idx[timeslot_id]
+            if room_id is not None:
+                gene[1] = e.room_id_to_idx[room_id]
+            if teacher_id is not None:
+                gene[3] = e.teacher_id_to_idx[teacher_id]
+        except KeyError as err:
+            raise ValueError(f"Unknown id {err} in this project") from None
+        if week_parity is not None:
+            gene[2] = PARITY_INDEX[getattr(week_parity, "value", week_parity)]
+        # A 2-unit part always meets both weeks; 1-unit parts alternate
+        fixed = e.fixed_parities[g]
+        if (fixed == 2) != (gene[2] == 2):
+            raise ValueError(
+                "This part must meet every week"
+                if fixed == 2
+                else "This part meets every other week (odd or even)"
+            )
+        return gene
+
+    def check_move(
+        self, g: int, new_gene: np.ndarray, apply: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Violation and soft cost change of moving gene g to new_gene. Only the
+        cells, teachers and group of the old and new position are looked at.
+        With apply the move is kept, otherwise the index is left unchanged.
+        """
+        old_gene = self.genes[g].copy()
+        new_gene = np.asarray(new_gene, dtype=int)
+        groups = self.engine.gene_groups[g]
+        teachers = {int(old_gene[3]), int(new_gene[3])}
+
+        cells = set(self._cells(g, old_gene)) | set(self._cells(g, new_gene))
+        overlaps_before = sum(self._overlaps(c) for c in cells)
+        issues_before = len(self.gene_issues(g, old_gene))
+        cost_before = self._entity_cost(teachers, groups)
+
+        self._remove(g, old_gene)
+        self.genes[g] = new_gene
+        self._place(g, new_gene)
+
+        overlaps_after = sum(self._overlaps(c) for c in cells)
+        issues = self.gene_issues(g, new_gene)
+        cost_after = self._entity_cost(teachers, groups)
+        clashes = self._clashes(g, new_gene)
+
+        violation_delta = OVERLAP_WEIGHT * (overlaps_after - overlaps_before) + (
+            GENE_WEIGHT * (len(issues) - issues_before)
+        )
+        cost_delta = cost_after - cost_before
+
+        violations = self.violations + violation_delta
+        soft_cost = self.soft_cost + cost_delta
+        if apply:
+            self.violations, self.soft_cost = violations, soft_cost
+        else:
+            self._remove(g, new_gene)
+            self.genes[g] = old_gene
+            self._place(g, old_gene)
+
+        return {
+            "valid": not clashes and not issues,
+            "violation_delta": int(violation_delta),
+            "soft_cost_delta": float(cost_delta),
+            "violations": int(violations),
+            "soft_cost": float(soft_cost),
+            "clashes": clashes,
+            "issues": issues,
+            "applied": apply,
+        }
+
+    def _clashes(self, g: int, gene: np.ndarray) -> List[Dict[str, Any]]:
+        # Other genes sharing a cell with gene g in one of its weeks
+        e = self.engine
+        clashes = []
+        for kind, entity, ts in self._cells(g, gene):
+            others = set()
+            for week in PARITY_WEEKS[gene[2]]:
+                others |= self.cells.get((kind, entity, ts, week), set())
+            others.discard(g)
+            if others:
+                if kind == "teacher":
+                    entity_id = e.teacher_idx_to_id[entity]
+                elif kind == "room":
+                    entity_id = e.classrooms[entity].id
+                else:
+                    entity_id = entity
+                clashes.append(
+                    {
+                        "kind": kind,
+                        "id": entity_id,
+                        "lesson_ids": sorted(
+                            {
+                                lesson_id
+                                for o in others
+                                for lesson_id in e.gene_metadata[o]["lesson_ids"]
+                            }
+                        ),
+                    }
+                )
+        return clashes
+
+    # --- suggestions -------------------------------------------------------
+
+    def suggest(self, g: int, k: int = 10) -> List[Dict[str, Any]]:
+        """
+        The k best other placements of gene g, ranked by violation delta and
+        then soft cost delta. Every (parity, timeslot, room, teacher)
+        candidate is scored at once with array operations over the rest of
+        the schedule; rooms and teachers are the gene's valid ones, and a
+        pinned timeslot is kept.
+        """
+        e = self.engine
+        others = np.ones(len(self.genes), dtype=bool)
+        others[g] = False
+        rest = _ScheduleArrays(self, g, self.genes[others], others)
+
+        rooms = np.array(e.valid_rooms_per_gene[g] or range(len(e.classrooms)))
+        current = self.genes[g]
+        teachers = np.array(sorted(set(e.valid_teachers_per_gene[g]) | {current[3]}))
+        timeslots = np.arange(len(e.timeslots))
+        if e.pins[g, 0] >= 0:
+            timeslots = e.pins[g, :1]
+        parities = [2] if e.fixed_parities[g] == 2 else [0, 1]
+
+        cur_hard, cur_soft, _ = rest.score(
+            current[2], current[:1], current[1:2], current[3:4]
+        )
+        columns = []  # per parity: ts, room, teacher, parity, deltas, valid
+        for parity in parities:
+            hard, soft, clean = rest.score(parity, timeslots, rooms, teachers)
+            grid = np.meshgrid(timeslots, rooms, teachers, indexing="ij")
+            columns.append(
+                np.stack(
+                    [
+                        *(values.ravel() for values in grid),
+                        np.full(hard.size, parity),
+                        (hard - cur_hard.item()).ravel(),
+                        (soft - cur_soft.item()).ravel(),
+                        clean.ravel(),
+                    ],
+                    axis=1,
+                ).astype(float)
+            )
+        table = np.concatenate(columns)
+
+        unchanged = (
+            (table[:, 0] == current[0])
+            & (table[:, 1] == current[1])
+            & (table[:, 2] == current[3])
+            & (table[:, 3] == current[2])
+        )
+        table = table[~unchanged]
+        order = np.lexsort((table[:, 5], table[:, 4]))[:k]
+
+        suggestions = []
+        for ts, room, teacher, parity, v_delta, c_delta, clean in table[order]:
+            suggestions.append(
+                {
+                    "timeslot_id": e.timeslots[int(ts)].id,
+                    "room_id": e.classrooms[int(room)].id,
+                    "teacher_id": e.teacher_idx_to_id[int(teacher)],
+                    "week_parity": PARITY_NAMES[int(parity)],
+                    "valid": bool(clean),
+                    "violation_delta": int(v_delta),
+                    "soft_cost_delta": float(c_delta),
+                    "violations": int(self.violations + v_delta),
+                    "soft_cost": float(self.soft_cost + c_delta),
+                }
+            )
+        return suggestions
+
+
+def _neighbour_masks(shape, entities, ts, genes, g, masks):
+    """
+    Week masks of the last gene before g and the first gene after g (in
+    gene order, as ConstraintChecker sorts a cell) of every (entity,
+    timeslot) cell, 0 where there is none.
+    """
+    before = genes < g
+    prev = np.full(shape, -1)
+    np.maximum.at(prev, (entities[before], ts[before]), genes[before])
+    following = np.full(shape, len(masks))
+    after = ~before
+    np.minimum.at(following, (entities[after], ts[after]), genes[after])
+    padded = np.append(masks, 0)  # -1 and len(masks) map to 0
+    return padded[prev], padded[following]
+
+
+def _gap_delta(n, first, last, slot):
+    after = span_gaps(n + 1, np.minimum(first, slot), np.maximum(last, slot))
+    return after - span_gaps(n, first, last)
+
+
+class _ScheduleArrays:
+    """
+    Dense occupancy counts, the genes next to g in every cell and per
+    (day, week) slot statistics of a schedule without gene g, used to score
+    placements of g in bulk.
+    """
+
+    def __init__(self, index: OccupancyIndex, g: int, genes: np.ndarray, mask):
+        e, c = index.engine, index.checker
+        self.index, self.g = index, g
+        self.weights = index.fitness.weights
+        num_ts = len(e.timeslots)
+        self.days = e.timeslot_day_map
+        self.daily = e.timeslot_daily_idx_map
+        num_days = int(self.days.max()) + 1
+
+        ts, rooms, teachers = genes[:, 0], genes[:, 1], genes[:, 3]
+        weeks = WEEK_ROWS[genes[:, 2]]
+        indices = np.flatnonzero(mask)
+        masks = np.array(PARITY_MASKS)[index.genes[:, 2]]
+
+        self.teacher_occ = np.zeros((len(e.teachers), num_ts, 2), dtype=int)
+        np.add.at(self.teacher_occ, (teachers, ts), weeks)
+        self.room_occ = np.zeros((len(e.classrooms), num_ts, 2), dtype=int)
+        np.add.at(self.room_occ, (rooms, ts), weeks)
+        self.teacher_neighbours = _neighbour_masks(
+            self.teacher_occ.shape[:2], teachers, ts, indices, g, masks
+        )
+        self.room_neighbours = _neighbour_masks(
+            self.room_occ.shape[:2], rooms, ts, indices, g, masks
+        )
+
+        # Other genes of g's groups (several for a merged section), owner
+        # being the group's position in g's list
+        groups = np.array(e.gene_groups[g])
+        in_group = np.isin(c.member_groups, groups) & mask[c.member_genes]
+        group_indices = c.member_genes[in_group]
+        group_genes = index.genes[group_indices]
+        group_owner = np.argmax(c.member_groups[in_group, None] == groups, axis=1)
+        group_ts = group_genes[:, 0]
+        self.group_occ = np.zeros((len(groups), num_ts, 2), dtype=int)
+        np.add.at(
+            self.group_occ, (group_owner, group_ts), WEEK_ROWS[group_genes[:, 2]]
+        )
+        self.group_neighbours = _neighbour_masks(
+            self.group_occ.shape[:2], group_owner, group_ts, group_indices, g, masks
+        )
+
+        # Slot count / first / last daily slot per (entity, day, week)
+        parities = genes[:, 2]
+        maps = (self.days, self.daily)
+        self.teacher_days = day_slot_stats(
+            teachers, len(e.teachers), ts, parities, *maps, num_days
+        )
+        self.group_days = day_slot_stats(
+            group_owner, len(groups), group_ts, group_genes[:, 2], *maps, num_days
+        )
+
+    def score(self, parity, timeslots, rooms, teachers):
+        """
+        (violations, soft cost) of adding gene g with the given parity, as
+        (timeslots, rooms, teachers) arrays, plus whether each placement is
+        free of clashes and issues.
+        """
+        c = self.index.checker
+        g = self.g
+        row = WEEK_ROWS[parity]
+        mask = PARITY_MASKS[parity]
+
+        def added(neighbours, *cells):
+            # Overlapping pairs gained by putting g between its neighbours
+            prev, following = (masks[cells] for masks in neighbours)
+            return (
+                ((prev & mask) > 0).astype(int)
+                + ((mask & following) > 0)
+                - ((prev & following) > 0)
+            )
+
+        def shared(occ):
+            # Another gene in a week this placement meets
+            return (occ * row).any(axis=-1)
+
+        group_cells = (slice(None), timeslots)
+        room_cells = (rooms[:, None], timeslots)
+        teacher_cells = (teachers[:, None], timeslots)
+        overlaps = (
+            added(self.group_neighbours, *group_cells).sum(axis=0)[:, None, None]
+            + added(self.room_neighbours, *room_cells).T[:, :, None]
+            + added(self.teacher_neighbours, *teacher_cells).T[:, None, :]
+        )
+        clashes = (
+            shared(self.group_occ[group_cells]).any(axis=0)[:, None, None]
+            | shared(self.room_occ[room_cells]).T[:, :, None]
+            | shared(self.teacher_occ[teacher_cells]).T[:, None, :]
+        )
+        room_issues = (
+            (c.classroom_capacities[rooms] < c.lesson_populations[g]).astype(int)
+            + (c.classroom_types[rooms] != c.lesson_required_room_types[g])
+        )
+        day_issues = ~c.gene_day_allowed[g, self.days[timeslots]]
+        issues = day_issues[:, None, None] + room_issues[None, :, None]
+        if c.teacher_slot_allowed is not None:
+            unavailable = ~c.teacher_slot_allowed[teachers][:, timeslots]
+            issues = issues + unavailable.T[:, None, :]
+        hard = OVERLAP_WEIGHT * overlaps + GENE_WEIGHT * issues
+
+        days, slots = self.days[timeslots], self.daily[timeslots]
+        group_cost = np.zeros(len(timeslots))
+        teacher_cost = np.zeros((len(teachers), len(timeslots)))
+        for week in np.flatnonzero(row):
+            n, first, last = (s[:, days, week] for s in self.group_days)
+            group_cost += (n == 0).sum(axis=0) * self.weights.get(
+                "student_compactness", 1.0
+            )
+            group_cost += _gap_delta(n, first, last, slots).sum(axis=0) * (
+                self.weights.get("student_idle", 1.0)
+            )
+            n, first, last = (s[teachers][:, days, week] for s in self.teacher_days)
+            teacher_cost += _gap_delta(n, first, last, slots) * self.weights.get(
+                "teacher_idle", 1.0
+            )
+        soft = group_cost[:, None, None] + teacher_cost.T[:, None, :]
+        clean = ~clashes & (issues == 0)
+        return hard, np.broadcast_to(soft, hard.shape), clean
@@ -11,26 +11,48 @@ class GeneticOperators:
         fixed_parities: np.ndarray = None,
         valid_rooms_per_gene: List[List[int]] = None,
         valid_teachers_per_gene: List[List[int]] = None,
+        mutate_rooms: bool = True,
+        pins: np.ndarray = None,
     ):
         self.num_timeslots = num_timeslots
         self.num_classrooms = num_classrooms
         self.fixed_parities = fixed_parities
         self.valid_rooms_per_gene = valid_rooms_per_gene
         self.valid_teachers_per_gene = valid_teachers_per_gene
+        self.mutate_rooms = mutate_rooms
+        # (num_genes, 4) pinned values, -1 where free; mutation leaves the
+        # pinned columns of a gene alone
+        self.pins = pins
+        # Bool mask of the genes mutation may change; None means all of them
+        # (repair runs freeze the rest)
+        self.free_genes = None
 
     def mutate(self, genome: Genome, mutation_rate: float = 0.01):
         # Randomly change genes
         mask = np.random.random(genome.genes.shape[0]) < mutation_rate
+        if self.free_genes is not None:
+            mask &= self.free_genes
         num_mutations = np.sum(mask)
 
         if num_mutations > 0:
+            # Per column, the mutated genes not pinned in it
+            if self.pins is None:
+                slot_mask = room_mask = teacher_mask = mask
+            else:
+                slot_mask, room_mask, teacher_mask = (
+                    mask & (self.pins[:, column] < 0) for column in (0, 1, 3)
+                )
+
             # Mutate timeslots
-            genome.genes[mask, 0] = np.random.randint(
-                0, self.num_timeslots, size=num_mutations
+            genome.genes[slot_mask, 0] = np.random.randint(
+                0, self.num_timeslots, size=np.count_nonzero(slot_mask)
             )
             # Mutate rooms
-            if self.valid_rooms_per_gene:
-                mutated_indices = np.where(mask)[0]
+            if not self.mutate_rooms:
+                # Rooms are decoded by matching, nothing to evolve
+                pass
+            elif self.valid_rooms_per_gene:
+                mutated_indices = np.where(room_mask)[0]
                 for idx in mutated_indices:
                     valid_rooms = self.valid_rooms_per_gene[idx]
                     if valid_rooms:
@@ -38,8 +60,8 @@ class GeneticOperators:
                     else:
                         genome.genes[idx, 1] = np.random.randint(0, self.num_classrooms)
             else:
-                genome.genes[mask, 1] = np.random.randint(
-                    0, self.num_classrooms, size=num_mutations
+                genome.genes[room_mask, 1] = np.random.randint(
+                    0, self.num_classrooms, size=np.count_nonzero(room_mask)
                 )
 
             # Mutate Parity
@@ -54,7 +76,7 @@ class GeneticOperators:
 
             # Mutate Teachers
             if self.valid_teachers_per_gene:
-                mutated_indices = np.where(mask)[0]
+                mutated_indices = np.where(teacher_mask)[0]
                 for idx in mutated_indices:
                     valid_teachers = self.valid_teachers_per_gene[idx]
                     if valid_teachers:
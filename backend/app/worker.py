@@ -0,0 +1,87 @@
+"""
+Solver worker, run as `python -m app.worker` next to the API.
+
+Solver runs are CPU bound, so they are kept out of the API process: the API
+only enqueues runs and this command starts SOLVER_MAX_WORKERS processes that
+claim and solve them one at a time. A process that dies is replaced; its job
+is failed by the lease check once its heartbeat stops.
+"""
+
+import asyncio
+import multiprocessing
+import signal
+import time
+from app.api import solver
+from app.services.job_queue import (
+    SOLVER_MAX_WORKERS,
+    SOLVER_QUEUE,
+    SolverWorkerPool,
+    get_job_queue,
+)
+
+# Seconds between checks that every worker process is alive
+SUPERVISE_INTERVAL = 1.0
+
+
+async def _serve():
+    # One job at a time: a solve keeps this process's event loop busy
+    pool = SolverWorkerPool(get_job_queue(), solver.run_queued_job, max_workers=1)
+    stop = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stop.set)
+    pool.start()
+    try:
+        await stop.wait()
+    finally:
+        await pool.stop()
+
+
+def _run_worker():
+    try:
+        asyncio.run(_serve())
+    except KeyboardInterrupt:
+        pass
+
+
+def main(processes: int = SOLVER_MAX_WORKERS):
+    if SOLVER_QUEUE != "postgres":
+        raise SystemExit(
+            "app.worker needs the postgres solver queue; with SOLVER_QUEUE=memory "
+            "the API process runs the solver itself"
+        )
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    context = multiprocessing.get_context("spawn")
+    workers = [None] * processes
+    print(f"Starting {processes} solver worker processes")
+    while not stopping:
+        for i, process in enumerate(workers):
+            if process is not None and process.is_alive():
+                continue
+            if process is not None:
+                print(
+                    f"Solver worker {process.pid} exited with code "
+                    f"{process.exitcode}, restarting it"
+                )
+            workers[i] = context.Process(
+                target=_run_worker, name=f"solver-worker-{i}", daemon=True
+            )
+            workers[i].start()
+        time.sleep(SUPERVISE_INTERVAL)
+
+    # Workers cancel their running job and mark it failed
+    for process in workers:
+        process.terminate()
+    for process in workers:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
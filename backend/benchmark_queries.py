@@ -0,0 +1,260 @@
+"""
+Records EXPLAIN ANALYZE timings of the hot lookup queries on a synthetic
+dataset. Everything runs in one transaction that is rolled back at the end,
+so the target database is left untouched.
+
+    python benchmark_queries.py --projects 20 --output plans.json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import desc, insert, select, text
+from app.db import engine
+from app.models import (
+    Project,
+    Teacher,
+    Course,
+    StudentGroup,
+    Classroom,
+    TimeSlot,
+    Lesson,
+    SolverRun,
+    ScheduleResult,
+    ProjectTeacherLink,
+    ProjectCourseLink,
+    ProjectStudentGroupLink,
+    ProjectClassroomLink,
+    ClassroomType,
+    Degree,
+)
+from app.services.results import results_query
+
+
+async def _insert_returning_ids(conn, model, rows):
+    result = await conn.execute(insert(model).returning(model.id), rows)
+    return [row[0] for row in result]
+
+
+async def seed(conn, projects: int, lessons: int, runs: int, entities: int):
+    print(
+        f"Seeding {projects} projects x {lessons} lessons x {runs} runs "
+        f"({projects * lessons * runs} schedule results)..."
+    )
+    timeslot_ids = list(await conn.scalars(select(TimeSlot.id)))
+    if not timeslot_ids:
+        timeslot_ids = await _insert_returning_ids(
+            conn,
+            TimeSlot,
+            [
+                {
+                    "day_of_week": d,
+                    "start_time": f"{h:02d}:00",
+                    "end_time": f"{h + 2:02d}:00",
+                }
+                for d in range(6)
+                for h in range(8, 20, 2)
+            ],
+        )
+
+    teacher_ids = await _insert_returning_ids(
+        conn, Teacher, [{"name": f"bench-teacher-{i}"} for i in range(entities)]
+    )
+    course_ids = await _insert_returning_ids(
+        conn,
+        Course,
+        [
+            {"name": f"bench-course-{i}", "required_room_type": ClassroomType.NORMAL}
+            for i in range(entities)
+        ],
+    )
+    group_ids = await _insert_returning_ids(
+        conn,
+        StudentGroup,
+        [
+            {"name": f"bench-group-{i}", "degree": Degree.BACHELOR, "population": 30}
+            for i in range(entities)
+        ],
+    )
+    classroom_ids = await _insert_returning_ids(
+        conn,
+        Classroom,
+        [
+            {
+                "name": f"bench-room-{i}",
+                "faculty": "bench",
+                "capacity": 40,
+                "type": ClassroomType.NORMAL,
+            }
+            for i in range(max(entities // 5, 1))
+        ],
+    )
+    project_ids = await _insert_returning_ids(
+        conn, Project, [{"name": f"bench-project-{i}"} for i in range(projects)]
+    )
+
+    # Every project links a slice of the shared entities
+    share = max(entities // 4, 1)
+    for n, project_id in enumerate(project_ids):
+        offset = (n * share) % entities
+        for link, column, ids in (
+            (ProjectTeacherLink, "teacher_id", teacher_ids),
+            (ProjectCourseLink, "course_id", course_ids),
+            (ProjectStudentGroupLink, "group_id", group_ids),
+        ):
+            picked = (ids * 2)[offset : offset + share]
+            await conn.execute(
+                insert(link), [{"project_id": project_id, column: i} for i in picked]
+            )
+        await conn.execute(
+            insert(ProjectClassroomLink),
+            [{"project_id": project_id, "classroom_id": i} for i in classroom_ids],
+        )
+
+    await conn.execute(
+        insert(Lesson),
+        [
+            {
+                "project_id": project_id,
+                "course_id": course_ids[i % len(course_ids)],
+                "teacher_id": teacher_ids[i % len(teacher_ids)],
+                "group_id": group_ids[i % len(group_ids)],
+                "duration_slots": 1,
+            }
+            for project_id in project_ids
+            for i in range(lessons)
+        ],
+    )
+
+    start = datetime.utcnow() - timedelta(days=runs)
+    run_rows = [
+        {
+            "project_id": project_id,
+            "run_id": str(uuid.uuid4()),
+            "status": "completed",
+            "start_time": start + timedelta(days=r),
+            "config_weights": "{}",
+        }
+        for project_id in project_ids
+        for r in range(runs)
+    ]
+    await conn.execute(insert(SolverRun), run_rows)
+
+    # Results are generated server-side: one row per (run, lesson)
+    await conn.execute(
+        text(
+            """
+            INSERT INTO scheduleresult
+                (run_id, lesson_id, room_id, timeslot_id, teacher_id, week_parity)
+            SELECT r.run_id, l.id,
+                   rooms.ids[1 + (l.id + r.id) % cardinality(rooms.ids)],
+                   slots.ids[1 + (l.id * 7 + r.id) % cardinality(slots.ids)],
+                   l.teacher_id,
+                   'BOTH'
+            FROM solverrun r
+            JOIN lesson l ON l.project_id = r.project_id
+            CROSS JOIN (SELECT CAST(:rooms AS INTEGER[]) AS ids) rooms
+            CROSS JOIN (SELECT CAST(:slots AS INTEGER[]) AS ids) slots
+            WHERE r.project_id = ANY(CAST(:projects AS INTEGER[]))
+            """
+        ),
+        {"rooms": classroom_ids, "slots": timeslot_ids, "projects": project_ids},
+    )
+    for table in ("scheduleresult", "solverrun", "lesson", "projectteacherlink"):
+        await conn.execute(text(f"ANALYZE {table}"))
+
+    # The project / run the queries look at: the last ones inserted
+    return project_ids[-1], run_rows[-1]["run_id"]
+
+
+def hot_queries(project_id: int, run_id: str):
+    return {
+        "latest_run_via_solverrun": select(SolverRun.run_id)
+        .where(SolverRun.project_id == project_id, SolverRun.status == "completed")
+        .order_by(desc(SolverRun.start_time))
+        .limit(1),
+        # The previous lookup, kept for comparison
+        "latest_run_via_scheduleresult": select(ScheduleResult.run_id)
+        .join(Lesson)
+        .where(Lesson.project_id == project_id)
+        .order_by(desc(ScheduleResult.id))
+        .limit(1),
+        "run_results_projection": results_query(run_id, include_run_id=True),
+        "project_runs": select(SolverRun.id)
+        .where(SolverRun.project_id == project_id)
+        .order_by(SolverRun.start_time.desc()),
+        "project_lessons": select(Lesson.id).where(Lesson.project_id == project_id),
+        "project_teachers": select(Teacher.id, Teacher.name)
+        .join(ProjectTeacherLink)
+        .where(ProjectTeacherLink.project_id == project_id),
+    }
+
+
+def _plan_indexes(node, found):
+    if "Index Name" in node:
+        found.add(node["Index Name"])
+    for child in node.get("Plans", []):
+        _plan_indexes(child, found)
+    return found
+
+
+async def explain(conn, stmt, repeat: int):
+    sql = str(
+        stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    )
+    timings, plan = [], None
+    for _ in range(repeat):
+        result = await conn.execute(
+            text(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {sql}")
+        )
+        raw = result.scalar()
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]
+        timings.append(plan["Planning Time"] + plan["Execution Time"])
+    return {
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "indexes": sorted(_plan_indexes(plan["Plan"], set())),
+        "plan": plan,
+    }
+
+
+async def main(args):
+    report = {"params": vars(args), "queries": {}}
+    async with engine.connect() as conn:
+        trans = await conn.begin()
+        try:
+            project_id, run_id = await seed(
+                conn, args.projects, args.lessons, args.runs, args.entities
+            )
+            print(f"{'query':32} {'median ms':>10} {'min ms':>10}  indexes")
+            for name, stmt in hot_queries(project_id, run_id).items():
+                stats = await explain(conn, stmt, args.repeat)
+                report["queries"][name] = stats
+                print(
+                    f"{name:32} {stats['median_ms']:>10} {stats['min_ms']:>10}  "
+                    f"{', '.join(stats['indexes']) or '-'}"
+                )
+        finally:
+            # Leave the database as it was
+            await trans.rollback()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Plans written to {args.output}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--projects", type=int, default=10)
+    parser.add_argument("--lessons", type=int, default=2000, help="per project")
+    parser.add_argument("--runs", type=int, default=5, help="per project")
+    parser.add_argument(
+        "--entities", type=int, default=1000, help="teachers, courses, groups"
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="write the full plans as JSON")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,42 @@
+"""add progress columns to solver_run
+
+Revision ID: 5c2e8b7a9d10
+Revises: 3f9a7c21d4e8
+Create Date: 2026-10-19 11:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c2e8b7a9d10"
+down_revision: Union[str, Sequence[str], None] = "3f9a7c21d4e8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "solverrun",
+        sa.Column("progress", sa.Integer(), nullable=False, server_default="0"),
+    )
+    op.add_column("solverrun", sa.Column("best_cost", sa.Float(), nullable=True))
+    op.add_column(
+        "solverrun",
+        sa.Column("error", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column(
+        "solverrun", sa.Column("progress_updated_at", sa.DateTime(), nullable=True)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("solverrun", "progress_updated_at")
+    op.drop_column("solverrun", "error")
+    op.drop_column("solverrun", "best_cost")
+    op.drop_column("solverrun", "progress")
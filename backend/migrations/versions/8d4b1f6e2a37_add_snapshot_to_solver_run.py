@@ -0,0 +1,42 @@
+"""add best-so-far snapshot to solver_run
+
+Revision ID: 8d4b1f6e2a37
+Revises: 5c2e8b7a9d10
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4b1f6e2a37"
+down_revision: Union[str, Sequence[str], None] = "5c2e8b7a9d10"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "solverrun",
+        sa.Column("best_snapshot", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+    op.add_column("solverrun", sa.Column("snapshot_cost", sa.Float(), nullable=True))
+    op.add_column(
+        "solverrun",
+        sa.Column(
+            "snapshot_valid", sa.Boolean(), nullable=False, server_default=sa.false()
+        ),
+    )
+    op.add_column("solverrun", sa.Column("snapshot_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("solverrun", "snapshot_at")
+    op.drop_column("solverrun", "snapshot_valid")
+    op.drop_column("solverrun", "snapshot_cost")
+    op.drop_column("solverrun", "best_snapshot")
@@ -0,0 +1,84 @@
+"""add teacher availability and allowed days bitmasks
+
+Revision ID: a3d5f7b9c2e1
+Revises: f6a1c3e8d294
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.solver.masks import days_to_mask, slots_to_mask
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a3d5f7b9c2e1"
+down_revision: Union[str, Sequence[str], None] = "f6a1c3e8d294"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "teacheravailabilitymask",
+        sa.Column("teacher_id", sa.Integer(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("slots_mask", sa.LargeBinary(), nullable=False),
+        sa.ForeignKeyConstraint(["teacher_id"], ["teacher.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("teacher_id", "project_id"),
+    )
+    op.add_column(
+        "studentgroup", sa.Column("allowed_days_mask", sa.Integer(), nullable=True)
+    )
+
+    # Backfill from the existing availability rows and allowed_days strings
+    bind = op.get_bind()
+    slots = defaultdict(list)
+    for teacher_id, project_id, timeslot_id in bind.execute(
+        sa.text(
+            "SELECT teacher_id, project_id, timeslot_id FROM teacheravailability"
+        )
+    ):
+        slots[(teacher_id, project_id)].append(timeslot_id)
+    if slots:
+        bind.execute(
+            sa.text(
+                "INSERT INTO teacheravailabilitymask "
+                "(teacher_id, project_id, slots_mask) "
+                "VALUES (:teacher_id, :project_id, :slots_mask)"
+            ),
+            [
+                {
+                    "teacher_id": teacher_id,
+                    "project_id": project_id,
+                    "slots_mask": slots_to_mask(ids),
+                }
+                for (teacher_id, project_id), ids in slots.items()
+            ],
+        )
+
+    groups = [
+        {"id": group_id, "mask": days_to_mask(allowed_days)}
+        for group_id, allowed_days in bind.execute(
+            sa.text(
+                "SELECT id, allowed_days FROM studentgroup "
+                "WHERE allowed_days IS NOT NULL"
+            )
+        )
+    ]
+    groups = [g for g in groups if g["mask"] is not None]
+    if groups:
+        bind.execute(
+            sa.text("UPDATE studentgroup SET allowed_days_mask = :mask WHERE id = :id"),
+            groups,
+        )
+
+
+def downgrade() -> None:
+    op.drop_column("studentgroup", "allowed_days_mask")
+    op.drop_table("teacheravailabilitymask")
@@ -0,0 +1,31 @@
+"""add merged sections to solver_run
+
+Revision ID: a7c9e2f4b6d1
+Revises: c8e2f4a6b1d3
+Create Date: 2026-10-20 01:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c9e2f4b6d1"
+down_revision: Union[str, Sequence[str], None] = "c8e2f4a6b1d3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "solverrun",
+        sa.Column("sections", sqlmodel.sql.sqltypes.AutoString(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("solverrun", "sections")
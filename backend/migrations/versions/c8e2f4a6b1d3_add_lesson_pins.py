@@ -0,0 +1,59 @@
+"""add pinned timeslot and room to lesson
+
+Revision ID: c8e2f4a6b1d3
+Revises: e5b8c1d3f7a2
+Create Date: 2026-10-19 21:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8e2f4a6b1d3"
+down_revision: Union[str, Sequence[str], None] = "e5b8c1d3f7a2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        "lesson", sa.Column("pinned_timeslot_id", sa.Integer(), nullable=True)
+    )
+    op.add_column("lesson", sa.Column("pinned_room_id", sa.Integer(), nullable=True))
+    op.add_column("lesson", sa.Column("pinned_teacher_id", sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        "lesson_pinned_timeslot_id_fkey",
+        "lesson",
+        "timeslot",
+        ["pinned_timeslot_id"],
+        ["id"],
+    )
+    op.create_foreign_key(
+        "lesson_pinned_room_id_fkey",
+        "lesson",
+        "classroom",
+        ["pinned_room_id"],
+        ["id"],
+    )
+    op.create_foreign_key(
+        "lesson_pinned_teacher_id_fkey",
+        "lesson",
+        "teacher",
+        ["pinned_teacher_id"],
+        ["id"],
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_constraint("lesson_pinned_teacher_id_fkey", "lesson", type_="foreignkey")
+    op.drop_constraint("lesson_pinned_room_id_fkey", "lesson", type_="foreignkey")
+    op.drop_constraint("lesson_pinned_timeslot_id_fkey", "lesson", type_="foreignkey")
+    op.drop_column("lesson", "pinned_teacher_id")
+    op.drop_column("lesson", "pinned_room_id")
+    op.drop_column("lesson", "pinned_timeslot_id")
@@ -0,0 +1,43 @@
+"""add indexes for hot lookup paths
+
+Revision ID: e4c9d2a7b815
+Revises: b7e3a91c4f52
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4c9d2a7b815"
+down_revision: Union[str, Sequence[str], None] = "b7e3a91c4f52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (index name, table, columns)
+INDEXES = [
+    ("ix_scheduleresult_run_id_lesson_id", "scheduleresult", ["run_id", "lesson_id"]),
+    ("ix_solverrun_project_id_start_time", "solverrun", ["project_id", "start_time"]),
+    ("ix_lesson_project_id", "lesson", ["project_id"]),
+    # Reverse keys of the composite primary keys
+    ("ix_projectteacherlink_teacher_id", "projectteacherlink", ["teacher_id"]),
+    ("ix_projectcourselink_course_id", "projectcourselink", ["course_id"]),
+    ("ix_projectstudentgrouplink_group_id", "projectstudentgrouplink", ["group_id"]),
+    ("ix_projectclassroomlink_classroom_id", "projectclassroomlink", ["classroom_id"]),
+    ("ix_teachercourselink_course_id", "teachercourselink", ["course_id"]),
+    ("ix_studentgroupcourselink_course_id", "studentgroupcourselink", ["course_id"]),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,52 @@
+"""add edit_session
+
+Revision ID: e5b8c1d3f7a2
+Revises: a3d5f7b9c2e1
+Create Date: 2026-10-19 23:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b8c1d3f7a2"
+down_revision: Union[str, Sequence[str], None] = "a3d5f7b9c2e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "editsession",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("session_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("run_id", sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+        sa.Column("project_id", sa.Integer(), nullable=False),
+        sa.Column("genes", sa.LargeBinary(), nullable=False),
+        sa.Column("moves", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "created_at", sa.DateTime(), nullable=False, server_default=sa.func.now()
+        ),
+        sa.Column(
+            "updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()
+        ),
+        sa.ForeignKeyConstraint(["project_id"], ["project.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_editsession_session_id"), "editsession", ["session_id"], unique=True
+    )
+    op.create_index(
+        op.f("ix_editsession_run_id"), "editsession", ["run_id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_editsession_run_id"), table_name="editsession")
+    op.drop_index(op.f("ix_editsession_session_id"), table_name="editsession")
+    op.drop_table("editsession")
@@ -0,0 +1,40 @@
+"""add trigram indexes for name search
+
+Revision ID: f6a1c3e8d294
+Revises: e4c9d2a7b815
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6a1c3e8d294"
+down_revision: Union[str, Sequence[str], None] = "e4c9d2a7b815"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Tables searched by name in the list endpoints (ILIKE '%...%')
+TABLES = ["teacher", "course", "studentgroup", "classroom"]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for table in TABLES:
+        op.create_index(
+            f"ix_{table}_name_trgm",
+            table,
+            ["name"],
+            unique=False,
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for table in reversed(TABLES):
+        op.drop_index(f"ix_{table}_name_trgm", table_name=table)
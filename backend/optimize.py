@@ -1,4 +1,5 @@
 import asyncio
+import os
 from sqlmodel import select
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -9,16 +10,14 @@ from app.models import (
     TimeSlot,
     Course,
     Teacher,
+    TeacherAvailabilityMask,
     StudentGroup,
     TeacherCourseLink,
     TeacherEntranceLink,
-    ScheduleResult,
-    WeekParity,
 )
 from app.solver.engine import SolverEngine
-
-
-from sqlalchemy.orm import selectinload
+from app.services.persistence import save_run_results
+from app.solver.backends import get_backend
 
 
 async def optimize():
@@ -36,16 +35,23 @@ async def optimize():
         timeslots = (await session.execute(select(TimeSlot))).scalars().all()
         courses = (await session.execute(select(Course))).scalars().all()
 
-        # Eagerly load availability_links for teachers
-        teachers = (
-            (
-                await session.execute(
-                    select(Teacher).options(selectinload(Teacher.availability_links))
-                )
+        teachers = (await session.execute(select(Teacher))).scalars().all()
+
+        # Availability bitmasks of the lessons' project
+        availability_masks = {}
+        if lessons[0].project_id is not None:
+            availability_masks = dict(
+                (
+                    await session.execute(
+                        select(
+                            TeacherAvailabilityMask.teacher_id,
+                            TeacherAvailabilityMask.slots_mask,
+                        ).where(
+                            TeacherAvailabilityMask.project_id == lessons[0].project_id
+                        )
+                    )
+                ).all()
             )
-            .scalars()
-            .all()
-        )
 
         groups = (await session.execute(select(StudentGroup))).scalars().all()
         tc_links = (await session.execute(select(TeacherCourseLink))).scalars().all()
@@ -73,12 +79,27 @@ async def optimize():
             teacher_course_links=tc_links,
             teacher_entrance_links=[],
             weights=weights,
+            teacher_availability_masks=availability_masks,
         )
 
-        print("Running Genetic Algorithm (Population: 500, Generations: 2000)...")
+        # SOLVER_BACKEND: "ga" (default), "cp" or "race"
+        backend_name = os.getenv("SOLVER_BACKEND", "ga")
+        time_limit = os.getenv("SOLVER_TIME_LIMIT")
+
+        print(
+            f"Running '{backend_name}' backend "
+            "(GA Population: 500, Generations: 2000)..."
+        )
         # Increase population and generations for better optimization
-        results, best_cost = await solver.run(
-            population_size=500, generations=2000, max_stagnant_generations=150
+        backend = get_backend(
+            backend_name,
+            solver,
+            population_size=500,
+            generations=2000,
+            max_stagnant_generations=150,
+        )
+        results, best_cost = await backend.solve(
+            time_limit=float(time_limit) if time_limit else None
         )
 
         # Calculate satisfaction metrics
@@ -123,42 +144,19 @@ async def optimize():
             satisfaction_percentage=satisfaction,
         )
         session.add(solver_run)
-        await session.commit()
 
         if results:
             print(
                 f"Optimization Successful! Found schedule with {len(results)} assignments. Best Cost: {best_cost}"
             )
 
-            # Save results to DB
+            # Save results to DB (same transaction as the SolverRun row)
             print("Saving results to DB...")
-
-            # Save ScheduleResults
-            db_results = []
-            for res in results:
-                parity = WeekParity.BOTH
-                if res["week_parity"] == "odd":
-                    parity = WeekParity.ODD
-                elif res["week_parity"] == "even":
-                    parity = WeekParity.EVEN
-
-                db_results.append(
-                    ScheduleResult(
-                        run_id=run_id,
-                        lesson_id=res["lesson_id"],
-                        room_id=res["room_id"],
-                        timeslot_id=res["timeslot_id"],
-                        teacher_id=res["teacher_id"],
-                        week_parity=parity,
-                    )
-                )
-
-            session.add_all(db_results)
-            await session.commit()
-            print(f"Results saved with Run ID: {run_id}")
-            print(f"Saved {len(db_results)} schedule results with Run ID: {run_id}")
+            await save_run_results(session, run_id, results)
+            print(f"Saved {len(results)} schedule results with Run ID: {run_id}")
 
         else:
+            await session.commit()
             print(
                 f"Optimization Failed. Could not find a valid schedule satisfying all hard constraints. Best Cost: {best_cost}. Run saved as failed."
             )
@@ -4,6 +4,8 @@ from sqlmodel import select
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.db import engine, init_db
+from app.services.availability import refresh_teacher_masks
+from app.solver.masks import days_to_mask
 from app.models import (
     TimeSlot,
     Classroom,
@@ -157,7 +159,9 @@ async def seed():
                         if ts.start_time >= "14:00":
                             session.add(
                                 TeacherAvailability(
-                                    teacher_id=teacher.id, timeslot_id=ts.id
+                                    teacher_id=teacher.id,
+                                    timeslot_id=ts.id,
+                                    project_id=project_id,
                                 )
                             )
                 else:
@@ -165,7 +169,9 @@ async def seed():
                     for ts in existing_slots:
                         session.add(
                             TeacherAvailability(
-                                teacher_id=teacher.id, timeslot_id=ts.id
+                                teacher_id=teacher.id,
+                                timeslot_id=ts.id,
+                                project_id=project_id,
                             )
                         )
 
@@ -174,6 +180,9 @@ async def seed():
                     ProjectTeacherLink(project_id=project_id, teacher_id=teacher.id)
                 )
 
+            await refresh_teacher_masks(
+                session, project_id, [t.id for t in new_teachers]
+            )
             await session.commit()
 
             # Reload teachers
@@ -249,6 +258,7 @@ async def seed():
                     degree=Degree.BACHELOR,
                     population=random.randint(30, 50),
                     allowed_days="0,1,2,3,4,5",
+                    allowed_days_mask=days_to_mask("0,1,2,3,4,5"),
                 )
                 session.add(group)
                 await session.commit()
@@ -0,0 +1,32 @@
+import os
+import pytest
+
+# Database tests run against TEST_DATABASE_URL, a scratch PostgreSQL database
+# whose tables are emptied before each test; they are skipped without it
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+if TEST_DATABASE_URL:
+    os.environ["DATABASE_URL"] = TEST_DATABASE_URL
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession
+    from sqlmodel import SQLModel
+    from app.db import engine, init_db
+
+    await init_db()
+    tables = ", ".join(f'"{t.name}"' for t in SQLModel.metadata.sorted_tables)
+    async with engine.begin() as conn:
+        await conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    # Pooled connections belong to this test's event loop
+    await engine.dispose()
@@ -0,0 +1,106 @@
+import random
+from types import SimpleNamespace
+import numpy as np
+from app.models import ClassroomType
+from app.solver.engine import SolverEngine
+from app.solver.masks import days_to_mask, slots_to_mask
+
+# Course room types, normal rooms twice as likely
+ROOM_TYPES = [ClassroomType.NORMAL, ClassroomType.NORMAL, ClassroomType.COMPUTER_SITE]
+WEIGHTS = {"teacher_idle": 3.0, "student_idle": 2.0, "student_compactness": 5.0}
+
+
+def make_problem(n_groups=12, n_courses=10, n_teachers=8, n_rooms=8, seed=0):
+    """
+    SolverEngine arguments of a small random project: 6 days of 5 slots,
+    4 lessons per group, teachers available in about 70% of the slots.
+    """
+    rnd = random.Random(seed)
+    timeslots = [
+        SimpleNamespace(
+            id=100 + d * 5 + i, day_of_week=d, start_time=f"{8 + 2 * i:02d}:00"
+        )
+        for d in range(6)
+        for i in range(5)
+    ]
+    rooms = [
+        SimpleNamespace(
+            id=200 + i,
+            name=f"R{i}",
+            capacity=rnd.choice([30, 50, 80]),
+            type=ClassroomType.COMPUTER_SITE if i % 3 == 0 else ClassroomType.NORMAL,
+        )
+        for i in range(n_rooms)
+    ]
+    courses = [
+        SimpleNamespace(
+            id=300 + i,
+            name=f"C{i}",
+            units=rnd.choice([1, 2, 3]),
+            required_room_type=rnd.choice(ROOM_TYPES),
+            min_population=20,
+            max_population=60,
+        )
+        for i in range(n_courses)
+    ]
+    teachers = [SimpleNamespace(id=400 + i, name=f"T{i}") for i in range(n_teachers)]
+    groups = [
+        SimpleNamespace(
+            id=500 + i,
+            name=f"G{i}",
+            degree=rnd.choice(["bachelor", "master"]),
+            population=rnd.choice([10, 15, 25, 40]),
+            allowed_days_mask=days_to_mask(
+                rnd.choice([None, "0,1,2,3", "1,2,3,4,5"])
+            ),
+        )
+        for i in range(n_groups)
+    ]
+    lessons = [
+        SimpleNamespace(
+            id=600 + 4 * i + j,
+            course_id=course.id,
+            group_id=group.id,
+            teacher_id=None,
+            pinned_timeslot_id=None,
+            pinned_room_id=None,
+            pinned_teacher_id=None,
+        )
+        for i, group in enumerate(groups)
+        for j, course in enumerate(rnd.sample(courses, 4))
+    ]
+    links = [
+        SimpleNamespace(teacher_id=t.id, course_id=c.id)
+        for c in courses
+        for t in rnd.sample(teachers, 2)
+    ]
+    masks = {
+        t.id: slots_to_mask([ts.id for ts in timeslots if rnd.random() < 0.7])
+        for t in teachers
+    }
+    return dict(
+        lessons=lessons,
+        classrooms=rooms,
+        timeslots=timeslots,
+        courses=courses,
+        teachers=teachers,
+        groups=groups,
+        teacher_course_links=links,
+        teacher_entrance_links=[],
+        teacher_availability_masks=masks,
+    )
+
+
+def random_genes(engine: SolverEngine, rng: np.random.Generator) -> np.ndarray:
+    """A random schedule for engine, crowded enough to have overlaps."""
+    n = engine.num_genes
+    parities = np.where(engine.fixed_parities == 2, 2, rng.integers(0, 2, n))
+    return np.stack(
+        [
+            rng.integers(0, 6, n),
+            rng.integers(0, len(engine.classrooms), n),
+            parities,
+            rng.integers(0, len(engine.teachers), n),
+        ],
+        axis=1,
+    )
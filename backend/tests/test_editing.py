@@ -0,0 +1,97 @@
+import numpy as np
+import pytest
+from fastapi import HTTPException
+from app.api import editing as editing_api
+from app.models import EditSession, Project
+from app.services.editing import (
+    EditingSession,
+    EditingSessionStore,
+    decode_genes,
+)
+from app.solver.engine import SolverEngine
+from app.solver.occupancy import OccupancyIndex
+from tests.schedules import WEIGHTS, make_problem, random_genes
+
+pytestmark = pytest.mark.anyio
+
+
+def _editing(project_id, session_id=None):
+    engine = SolverEngine(**make_problem(), weights=WEIGHTS)
+    genes = random_genes(engine, np.random.default_rng(0))
+    return EditingSession(
+        "run", project_id, OccupancyIndex(engine, genes), session_id=session_id
+    )
+
+
+def _moved(editing, g=0):
+    genes = editing.index.genes.copy()
+    genes[g, 0] = (genes[g, 0] + 1) % len(editing.index.engine.timeslots)
+    return genes
+
+
+async def _stored(db, editing):
+    await db.commit()  # end the transaction so the row is read again
+    row = await EditingSessionStore().load(db, editing.session_id)
+    return row.moves, decode_genes(row.genes)
+
+
+async def test_save_move_rejects_stale_session(db):
+    project = Project()
+    db.add(project)
+    await db.commit()
+    store = EditingSessionStore()
+    first = _editing(project.id)
+    await store.add(db, first)
+    # Another worker's copy of the same session, one move behind
+    second = _editing(project.id, session_id=first.session_id)
+
+    genes = _moved(first)
+    assert await store.save_move(db, first, genes)
+    first.moves += 1
+    assert not await store.save_move(db, second, _moved(second, 1))
+
+    moves, stored = await _stored(db, first)
+    assert moves == 1
+    assert (stored == genes).all()
+
+
+async def test_failed_save_leaves_index_unchanged(db, monkeypatch):
+    project = Project()
+    db.add(project)
+    await db.commit()
+    store = EditingSessionStore()
+    editing = _editing(project.id)
+    await store.add(db, editing)
+    monkeypatch.setattr(editing_api, "get_editing_sessions", lambda: store)
+    before = editing.index.genes.copy()
+    violations = editing.index.violations
+    lesson_id = editing.index.engine.gene_metadata[0]["lesson_ids"][0]
+    move = editing_api.MoveRequest(
+        lesson_id=lesson_id, timeslot_id=editing.index.engine.timeslots[7].id
+    )
+
+    async def conflict(db, editing, genes):
+        return False
+
+    monkeypatch.setattr(store, "save_move", conflict)
+    with pytest.raises(HTTPException) as error:
+        await editing_api.apply_move(editing.session_id, move, session=db)
+    assert error.value.status_code == 409
+    assert (editing.index.genes == before).all()
+    assert (editing.index.violations, editing.moves) == (violations, 0)
+
+    async def broken(db, editing, genes):
+        raise ConnectionError("database went away")
+
+    monkeypatch.setattr(store, "save_move", broken)
+    with pytest.raises(ConnectionError):
+        await editing_api.apply_move(editing.session_id, move, session=db)
+    assert (editing.index.genes == before).all()
+
+    monkeypatch.undo()
+    monkeypatch.setattr(editing_api, "get_editing_sessions", lambda: store)
+    check = await editing_api.apply_move(editing.session_id, move, session=db)
+    assert check["applied"] and editing.moves == 1
+    moves, stored = await _stored(db, editing)
+    assert moves == 1
+    assert (stored == editing.index.genes).all()
@@ -0,0 +1,110 @@
+import pytest
+from fastapi import HTTPException
+from app.api.lessons import LessonPin, pin_lesson
+from app.models import (
+    Classroom,
+    ClassroomType,
+    Course,
+    Degree,
+    Lesson,
+    Project,
+    ProjectClassroomLink,
+    ProjectTeacherLink,
+    StudentGroup,
+    Teacher,
+    TeacherCourseLink,
+    TimeSlot,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def _lesson(db):
+    """A lesson plus the rooms, teachers and timeslot its pins may name."""
+    project = Project()
+    course = Course(name="Algebra", required_room_type=ClassroomType.NORMAL)
+    group = StudentGroup(
+        name="G1", degree=Degree.BACHELOR, population=25, allowed_days_mask=0b11
+    )
+    rooms = {
+        name: Classroom(name=name, faculty="F", capacity=capacity, type=kind)
+        for name, capacity, kind in (
+            ("ok", 30, ClassroomType.NORMAL),
+            ("small", 20, ClassroomType.NORMAL),
+            ("lab", 30, ClassroomType.COMPUTER_SITE),
+            ("elsewhere", 30, ClassroomType.NORMAL),
+        )
+    }
+    teachers = {name: Teacher(name=name) for name in ("ok", "untrained", "elsewhere")}
+    slots = [
+        TimeSlot(day_of_week=day, start_time="08:00", end_time="10:00")
+        for day in (0, 3)
+    ]
+    db.add_all([project, course, group, *rooms.values(), *teachers.values(), *slots])
+    await db.flush()
+    lesson = Lesson(project_id=project.id, course_id=course.id, group_id=group.id)
+    db.add_all(
+        [
+            lesson,
+            *(
+                ProjectClassroomLink(project_id=project.id, classroom_id=room.id)
+                for name, room in rooms.items()
+                if name != "elsewhere"
+            ),
+            *(
+                ProjectTeacherLink(project_id=project.id, teacher_id=teacher.id)
+                for name, teacher in teachers.items()
+                if name != "elsewhere"
+            ),
+            *(
+                TeacherCourseLink(teacher_id=teacher.id, course_id=course.id)
+                for name, teacher in teachers.items()
+                if name != "untrained"
+            ),
+        ]
+    )
+    await db.commit()
+    return lesson, rooms, teachers, slots
+
+
+async def test_pin_lesson(db):
+    lesson, rooms, teachers, slots = await _lesson(db)
+    pin = LessonPin(
+        timeslot_id=slots[0].id, room_id=rooms["ok"].id, teacher_id=teachers["ok"].id
+    )
+    assert await pin_lesson(lesson.id, pin, session=db) == {
+        "id": lesson.id,
+        "pinned_timeslot_id": slots[0].id,
+        "pinned_room_id": rooms["ok"].id,
+        "pinned_teacher_id": teachers["ok"].id,
+    }
+    cleared = await pin_lesson(lesson.id, LessonPin(room_id=None), session=db)
+    assert cleared["pinned_room_id"] is None
+    assert cleared["pinned_teacher_id"] == teachers["ok"].id
+
+
+@pytest.mark.parametrize(
+    "field, name, status",
+    [
+        ("room_id", "small", 400),
+        ("room_id", "lab", 400),
+        ("room_id", "elsewhere", 400),
+        ("teacher_id", "untrained", 400),
+        ("teacher_id", "elsewhere", 400),
+        ("timeslot_id", 1, 400),  # a day the group does not meet
+        ("room_id", None, 404),
+    ],
+)
+async def test_pin_lesson_rejects(db, field, name, status):
+    lesson, rooms, teachers, slots = await _lesson(db)
+    if name is None:
+        value = 10**6
+    elif field == "timeslot_id":
+        value = slots[name].id
+    else:
+        value = (rooms if field == "room_id" else teachers)[name].id
+    with pytest.raises(HTTPException) as error:
+        await pin_lesson(lesson.id, LessonPin(**{field: value}), session=db)
+    assert error.value.status_code == status
+    await db.refresh(lesson)
+    assert lesson.pinned_room_id is lesson.pinned_teacher_id is None
@@ -0,0 +1,69 @@
+import pytest
+from app.api.classrooms import get_classrooms
+from app.models import Classroom, ClassroomType, Project, ProjectClassroomLink
+from app.services.listing import totals_cache
+
+pytestmark = pytest.mark.anyio
+
+
+async def _classrooms(db, names):
+    rooms = [
+        Classroom(name=name, faculty="F", capacity=30, type=ClassroomType.NORMAL)
+        for name in names
+    ]
+    db.add_all(rooms)
+    await db.commit()
+    return [room.id for room in rooms]
+
+
+async def _walk(db, **filters):
+    """Every page of get_classrooms, following next_after_id."""
+    pages, after_id = [], None
+    while True:
+        page = await get_classrooms(
+            size=3, after_id=after_id, session=db, page=1, **filters
+        )
+        pages.append([room.id for room in page.items])
+        after_id = page.next_after_id
+        if after_id is None:
+            return pages, page.total
+
+
+async def test_after_id_pages_follow_ids(db):
+    totals_cache.invalidate()
+    # Inserted out of name order so ids and names disagree
+    ids = await _classrooms(db, [f"Room {n}" for n in (5, 1, 9, 3, 7, 2, 8, 4)])
+    pages, total = await _walk(db, project_id=None, search=None)
+    assert total == 8
+    assert pages == [ids[0:3], ids[3:6], ids[6:8]]
+
+    # Page numbers give the same pages
+    for number, expected in enumerate(pages, start=1):
+        page = await get_classrooms(
+            project_id=None, page=number, size=3, search=None, after_id=None, session=db
+        )
+        assert [room.id for room in page.items] == expected
+
+
+async def test_after_id_with_search_and_project(db):
+    totals_cache.invalidate()
+    ids = await _classrooms(
+        db, ["Lab 1", "Hall", "Lab 2", "lab_3", "Lab 4", "Lab%5", "Studio"]
+    )
+    project = Project()
+    db.add(project)
+    await db.flush()
+    db.add_all(
+        ProjectClassroomLink(project_id=project.id, classroom_id=room_id)
+        for room_id in ids[1:]
+    )
+    await db.commit()
+
+    pages, total = await _walk(db, project_id=project.id, search="lab")
+    assert total == 4
+    assert pages == [[ids[2], ids[3], ids[4]], [ids[5]]]
+    # "_" and "%" match themselves, not any character
+    pages, total = await _walk(db, project_id=None, search="b_")
+    assert (pages, total) == ([[ids[3]]], 1)
+    pages, total = await _walk(db, project_id=None, search="%")
+    assert (pages, total) == ([[ids[5]]], 1)
@@ -0,0 +1,76 @@
+import itertools
+import numpy as np
+import pytest
+from app.solver.engine import SolverEngine
+from app.solver.occupancy import OccupancyIndex
+from tests.schedules import WEIGHTS, make_problem, random_genes
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_index_matches_evaluate(seed):
+    engine = SolverEngine(**make_problem(seed=seed), weights=WEIGHTS)
+    rng = np.random.default_rng(seed)
+    index = OccupancyIndex(engine, random_genes(engine, rng))
+    assert (index.violations, index.soft_cost) == pytest.approx(
+        engine.evaluate(index.genes)
+    )
+
+    for step in range(300):
+        g = int(rng.integers(engine.num_genes))
+        parity = None
+        if engine.fixed_parities[g] != 2:
+            parity = ["odd", "even"][rng.integers(2)]
+        gene = index.gene_for_move(
+            g,
+            timeslot_id=engine.timeslots[rng.integers(6)].id,
+            room_id=engine.classrooms[rng.integers(len(engine.classrooms))].id,
+            week_parity=parity,
+        )
+        before = index.genes.copy()
+        check = index.check_move(g, gene, apply=bool(step % 2))
+        moved = before.copy()
+        moved[g] = gene
+        assert (check["violations"], check["soft_cost"]) == pytest.approx(
+            engine.evaluate(moved)
+        )
+        if not step % 2:
+            assert (index.genes == before).all()
+        assert (index.violations, index.soft_cost) == pytest.approx(
+            engine.evaluate(index.genes)
+        )
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_suggest_matches_check_move(seed):
+    engine = SolverEngine(**make_problem(seed=seed), weights=WEIGHTS)
+    index = OccupancyIndex(engine, random_genes(engine, np.random.default_rng(seed)))
+    for g in range(0, engine.num_genes, 9):
+        current = index.genes[g]
+        parities = [2] if engine.fixed_parities[g] == 2 else [0, 1]
+        rooms = engine.valid_rooms_per_gene[g] or range(len(engine.classrooms))
+        teachers = set(engine.valid_teachers_per_gene[g]) | {current[3]}
+        brute = {}
+        for candidate in itertools.product(
+            range(len(engine.timeslots)), rooms, parities, teachers
+        ):
+            if (np.array(candidate) == current).all():
+                continue
+            check = index.check_move(g, candidate)
+            brute[candidate] = (
+                check["violation_delta"],
+                check["soft_cost_delta"],
+                check["valid"],
+            )
+        ranked = sorted(value[:2] for value in brute.values())
+
+        suggestions = index.suggest(g, k=15)
+        assert [
+            (s["violation_delta"], s["soft_cost_delta"]) for s in suggestions
+        ] == pytest.approx(ranked[:15])
+        for s in suggestions:
+            gene = index.gene_for_move(
+                g, s["timeslot_id"], s["room_id"], s["teacher_id"], s["week_parity"]
+            )
+            assert brute[tuple(int(v) for v in gene)] == pytest.approx(
+                (s["violation_delta"], s["soft_cost_delta"], s["valid"])
+            )
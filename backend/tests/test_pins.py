@@ -0,0 +1,55 @@
+import copy
+import numpy as np
+import pytest
+from app.solver.engine import SolverEngine
+from app.solver.genome import Genome
+from tests.schedules import WEIGHTS, make_problem, random_genes
+
+
+def _pinned_problem(seed):
+    """make_problem with a third of the lessons pinned, and an unpinned copy."""
+    problem = make_problem(n_groups=20, seed=seed)
+    free = copy.deepcopy(problem)
+    rng = np.random.default_rng(seed)
+    for i, lesson in enumerate(problem["lessons"]):
+        if i % 3:
+            continue
+        lesson.pinned_timeslot_id = problem["timeslots"][rng.integers(6)].id
+        if i % 2:
+            lesson.pinned_room_id = problem["classrooms"][rng.integers(4)].id
+        if i % 4:
+            lesson.pinned_teacher_id = problem["teachers"][rng.integers(4)].id
+    return problem, free
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_checker_with_pins_counts_as_without(seed):
+    problem, free = _pinned_problem(seed)
+    engine = SolverEngine(**problem, weights=WEIGHTS)
+    reference = SolverEngine(**free, weights=WEIGHTS).constraint_checker
+    assert engine.constraint_checker.fixed_keys
+    rng = np.random.default_rng(seed)
+    for _ in range(20):
+        genes = random_genes(engine, rng)
+        # Schedules moving pinned genes are counted too
+        assert engine.constraint_checker.violation_counts(
+            genes
+        ) == reference.violation_counts(genes)
+        engine.apply_pins(genes)
+        assert engine.constraint_checker.violation_counts(
+            genes
+        ) == reference.violation_counts(genes)
+
+
+def test_mutation_leaves_pinned_columns():
+    problem, _ = _pinned_problem(0)
+    engine = SolverEngine(**problem, weights=WEIGHTS)
+    genome = Genome(engine.num_genes)
+    genome.genes[:] = random_genes(engine, np.random.default_rng(0))
+    engine.apply_pins(genome.genes)
+    before = genome.genes.copy()
+    pinned = engine.pins >= 0
+    for _ in range(20):
+        engine.operators.mutate(genome, mutation_rate=1.0)
+        assert (genome.genes[pinned] == before[pinned]).all()
+    assert (genome.genes[:, 0] != before[:, 0]).any()
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from app.services.preprocessor import ALL_DAYS, Preprocessor
+from app.solver.engine import SolverEngine
+from app.solver.occupancy import OccupancyIndex
+from tests.schedules import WEIGHTS, make_problem, random_genes
+
+
+def _merge(problem, min_population=30):
+    preprocessor = Preprocessor(
+        problem["courses"], problem["groups"], problem["classrooms"]
+    )
+    return preprocessor.merge_small_sections(problem["lessons"], min_population)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_sections_respect_constraints(seed):
+    problem = make_problem(n_groups=30, seed=seed)
+    lessons = {l.id: l for l in problem["lessons"]}
+    groups = {g.id: g for g in problem["groups"]}
+    courses = {c.id: c for c in problem["courses"]}
+    for i, lesson in enumerate(problem["lessons"]):
+        if i % 7 == 0:
+            lesson.teacher_id = problem["teachers"][i % 3].id
+        if i % 11 == 0:
+            lesson.pinned_room_id = problem["classrooms"][0].id
+
+    merges = _merge(problem)
+    assert merges
+    seen = set()
+    for merge in merges:
+        members = [lessons[i] for i in merge["lesson_ids"]]
+        member_groups = [groups[l.group_id] for l in members]
+        assert len(members) >= 2
+        assert not seen & set(merge["lesson_ids"])
+        seen |= set(merge["lesson_ids"])
+        assert {l.course_id for l in members} == {merge["course_id"]}
+        assert len({g.id for g in member_groups}) == len(members)
+        assert all(g.population < 30 for g in member_groups)
+        population = sum(g.population for g in member_groups)
+        assert population == merge["population"] <= merge["capacity"]
+        assert merge["capacity"] <= courses[merge["course_id"]].max_population
+        assert len({g.degree for g in member_groups}) == 1
+        days = ALL_DAYS
+        for group in member_groups:
+            days &= group.allowed_days_mask or ALL_DAYS
+        assert days
+        assert len({l.teacher_id for l in members} - {None}) <= 1
+        assert all(l.pinned_room_id is None for l in members)
+
+
+@pytest.mark.parametrize("seed", range(2))
+def test_sections_share_genes(seed):
+    problem = make_problem(n_groups=30, seed=seed)
+    sections = [merge["lesson_ids"] for merge in _merge(problem)]
+    engine = SolverEngine(**problem, weights=WEIGHTS, sections=sections)
+    assert engine.num_genes < SolverEngine(**problem, weights=WEIGHTS).num_genes
+    for section in sections:
+        genes = [engine.lesson_genes[lesson_id] for lesson_id in section]
+        assert all(g == genes[0] for g in genes)
+
+    rng = np.random.default_rng(seed)
+    index = OccupancyIndex(engine, random_genes(engine, rng))
+    assert (index.violations, index.soft_cost) == pytest.approx(
+        engine.evaluate(index.genes)
+    )
+    shared = [engine.lesson_genes[section[0]][0] for section in sections]
+    for g in shared[:10]:
+        moves = []
+        for s in index.suggest(g, k=5):
+            gene = index.gene_for_move(
+                g, s["timeslot_id"], s["room_id"], s["teacher_id"], s["week_parity"]
+            )
+            check = index.check_move(g, gene)
+            assert (check["violation_delta"], check["soft_cost_delta"]) == (
+                pytest.approx((s["violation_delta"], s["soft_cost_delta"]))
+            )
+            moves.append(gene)
+        index.check_move(g, moves[0], apply=True)
+        assert (index.violations, index.soft_cost) == pytest.approx(
+            engine.evaluate(index.genes)
+        )
+
+
+def test_engine_ignores_conflicting_sections():
+    problem = make_problem()
+    by_group = {}
+    for lesson in problem["lessons"]:
+        by_group.setdefault(lesson.group_id, []).append(lesson)
+    a, b, c = (lessons[:2] for lessons in list(by_group.values())[:3])
+    rooms, slot = problem["classrooms"], problem["timeslots"][3]
+    # A group twice in a section
+    repeated = [a[0].id, a[1].id]
+    # Members pinned to different rooms
+    b[0].pinned_room_id, c[0].pinned_room_id = rooms[1].id, rooms[2].id
+    apart = [b[0].id, c[0].id]
+    # Only a member after the first pinned
+    c[1].pinned_timeslot_id = slot.id
+    pinned = [b[1].id, c[1].id]
+
+    sections = [repeated, apart, pinned]
+    engine = SolverEngine(**problem, weights=WEIGHTS, sections=sections)
+    for section in (repeated, apart):
+        genes = [engine.lesson_genes[lesson_id][0] for lesson_id in section]
+        assert genes[0] != genes[1]
+    g = engine.lesson_genes[pinned[0]][0]
+    assert engine.lesson_genes[pinned[1]][0] == g
+    assert engine.pins[g, 0] == engine.timeslot_id_to_idx[slot.id]
@@ -0,0 +1,78 @@
+import pytest
+from fastapi.responses import StreamingResponse
+from app.api import solver as solver_api
+from app.services.results_cache import ResultsCache, etag_matches, results_etag
+
+pytestmark = pytest.mark.anyio
+
+
+class StatusSession:
+    """Stands in for the database: answers the run status query."""
+
+    def __init__(self, status):
+        self.status = status
+        self.queries = 0
+
+    async def scalar(self, query):
+        self.queries += 1
+        return self.status
+
+
+@pytest.fixture
+def results(monkeypatch):
+    cache = ResultsCache(directory=None)
+    monkeypatch.setattr(solver_api, "get_results_cache", lambda: cache)
+
+    async def stream(run_id, snapshot_fallback=False):
+        yield b'{"run_id": "%s", ' % run_id.encode()
+        yield b'"snapshot": %s}' % (b"true" if snapshot_fallback else b"false")
+
+    monkeypatch.setattr(solver_api, "stream_results_json", stream)
+    return cache
+
+
+def test_etag_matches():
+    etag = results_etag("r1")
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("*", etag)
+    assert not etag_matches(results_etag("r2"), etag)
+
+
+async def test_completed_run_is_cached_and_revalidated(results):
+    etag = results_etag("r1")
+    session = StatusSession("completed")
+    response = await solver_api.get_results("r1", None, session=session)
+    assert response.status_code == 200
+    assert response.headers["ETag"] == etag
+    assert response.body == b'{"run_id": "r1", "snapshot": false}'
+    assert results.get("r1") == response.body
+
+    # Served from the cache without asking the database again
+    response = await solver_api.get_results("r1", etag, session=session)
+    assert (response.status_code, response.headers["ETag"]) == (304, etag)
+    response = await solver_api.get_results("r1", None, session=session)
+    assert response.body == results.get("r1")
+    assert session.queries == 1
+
+
+async def test_completed_run_answers_304_before_caching(results):
+    etag = results_etag("r1")
+    session = StatusSession("completed")
+    response = await solver_api.get_results("r1", f"W/{etag}", session=session)
+    assert response.status_code == 304
+    assert results.get("r1") is None
+
+
+@pytest.mark.parametrize("status", ["running", "failed", None])
+async def test_unfinished_run_has_no_etag(results, status):
+    etag = results_etag("r1")
+    for if_none_match in (None, etag, "*"):
+        response = await solver_api.get_results(
+            "r1", if_none_match, session=StatusSession(status)
+        )
+        assert isinstance(response, StreamingResponse)
+        assert response.status_code == 200
+        assert "ETag" not in response.headers
+    assert results.get("r1") is None
@@ -0,0 +1,136 @@
+import pytest
+from fastapi import HTTPException
+from app.api.solver import get_run_diff
+from app.models import (
+    Classroom,
+    ClassroomType,
+    Course,
+    Degree,
+    Lesson,
+    Project,
+    ScheduleResult,
+    SolverRun,
+    StudentGroup,
+    Teacher,
+    TimeSlot,
+    WeekParity,
+)
+
+pytestmark = pytest.mark.anyio
+
+ODD, EVEN, BOTH = WeekParity.ODD, WeekParity.EVEN, WeekParity.BOTH
+
+
+async def _runs(db):
+    """
+    Runs "a" and "b" of one project, "other" of another one, and the ids of
+    the lessons, timeslots, rooms and teachers they use.
+    """
+    projects = [Project(), Project()]
+    course = Course(name="Algebra", required_room_type=ClassroomType.NORMAL)
+    group = StudentGroup(name="G1", degree=Degree.BACHELOR, population=25)
+    slots = [TimeSlot(day_of_week=0, start_time=t, end_time="") for t in "12"]
+    rooms = [
+        Classroom(name=n, faculty="F", capacity=30, type=ClassroomType.NORMAL)
+        for n in "12"
+    ]
+    teachers = [Teacher(name=n) for n in "12"]
+    db.add_all([*projects, course, group, *slots, *rooms, *teachers])
+    await db.flush()
+    lessons = [
+        Lesson(project_id=projects[0].id, course_id=course.id, group_id=group.id)
+        for _ in range(5)
+    ]
+    db.add_all(lessons)
+    for run_id, project in zip(("a", "b", "other"), (0, 0, 1)):
+        db.add(
+            SolverRun(
+                run_id=run_id, project_id=projects[project].id, config_weights="{}"
+            )
+        )
+    await db.flush()
+    ids = [[x.id for x in xs] for xs in (lessons, slots, rooms, teachers)]
+    await db.commit()
+    return ids
+
+
+def _results(run_id, rows):
+    return [
+        ScheduleResult(
+            run_id=run_id,
+            lesson_id=lesson,
+            timeslot_id=slot,
+            room_id=room,
+            teacher_id=teacher,
+            week_parity=parity,
+        )
+        for lesson, slot, room, teacher, parity in rows
+    ]
+
+
+async def test_run_diff(db):
+    (l1, l2, l3, l4, l5), (s1, s2), (r1, r2), (t1, t2) = await _runs(db)
+    db.add_all(
+        _results(
+            "a",
+            [
+                (l1, s1, r1, t1, BOTH),
+                (l2, s1, r2, t1, ODD),
+                (l3, s2, r1, t2, BOTH),
+                (l4, s1, r1, t2, BOTH),  # a lesson with two parts
+                (l4, s2, r1, t2, BOTH),
+            ],
+        )
+    )
+    await db.flush()
+    db.add_all(
+        _results(
+            "b",
+            [
+                (l1, s1, r1, t1, BOTH),
+                (l2, s2, r2, t1, EVEN),
+                (l4, s1, r1, t2, BOTH),
+                (l4, s2, r2, t2, BOTH),
+                (l5, s2, r2, t1, ODD),
+            ],
+        )
+    )
+    await db.commit()
+
+    diff = await get_run_diff("a", "b", session=db)
+    assert diff["fields"] == ["timeslot_id", "room_id", "teacher_id", "week_parity"]
+    assert diff["summary"] == {
+        "unchanged": 2,
+        "moved": 1,
+        "re_roomed": 1,
+        "re_teachered": 0,
+        "parity_changed": 1,
+        "removed": 1,
+        "added": 1,
+    }
+    assert diff["changes"] == [
+        {
+            "lesson_id": l2,
+            "a": [s1, r2, t1, ODD],
+            "b": [s2, r2, t1, EVEN],
+            "changes": ["moved", "parity_changed"],
+        },
+        {"lesson_id": l3, "a": [s2, r1, t2, BOTH], "b": None, "changes": ["removed"]},
+        {
+            "lesson_id": l4,
+            "a": [s2, r1, t2, BOTH],
+            "b": [s2, r2, t2, BOTH],
+            "changes": ["re_roomed"],
+        },
+        {"lesson_id": l5, "a": None, "b": [s2, r2, t1, ODD], "changes": ["added"]},
+    ]
+
+
+async def test_run_diff_rejects_unknown_and_foreign_runs(db):
+    await _runs(db)
+    with pytest.raises(HTTPException) as error:
+        await get_run_diff("a", "missing", session=db)
+    assert error.value.status_code == 404
+    with pytest.raises(HTTPException) as error:
+        await get_run_diff("a", "other", session=db)
+    assert error.value.status_code == 400